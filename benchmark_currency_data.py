@@ -0,0 +1,152 @@
+"""
+Benchmark loading the embedded currency data: the binary table pyco uses against
+the gzipped JSON it used before.
+
+Both the decode on its own and the whole first-use load (decoding and adding
+every currency to the conversion matrix and unit names) are measured, starting
+each load from a session without currencies.
+
+Runs on CPython and MicroPython. On CPython, memory is the tracemalloc peak; on
+MicroPython it is the heap allocated with the garbage collector paused, which is
+the most the load can hold at once.
+
+    python benchmark_currency_data.py
+    micropython benchmark_currency_data.py
+"""
+
+import base64
+import gc
+import gzip
+import json
+import time
+
+import pyco
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def make_json_data():
+    """Rebuild the previous gzipped JSON format from pyco's binary table."""
+    table = gzip.decompress(base64.b64decode(pyco._CURRENCY_DATA))
+    records = [
+        {"country": country, "currency": currency, "exchange_rate": repr(rate), "currency_code": code}
+        for code, country, currency, rate in pyco._read_currency_table(table)
+    ]
+    document = {"record_date": "", "total_records": len(records), "data": records}
+    json_bytes = json.dumps(document, separators=(",", ":")).encode("utf-8")
+    return base64.b64encode(gzip.compress(json_bytes)).decode("ascii")
+
+
+def decode_json(data):
+    """Decode the way the JSON loader did, reading each record's fields."""
+    document = json.loads(gzip.decompress(base64.b64decode(data)).decode("utf-8"))
+    for record in document.get("data", []):
+        (record.get("currency_code"), record.get("country"), record.get("currency"),
+         float(record.get("exchange_rate")))
+
+
+def decode_binary(data):
+    """Decode the way _load_currency_data does, reading records from the table."""
+    compressed = base64.b64decode(data)
+    table = gzip.decompress(compressed)
+    del compressed
+    for record in pyco._read_currency_table(table):
+        pass
+
+
+def load_json(data):
+    """Load currencies the way pyco did from the JSON format."""
+    document = json.loads(gzip.decompress(base64.b64decode(data)).decode("utf-8"))
+    seen_codes = set()
+    for record in document.get("data", []):
+        currency_code = record.get("currency_code")
+        exchange_rate = record.get("exchange_rate")
+        country = record.get("country") or ""
+        currency = record.get("currency") or ""
+        if currency_code:
+            code_lower = currency_code.lower()
+            prefixed_code = f"${code_lower}"
+            country_key = country.lower().replace(" ", "_").replace("-", "_")
+            pyco._UNIT_NAMES[f"{prefixed_code}_{country_key}"] = f"{country} ({currency})"
+            if code_lower not in seen_codes:
+                seen_codes.add(code_lower)
+                pyco._UNIT_NAMES[prefixed_code] = f"{country} ({currency})"
+                if exchange_rate and currency_code.upper() != "USD":
+                    pyco._add_conversion("currency.$usd", f"currency.{prefixed_code}", float(exchange_rate))
+    pyco._UNIT_NAMES["$usd"] = "United States (Dollar)"
+    pyco._UNIT_NAMES["$usd_united_states"] = "United States (Dollar)"
+
+
+def load_binary(data):
+    """Load currencies with pyco's own loader (which always reads pyco._CURRENCY_DATA)."""
+    pyco._load_currency_data()
+
+
+def remove_currencies():
+    """Take the currencies out of pyco again, as in a session that has not loaded them."""
+    for key in [key for key in pyco._CONVERSION_MATRIX if key[0] == "currency.$usd"]:
+        del pyco._CONVERSION_MATRIX[key]
+    for name in [name for name in pyco._UNIT_NAMES if name.startswith("$")]:
+        del pyco._UNIT_NAMES[name]
+    pyco._matrix_edits += 1
+
+
+def clock():
+    """Get the time in seconds (MicroPython has no perf_counter)."""
+    if hasattr(time, "perf_counter"):
+        return time.perf_counter()
+    return time.ticks_us() / 1e6
+
+
+def measure_time(decode, data, runs=50, reset=None):
+    """Get the best time of several runs, in milliseconds, calling reset (if given) before each."""
+    best = None
+    for _ in range(runs):
+        if reset is not None:
+            reset()
+        start = clock()
+        decode(data)
+        elapsed = clock() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best * 1000
+
+
+def measure_memory(decode, data, reset=None):
+    """Get the peak memory used by one run, in KiB, calling reset (if given) first."""
+    if reset is not None:
+        reset()
+    gc.collect()
+    if tracemalloc is not None:
+        tracemalloc.start()
+        decode(data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    else:
+        gc.disable()
+        start = gc.mem_alloc()
+        decode(data)
+        peak = gc.mem_alloc() - start
+        gc.enable()
+    return peak / 1024
+
+
+def main():
+    pyco._ensure_currency_data_loaded()
+    json_data = make_json_data()
+    print(f"{'format':<8} {'source chars':>12} {'decode ms':>10} {'peak KiB':>9} {'load ms':>8} {'peak KiB':>9}")
+    formats = [
+        ("json", decode_json, load_json, json_data),
+        ("binary", decode_binary, load_binary, pyco._CURRENCY_DATA),
+    ]
+    for name, decode, load, data in formats:
+        print(f"{name:<8} {len(data):>12} {measure_time(decode, data):>10.3f} {measure_memory(decode, data):>9.1f}"
+              f" {measure_time(load, data, reset=remove_currencies):>8.3f}"
+              f" {measure_memory(load, data, reset=remove_currencies):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
 """
 Fetch exchange rates from Treasury API and combine with currency codes from ISO data.
+
+The result is printed as the base64 text for _CURRENCY_DATA in pyco.py: a gzipped
+binary table (see encode_currency_table) that pyco can read without building
+any intermediate dictionaries. benchmark_currency_data.py compares decoding it
+against the previous gzipped JSON format.
 """
 
 import urllib.request
@@ -10,6 +15,7 @@ import ssl
 import gzip
 import base64
 import re
+import struct
 
 
 def fetch_url(url, skip_ssl=False):
@@ -200,6 +206,53 @@ def match_country_to_currency(country_name, country_to_currency):
     return None
 
 
+def encode_currency_table(records, record_date):
+    """
+    Pack currency records into the binary table read by pyco's _read_currency_table.
+    
+    All integers and doubles are little-endian. The layout is:
+    
+        header:   b'PYCC', record count (H), string count (H), record date string index (H)
+        rates:    one double per record, packed back to back
+        records:  currency code, country and currency name string indexes (3H) per record
+        offsets:  string count + 1 byte offsets (I) into the string data
+        strings:  UTF-8 text of every distinct string, string 0 being ''
+    
+    Records without a currency code are left out, as pyco cannot convert them.
+    """
+    records = [r for r in records if r.get("currency_code")]
+    
+    strings = [""]
+    string_indexes = {"": 0}
+    
+    def string_index(text):
+        text = text or ""
+        if text not in string_indexes:
+            string_indexes[text] = len(strings)
+            strings.append(text)
+        return string_indexes[text]
+    
+    date_index = string_index(record_date)
+    refs = [(string_index(r["currency_code"]), string_index(r.get("country")), string_index(r.get("currency")))
+            for r in records]
+    
+    # Missing rates are stored as NaN so the record keeps its names
+    rates = [float(r["exchange_rate"]) if r.get("exchange_rate") else float("nan") for r in records]
+    
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    
+    return b"".join([
+        struct.pack("<4sHHH", b"PYCC", len(records), len(strings), date_index),
+        struct.pack(f"<{len(rates)}d", *rates),
+        b"".join(struct.pack("<3H", *ref) for ref in refs),
+        struct.pack(f"<{len(offsets)}I", *offsets),
+        b"".join(encoded),
+    ])
+
+
 def main():
     country_to_currency = fetch_currency_codes()
     exchange_rates, record_date = fetch_exchange_rates()
@@ -255,14 +308,8 @@ def main():
                     "currency_code": "EUR"
                 })
     
-    output = {
-        "record_date": record_date,
-        "total_records": len(filtered_records),
-        "data": filtered_records
-    }
-    
-    json_bytes = json.dumps(output, separators=(',', ':')).encode('utf-8')
-    gzipped = gzip.compress(json_bytes)
+    table = encode_currency_table(filtered_records, record_date)
+    gzipped = gzip.compress(table)
     print(base64.b64encode(gzipped).decode('ascii'))
 
 
@@ -6,6 +6,16 @@ import math
 import inspect
 import gzip
 import base64
+import array
+import binascii
+import os
+import struct
+try:
+    import fractions
+except ImportError:
+    # Not available on MicroPython, where conversions are composed in floats
+    fractions = None
+import time
 
 from math import *
 from random import *
@@ -40,15 +50,21 @@ _pending_command = ''
 
 def _pre_exec_hook(source):
     """Hook called by hosts before executing a command.
-    Stores the source code so it can be associated with the result."""
+    Stores the source code so it can be associated with the result, and returns
+    the source to execute: unit literals like '5 mi -> km' are rewritten into a
+    conversion call (see _rewrite_unit_literal)."""
     global _pending_command
     _pending_command = source
+    return _rewrite_unit_literal(source)
 
 def _process_result(value):
     """Common logic for processing REPL results (used by both CPython and MicroPython)"""
     global _list, _result_counter, _pending_command
-    # Store enumerable results in _list
-    if _is_enumerable(value):
+    # Store enumerable results in _list (iconvert() results may be unbounded and
+    # are left for the user to consume)
+    if isinstance(value, QuantityArray):
+        _list = value
+    elif _is_enumerable(value) and not isinstance(value, _ConversionStream):
         _list = list(value)
     # Store result in numbered variable (_1, _2, _3, etc.)
     _result_counter += 1
@@ -62,7 +78,7 @@ if sys.implementation.name == 'cpython':
     from statistics import *
 
     def _displayhook(value):
-        if callable(value):
+        if callable(value) and not isinstance(value, _Converter):
             _displayhook(value())
         else:
             _process_result(value)
@@ -79,6 +95,16 @@ if sys.implementation.name == 'cpython':
                         print(result)
                 else:
                     print("No matches found.")
+            elif _rewrite_unit_literal(cleanvalue) != cleanvalue:
+                # The CPython REPL has no pre-exec hook, so unit literals like
+                # '5 mi -> km' arrive here as syntax errors
+                # Evaluate in the user's namespace so names like _ and _3 resolve
+                source = _pre_exec_hook(cleanvalue)
+                namespace = vars(sys.modules.get('__main__', sys.modules[__name__]))
+                try:
+                    sys.displayhook(eval(source, namespace, {'_inline_convert': _inline_convert}))
+                except Exception as error:
+                    sys.__excepthook__(type(error), error, error.__traceback__)
             else:
                 sys.__excepthook__(exctype, value, traceback)
         else:
@@ -88,7 +114,7 @@ if sys.implementation.name == 'cpython':
 elif sys.implementation.name == 'micropython':
     __original_repl_print__ = __repl_print__
     def _displayhook(value):
-        if callable(value):
+        if callable(value) and not isinstance(value, _Converter):
             _displayhook(value())
         else:
             _process_result(value)
@@ -127,7 +153,8 @@ def _get_docstring_summary(obj):
 
 def _format_with_docstring(name, obj):
     """Format a name with its docstring summary or type info for variables.
-    Returns a tuple of (name, description, kind) where kind is 'function', 'function_noargs', or 'variable'."""
+    Returns a tuple of (name, description, kind) where kind is 'function', 'function_noargs', or 'variable'.
+    Units defined with defunit() are listed with the kind 'unit'."""
     # For non-callable objects (variables/constants), show type info
     if not callable(obj):
         type_name = type(obj).__name__
@@ -151,6 +178,24 @@ def _format_with_docstring(name, obj):
         return (name, summary, kind)
     return (name, "", kind)
 
+def _find_defined_units(term, match):
+    """
+    Find units defined with defunit() whose name or full name matches.
+    
+    Args:
+        term (str): The search term without wildcards
+        match: Function taking (text, term) that tests a lowercase name or full name
+        
+    Returns:
+        list: (name, description, 'unit') tuples, like the entries of _findGlobals
+    """
+    term_lower = term.lower()
+    found = []
+    for name, (category, long_name) in _defined_units.items():
+        if match(name.lower(), term_lower) or (long_name and match(long_name.lower(), term_lower)):
+            found.append((name, f"{long_name or name} ({category} unit)", "unit"))
+    return found
+
 def _matches_term(name, obj, term):
     """Check if term matches the name or the docstring of an object."""
     term_lower = term.lower()
@@ -197,6 +242,9 @@ def _findGlobals(term):
             obj = globals()[current]
             if isinstance(obj, types.ModuleType):
                 continue
+            # Unit quantities are listed by units() instead
+            if isinstance(obj, Quantity):
+                continue
             # Exclude all classes
             if isinstance(obj, type):
                 continue
@@ -212,6 +260,10 @@ def _findGlobals(term):
                 continue
             if _matches_term(current, obj, term):
                 found.append(_format_with_docstring(current, obj))
+        # Search units defined at runtime
+        for item in _find_defined_units(term, lambda text, term: term in text):
+            if not any(item[0] == f[0] for f in found):
+                found.append(item)
         return sorted(found, key=lambda x: x[0].lower())
     
     # Handle wildcard patterns
@@ -324,8 +376,8 @@ def _findGlobals(term):
             else:
                 obj = getattr(builtins, current, None)
             
-            # Skip modules
-            if isinstance(obj, types.ModuleType):
+            # Skip modules and unit quantities
+            if isinstance(obj, (types.ModuleType, Quantity)):
                 continue
             
             # Exclude all classes
@@ -349,6 +401,17 @@ def _findGlobals(term):
             if match:
                 found_results.append(_format_with_docstring(current, obj))
         
+        # Search units defined at runtime
+        if starts_with_star and ends_with_star:
+            unit_match = lambda text, term: term in text
+        elif starts_with_star:
+            unit_match = lambda text, term: text.endswith(term)
+        else:
+            unit_match = lambda text, term: text.startswith(term)
+        for item in _find_defined_units(filter, unit_match):
+            if not any(item[0] == f[0] for f in found_results):
+                found_results.append(item)
+        
         return sorted(found_results, key=lambda x: x[0].lower())
 
 def find(term="*"):
@@ -421,8 +484,8 @@ def _get_printable_char(char):
     else:
         return chr(char)
 
-def inputlist():
-    """Read a list of numbers."""
+def inputlist(unit=None):
+    """Read a list of numbers, as a QuantityArray if a unit is given."""
     global _list
     _list = []
     inputCounter = 0
@@ -433,18 +496,23 @@ def inputlist():
             break
         _list.append(float(lastInput))
         inputCounter += 1
+    if unit:
+        _list = QuantityArray(_list, unit)
     return _list
 
 
 def average(list):
-    """Calculate the average (mean) of a list of numbers."""
+    """Calculate the average (mean) of a list of numbers, keeping the unit of a QuantityArray."""
+    if isinstance(list, QuantityArray):
+        return list.mean()
     return mean(list)
 
 # Conversion Matrix System
 # This system stores conversion factors between units in a non-redundant matrix format.
 # Each conversion relationship is stored only once (e.g., hours->minutes: 60), and the
 # system automatically handles bidirectional conversions by inverting factors as needed.
-# Dynamic programming finds conversion paths between any two units, even through intermediate units.
+# Each connected group of units is compiled into transforms to a common base unit, so any two
+# units convert directly, even when the matrix only links them through intermediate units.
 
 # Category information is encoded in unit names using the format: category.unit
 # This eliminates the need for separate category metadata while maintaining type safety.
@@ -488,22 +556,222 @@ def _get_external_to_internal_mapping():
     
     return _external_to_internal_cache
 
+# SI prefixes (as powers of ten), and binary prefixes (as powers of two) for data
+# units. Prefixed units like Mm, ns or GiB are synthesized from a base unit at lookup
+# time instead of being stored in the conversion matrix; internally they are named
+# like any other unit ('distance.Mm').
+_SI_PREFIXES = {
+    'Y': 24, 'Z': 21, 'E': 18, 'P': 15, 'T': 12, 'G': 9, 'M': 6, 'k': 3, 'h': 2, 'da': 1,
+    'd': -1, 'c': -2, 'm': -3, 'u': -6, '\u00b5': -6, '\u03bc': -6, 'n': -9, 'p': -12,
+    'f': -15, 'a': -18,
+}
+_BINARY_PREFIXES = {'Ki': 10, 'Mi': 20, 'Gi': 30, 'Ti': 40, 'Pi': 50, 'Ei': 60}
+
+# Unit symbols that take prefixes (case-sensitive) -> internal base unit
+_PREFIX_BASE_UNITS = {
+    'm': 'distance.m', 'g': 'weight.g', 's': 'time.s', 'l': 'volume.l', 'L': 'volume.l',
+    'W': 'power.w', 'w': 'power.w', 'J': 'energy.j', 'j': 'energy.j', 'Wh': 'energy.wh',
+    'bit': 'data.bit', 'b': 'data.bit', 'B': 'data.byte', 'byte': 'data.byte',
+}
+
+# Data sizes spelled like the kb, mb, gb and tb constants -> power of two in bytes.
+# These mean binary sizes (kb is 1024 bytes, as in 5*kb), not kilobits, so one
+# spelling has one meaning in pyco; KB has no SI meaning and is read the same way.
+_DATA_SIZE_NAMES = {'kb': 10, 'KB': 10, 'mb': 20, 'gb': 30, 'tb': 40}
+
+def _parse_prefixed_unit(unit):
+    """
+    Split a unit name into a prefix and a base unit symbol (case-sensitive).
+    
+    Data units take multiplying SI prefixes and binary prefixes; other units
+    take SI prefixes only. A bare symbol like 'B' resolves to its base unit.
+    The lowercase sizes kb, mb, gb and tb (and KB) are binary sizes in bytes,
+    matching the constants of the same names; kilobits are spelled kbit.
+    
+    Returns:
+        tuple: (base internal unit, power of ten, power of two), or None if the
+               name is not a prefixed unit
+        
+    Examples:
+        _parse_prefixed_unit('Mm')      # ('distance.m', 6, 0)
+        _parse_prefixed_unit('GiB')     # ('data.byte', 0, 30)
+        _parse_prefixed_unit('kb')      # ('data.byte', 0, 10)
+    """
+    if unit in _DATA_SIZE_NAMES:
+        return ('data.byte', 0, _DATA_SIZE_NAMES[unit])
+    if unit in _PREFIX_BASE_UNITS:
+        return (_PREFIX_BASE_UNITS[unit], 0, 0)
+    for length in (2, 1):
+        prefix = unit[:length]
+        base_internal = _PREFIX_BASE_UNITS.get(unit[length:])
+        if base_internal is None:
+            continue
+        is_data = base_internal.startswith('data.')
+        if prefix in _SI_PREFIXES and (_SI_PREFIXES[prefix] > 0 or not is_data):
+            return (base_internal, _SI_PREFIXES[prefix], 0)
+        if is_data and prefix in _BINARY_PREFIXES:
+            return (base_internal, 0, _BINARY_PREFIXES[prefix])
+    return None
+
+def _get_prefixed_unit(unit):
+    """Get (base internal unit, power of ten, power of two) for a prefixed unit name, or None (cached)."""
+    result = _prefixed_unit_cache.get(unit)
+    if result is None:
+        result = _parse_prefixed_unit(unit) or False
+        _prefixed_unit_cache.put(unit, result)
+    return result or None
+
+def _split_prefixed_unit(internal_unit):
+    """
+    Split an internal unit into its base unit and prefix.
+    
+    Returns:
+        tuple: (base internal unit, power of ten, power of two); units without a
+               prefix give (internal_unit, 0, 0)
+    """
+    if internal_unit in _get_unit_registry().units or '.' not in internal_unit:
+        return (internal_unit, 0, 0)
+    category, name = internal_unit.split('.', 1)
+    prefixed = _get_prefixed_unit(name)
+    if prefixed is None or _get_unit_category(prefixed[0]) != category:
+        return (internal_unit, 0, 0)
+    return prefixed
+
+def _is_known_unit(internal_unit):
+    """Check if an internal unit is in the conversion matrix or is a prefixed unit."""
+    if internal_unit in _get_unit_registry().units:
+        return True
+    return _split_prefixed_unit(internal_unit)[0] != internal_unit
+
+# Lowercase alias -> internal unit index (initialized lazily)
+_alias_index = None
+_alias_version = None
+
+# Plurals that can't be made singular by dropping a suffix
+_IRREGULAR_SINGULARS = {'feet': 'foot'}
+
+def _alias_forms(name):
+    """
+    Get the lowercase aliases for a unit's long name: the name and its singular.
+    
+    Examples:
+        _alias_forms('Kilometers')  # ['kilometers', 'kilometer']
+        _alias_forms('inches')      # ['inches', 'inch']
+    """
+    name = name.lower()
+    forms = [name]
+    if name in _IRREGULAR_SINGULARS:
+        forms.append(_IRREGULAR_SINGULARS[name])
+    elif not name.replace(' ', '').isalpha():
+        # Compound names like 'meters/second' are resolved part by part
+        pass
+    elif name.endswith('ches') or name.endswith('shes'):
+        forms.append(name[:-2])
+    elif name.endswith('s') and not name.endswith('ss') and not name.endswith('us'):
+        forms.append(name[:-1])
+    return forms
+
+def _build_alias_index():
+    """
+    Build the lowercase alias index used by _to_internal_unit.
+    
+    Unit names take precedence over long names, which take precedence over
+    currency names. A currency name is only an alias when it belongs to a
+    single currency code ('euro' does, 'dollar' does not).
+    """
+    mapping = _get_external_to_internal_mapping()
+    index = {}
+    for name, internal_unit in mapping.items():
+        index.setdefault(name.lower(), internal_unit)
+    
+    for abbrev, long_name in _UNIT_NAMES.items():
+        internal_unit = mapping.get(abbrev)
+        if internal_unit is not None and not abbrev.startswith('$'):
+            for form in _alias_forms(long_name):
+                index.setdefault(form, internal_unit)
+    
+    # Currency display entries look like '$eur_germany': 'Germany (Euro)'
+    currency_codes = {}
+    for key, full_name in _UNIT_NAMES.items():
+        if key.startswith('$') and '_' in key and full_name.endswith(')'):
+            currency = full_name[full_name.rfind('(') + 1:-1].lower()
+            currency_codes.setdefault(currency, set()).add(key.split('_')[0])
+    for currency, codes in currency_codes.items():
+        if len(codes) == 1:
+            internal_unit = mapping.get(codes.pop())
+            if currency and internal_unit is not None:
+                index.setdefault(currency, internal_unit)
+                index.setdefault(currency + 's', internal_unit)
+    return index
+
+def _get_alias_index():
+    """Get the alias index, rebuilding it if the matrix or unit names changed."""
+    global _alias_index, _alias_version
+    version = (_matrix_version(), len(_UNIT_NAMES))
+    if _alias_index is None or _alias_version != version:
+        _alias_index = _build_alias_index()
+        _alias_version = version
+    return _alias_index
+
+class _UnitRegistry:
+    """
+    Index of every unit in the conversion matrix and the category it belongs to.
+    
+    Maps internal unit -> category and category -> internal units (in the order
+    they were first seen), so validity and category lookups never scan the
+    matrix. The registry records the matrix version it was built against.
+    """
+    
+    def __init__(self):
+        self.version = None
+        self.categories = {}
+        self.units = {}
+    
+    def add(self, unit):
+        """Register an internal unit under its category if it is not known yet."""
+        if unit not in self.units:
+            category = _get_unit_category(unit)
+            self.units[unit] = category
+            self.categories.setdefault(category, []).append(unit)
+    
+    def build(self):
+        """Rebuild the registry from the whole conversion matrix."""
+        self.categories = {}
+        self.units = {}
+        for unit1, unit2 in _CONVERSION_MATRIX:
+            self.add(unit1)
+            self.add(unit2)
+        self.version = _matrix_version()
+
+_unit_registry = _UnitRegistry()
+
+def _get_unit_registry():
+    """Get the unit registry, rebuilding it if the conversion matrix changed."""
+    if _unit_registry.version != _matrix_version():
+        _unit_registry.build()
+    return _unit_registry
+
 def _is_valid_unit(unit):
     """Check if a unit is valid and can be converted."""
-    internal_unit = _to_internal_unit(unit)
-    
-    # Check if unit appears in conversion matrix
-    for (unit1, unit2), _ in _CONVERSION_MATRIX.items():
-        if internal_unit == unit1 or internal_unit == unit2:
-            return True
-    return False
+    return _is_known_unit(_to_internal_unit(unit))
 
 def _to_internal_unit(unit):
-    """Convert external unit name to internal category.unit format (case insensitive)."""
+    """Convert external unit name to internal category.unit format (case insensitive).
+    
+    Results are cached per name, including names that do not resolve (which are
+    returned unchanged), so repeated misses do not search the name tables again."""
     # If already in category.unit format, return as-is
     if '.' in unit:
         return unit
     
+    internal_unit = _resolved_unit_cache.get(unit)
+    if internal_unit is None:
+        internal_unit = _resolve_unit_name(unit)
+        _resolved_unit_cache.put(unit, internal_unit)
+    return internal_unit
+
+def _resolve_unit_name(unit):
+    """Look up the internal unit for an external unit name without using the cache."""
     # Convert to lowercase for case-insensitive matching
     unit_lower = unit.lower()
     
@@ -518,56 +786,103 @@ def _to_internal_unit(unit):
     if unit in mapping:
         return mapping[unit]
     
-    # Then try case-insensitive match
-    for key, value in mapping.items():
-        if key.lower() == unit_lower:
-            return value
+    # A name in capitals (like 'ML') is a case-insensitive spelling of a known unit
+    aliases = _get_alias_index()
+    if unit.isupper() and unit_lower in aliases:
+        return aliases[unit_lower]
+    
+    # Then try a prefix and a base unit symbol (case-sensitive, so Mm is not mm)
+    prefixed = _get_prefixed_unit(unit)
+    if prefixed is not None:
+        base_internal, decimal_power, binary_power = prefixed
+        if not decimal_power and not binary_power:
+            return base_internal
+        return f'{_get_unit_category(base_internal)}.{unit}'
+    
+    # Then try the lowercase alias index (mixed case, long and plural names)
+    internal_unit = aliases.get(unit_lower)
+    if internal_unit is not None:
+        return internal_unit
     
     # If no match found, return original unit
     return unit
 
 def _get_units_by_category(category):
     """Get all units belonging to a specific category."""
-    all_units = set()
-    # Get units from conversion matrix (temperature units are now included)
-    for (unit1, unit2), _ in _CONVERSION_MATRIX.items():
-        all_units.add(unit1)
-        all_units.add(unit2)
-    
-    # Filter by category and return external unit names
-    category_units = [unit for unit in all_units if _get_unit_category(unit) == category]
-    return [_get_unit_name(unit) for unit in category_units]
+    units = _get_unit_registry().categories.get(category, [])
+    return [_get_unit_name(unit) for unit in units]
 
 def _get_all_categories():
     """Get all available unit categories."""
-    all_units = set()
-    # Get units from conversion matrix (temperature units are now included)
-    for (unit1, unit2), _ in _CONVERSION_MATRIX.items():
-        all_units.add(unit1)
-        all_units.add(unit2)
-    
-    return list(set(_get_unit_category(unit) for unit in all_units))
-
-# Temperature conversion functions
-def _celsius_to_fahrenheit(value):
-    """Convert Celsius to Fahrenheit"""
-    return value * 9/5 + 32
+    return list(_get_unit_registry().categories)
 
-def _fahrenheit_to_celsius(value):
-    """Convert Fahrenheit to Celsius"""
-    return (value - 32) * 5/9
-
-def _celsius_to_kelvin(value):
-    """Convert Celsius to Kelvin"""
-    return value + 273.15
+class _Affine:
+    """
+    Invertible affine conversion: to_value = from_value * scale + offset.
+    
+    Used in the conversion matrix for units with an offset (like temperature).
+    Unlike a conversion function, an affine transform can be inverted and
+    composed exactly, so offset units need only one entry per relationship and
+    compile into the base-unit table just like scale-only units.
+    """
+    __slots__ = ('scale', 'offset')
+    
+    def __init__(self, scale, offset=0):
+        self.scale = scale
+        self.offset = offset
+    
+    def __call__(self, value):
+        return value * self.scale + self.offset
+    
+    def inverse(self):
+        """Get the transform converting back from the target unit."""
+        return _Affine(1 / self.scale, -self.offset / self.scale)
+    
+    def then(self, other):
+        """Get the transform applying this one followed by other."""
+        return _Affine(self.scale * other.scale, self.offset * other.scale + other.offset)
+    
+    def delta(self):
+        """Get the transform for differences and rates, where offsets cancel out."""
+        return _Affine(self.scale)
+    
+    def __eq__(self, other):
+        return (isinstance(other, _Affine)
+                and self.scale == other.scale and self.offset == other.offset)
+    
+    def __hash__(self):
+        return hash((self.scale, self.offset))
+    
+    def __repr__(self):
+        return f'_Affine({self.scale!r}, {self.offset!r})'
 
-def _kelvin_to_celsius(value):
-    """Convert Kelvin to Celsius"""
-    return value - 273.15
+def _to_fraction(value):
+    """
+    Get a number or matrix entry as an exact fraction (or an _Affine of fractions).
+    
+    Floats are read as the simplest fraction that rounds back to the same float,
+    so 0.3048 becomes 381/1250 and 1/12 becomes 1/12 rather than the binary
+    approximation of either. Without the fractions module (MicroPython) numbers
+    are kept as floats instead.
+    
+    Examples:
+        _to_fraction(0.3048)    # Fraction(381, 1250)
+        _to_fraction(_Affine(1.8, 32))    # _Affine(Fraction(9, 5), Fraction(32, 1))
+    """
+    if isinstance(value, _Affine):
+        return _Affine(_to_fraction(value.scale), _to_fraction(value.offset))
+    if fractions is None:
+        return float(value)
+    if isinstance(value, float):
+        candidate = fractions.Fraction(value).limit_denominator(1000000)
+        if float(candidate) == value:
+            return candidate
+        return fractions.Fraction(repr(value))
+    return fractions.Fraction(value)
 
 # Define conversion factors as a matrix where each relationship is stored only once
 # Format: (unit1, unit2): conversion_factor means unit1 * conversion_factor = unit2
-# For temperature conversions, functions are used instead of constants due to offsets
+# For temperature conversions, affine transforms are used instead of constants due to offsets
 # Units use category.name format to encode category information directly in the data
 _CONVERSION_MATRIX = {
     # Time conversions (smaller -> larger)
@@ -577,12 +892,10 @@ _CONVERSION_MATRIX = {
     ('time.d', 'time.wk'): 1/7,
     ('time.d', 'time.yr'): 1/365.25,
     
-    # Temperature conversions (using functions for offset calculations)
+    # Temperature conversions (affine transforms for offset calculations)
     # Minimum spanning tree: C as hub connecting to F and K
-    ('temperature.c', 'temperature.f'): _celsius_to_fahrenheit,
-    ('temperature.f', 'temperature.c'): _fahrenheit_to_celsius,
-    ('temperature.c', 'temperature.k'): _celsius_to_kelvin,
-    ('temperature.k', 'temperature.c'): _kelvin_to_celsius,
+    ('temperature.c', 'temperature.f'): _Affine(9/5, 32),
+    ('temperature.c', 'temperature.k'): _Affine(1, 273.15),
     
     # Distance conversions (smaller -> larger) - minimal spanning tree
     ('distance.in', 'distance.ft'): 1/12,
@@ -629,9 +942,43 @@ _CONVERSION_MATRIX = {
 
     # Power conversions
     ('power.w', 'power.hp'): 1/745.7,
+    ('power.w', 'power.kw'): 1/1000,
+    
+    # Energy conversions (smaller -> larger)
+    ('energy.j', 'energy.kj'): 1/1000,
+    ('energy.cal', 'energy.j'): 4.184,
+    ('energy.cal', 'energy.kcal'): 1/1000,
+    ('energy.j', 'energy.wh'): 1/3600,
+    ('energy.wh', 'energy.kwh'): 1/1000,
+    ('energy.btu', 'energy.j'): 1055.06,
+    
+    # Data size conversions (multiples come from prefixes, like kB or GiB)
+    ('data.bit', 'data.byte'): 1/8,
+}
+
+# Base dimensions of the unit engine. Each category has a reference unit, the size of
+# that unit in SI base units and its exponents over these dimensions, so any unit
+# expression reduces to (scale, dimensions). Two expressions can be converted when
+# their dimensions are equal, whatever their structure.
+_BASE_DIMENSIONS = ('length', 'mass', 'time', 'temperature', 'currency', 'information')
+_DIMENSIONLESS = (0, 0, 0, 0, 0, 0)
+
+# Category -> (reference unit, size of the reference unit in base units, dimensions)
+_CATEGORY_DIMENSIONS = {
+    'time': ('time.s', 1, (0, 0, 1, 0, 0, 0)),
+    'temperature': ('temperature.k', 1, (0, 0, 0, 1, 0, 0)),
+    'distance': ('distance.m', 1, (1, 0, 0, 0, 0, 0)),
+    'weight': ('weight.kg', 1, (0, 1, 0, 0, 0, 0)),
+    'volume': ('volume.l', 1/1000, (3, 0, 0, 0, 0, 0)),
+    'speed': ('speed.mps', 1, (1, 0, -1, 0, 0, 0)),
+    'area': ('area.m2', 1, (2, 0, 0, 0, 0, 0)),
+    'power': ('power.w', 1, (2, 1, -3, 0, 0, 0)),
+    'energy': ('energy.j', 1, (2, 1, -2, 0, 0, 0)),
+    'currency': ('currency.$usd', 1, (0, 0, 0, 0, 1, 0)),
+    'data': ('data.bit', 1, (0, 0, 0, 0, 0, 1)),
 }
 
-_CURRENCY_DATA = "H4sIAAAAAAAC/7VbW3PayBL+K5Qfzr5kVeiCQHnjZsBIQCSwY06dSg1oAhMLiR1JdvDW/vdt7N2tpLuVUo7Zl1QKm0+jnr58/XX79ystt5mOP8WikFfvr6ym1frVtH61zat3V0VWiOTT6y/kV+9N13p3Bb8nrt7/9/erbVamhT7Bd4alzhrrLJXwlW2ptUy3f38Mn8iv271Id/KTfn1C0+i0zG9+89M2i8+fD1fh1R/vvsXtft7BN1VeiPR75L9+wIC7LcNzGfDu9QyDJxuAEN8D+/KBAe2YcGQO1PcJ6E5qDDpQqdAMrGl1DM/iTDFYDzBwussShDt9EumzYIA90zKsDmuGeZcAF2pXisZ/Gj2hN2WMnjEUedHoC602GynSxiBLEvZdLKNNH5eWSYKepncSHpiipyxkznmK6XSaRpN7jTDCr6EPktzmQIsDA2tXoQbE6mVeaJEQ3CormIbjsY6yIsjPUm+E+oI9OxCpKFjkNoe7xl7dE3txEHnt83J26EUDiqqFSuu5ddOw29xhe2MKm+4SEct8/z3yUjwINl5s/ryDJQEG48ZZXTNYRtPicHvkwDJRz7I+Kge6pqApNm3/s2hca5FuGdhWyzbanJN9nF8TZH0gEf2zzkCCopcl6hGHxF8fplwYu3z27M1vCXJOYjgQmncGw3UdDrUbENQih0yJU06Z8D5mmDaXOXt3C4yrxbNKvkcNpUi4OzMcPiRCn4CWqVS1b8ziLTsjd1YCboxwqzzMbjb5BNmbYA/ri8Mmi/GdhUpyVnCaTd7HpuOQ4kqdZT8VFq7hcA7xsUsPnYqfiArb9RjYfndAYI+ycSt1jGlQvi1jLi482+iYdapmX5wOUHwneSLSuG5SA5rFJbXpPTn3XiWyVj32wC9szuH6/jUFxREXyvSg0g3L2gzP63C4s3uMmyXZYaPq8QeoQ7bhclboz1cE+JBpXDGqnM0xO4bFOds0IIbIgLldwI37A4oMxLgRqi0yxtlEKXdo8Dc2tfXDPoEuZGPwy+QxU1q+vTQxHl1u8Kn34lEVWe261F/hfNwvtdgKbOt/qOuoVEks+RBvd2od+llu941QHstNoraIi2eQYLmCYjUNs8lx/P56il5gIA/ZFr6mtv88pDH/3OA86PxRInNZeRWWZbY4u9G3GkBYQo1Fr6NfuzkaqHaLSwCDKXmZL2qTlUXNkmO22+wtD26w1w8ySCLg82nFRVSkAhcaFM73P/ZxOhxuS6COmmRZoWVe2ztXhEIPd6djgY4KP4y5QG0b3FGHI+zxQ60KLVEgzcTDZ5bZsP5wNQxxCzEEtgQtGro5XyVnNLbpNl2j5XBHjtaY3wyLvcqOhD0qzQZmy6lgecNlDwFfqy+qNjG3bAbz+gbf2UjQUjMQicg5I7R5vj8i/HkkM70jwgPkKfaorsvF22iIDTvaE4rblzF7W02DM+lojHvqUQlfOAgsO3woZfHM0lzwW84LRssPBFmlUjR6Ks9FeYHWZzS7Jk84EXtUO0RFbIwIVxpnaQxlJseq0eGoNJv9IWFanE3GM59C7xpT+KfmodtQtbh7HE/Joct0J+B/32fiTKuUUxpsq21YHGcar7CRJ1t5ZqS0dPCdVcswuUI4iXDtmKS0pSiPkitIHQ+aS84Mk1lIUaGo5QyyEns2q7mOB8SUAx8QcI2VnFCxMeJYVd3VJGRAf6spJdpNz+AiY/IBe8Mk10KitjXaywe2ZbMN02PvzMfJ4gZkJ0JFq7uqlsfa4IZkyxtxxJa9lykL6Roud9abBW4ibkDOFrXVrHaTa01u5vikU/EsHvZUrF5KgOOyWdOF/p1rItZYz5rK9CTwlakkUS/ZgtWVOdwhvjRgrZg+3LG9g+k4Fal3Gt5h0PJJqKK2Vshad3pHrHvSu9MztW6UcRJvp204Jtv+jrANfIG7vqk68kWiadej1L6E0QIWL6rYXsdrVSQEv4cJnw/ktthnWCFLsuKnaNm6izONrzbM3KIyeivYuh8OKO6p5jQENDJWhfVJEQ5AvdmJfCsQSe/CG7yUOZJznTZv4WDUJdiJeFJkzgJ4rB1aPP0P7qYM7onWHgjgneKqsGM0W9zVBfchRY7Vo8xxVfusTqKiD3A4Owe3FLmEBoMOyeblrlQnDtv2jDZbMINwxYKrMq9X5x3X4HJ7QGaGgfyqtlm98VLb8Hgjf8TKdJAlcfZIhoUlH3WsYBgMfAJ67uKxdZflTituCgmdNx92wWxJkHW2xVYYKL1n52FehUIREIkzyJ7PLdFvJRKFAgmiBUt3XNuwOOU7IJOrAAj7AYf09MROw2y31eFNEeDAm8mjSOr5mHmucdzVzRYhQX1qrEHrJ+z3Bzpy2+a6zhmZB83AlFrATBZrPjrONmzUuaxeMJvMCTIznZ4JvnUxnRafNGcjfHWzTD+JUz0FCbrPZpvLP7M5vrr5oSanBhbBzkHmAb63hXhg1gmqHMJqQ3fB4C6mFPcIM/SzV7y2tphQsB2RY5isiLwYTQn8i0MgE0N/rqu2IM7KCRfTi/sRxpa6xJSKbwVsVkpfDLE7LICaquMR7JDXysMQyx7bGS7GmAAtMhpya6A/J/bALS6YFz4+7wfYaNHY0U6CNwIrR30ghOpbARfCo9g3ArGV0IASkiUr6BAMItnaRNr7MDvQGn12Rb4+OYZtc+8QzrFdwjJnuuVNIvkVGY9dvAlXWKkLYRiLx2+VunBVEgrvsBgRiayxzA4SNlkWIG1s1VFSkwyyzat6w8j0HY4WUXIfiTJWja4WG8rmqpyG7Zwi4jQR7ITUXR7ygGpxMRMS5TmSp+1eJomsSbXM81iSK1VRnxxYSa0FOBrZ/fr7I2Jnm11kifwhgQbR6php+cZZeDQi9jiPELOfHacCV2yy+D2KX0K4RyWRGF4+Og9tKoV/t6ITjCKcCCOtGr5IH2rKZGd5iAt6n1SyqDAafrlV/+4eWATkP4UZf03j222j02T9hnSc0ZOMZVpPkgTi67GowylBVQVsbNHiU5W4QDby2MHzGMsl0YlQsir/MM0q7TC6xw6yFOqJaFyV9oUtB5aKLIkOsxRfFMehonNMKdbInB2WNxEBhmVGUsd+IHNZjsMbY7km2Huh6N3BVlvBG4MdYyzHuJItoYHDVyd+6b5+SCPDZoXq5ZxcHcSGikUMlWwJjB8Pfytv0YURZ61B9rKEpdq6hcYyOi4XJEuyZLQs9YM8MTyEbzAcC9pvs9559cN5vZN63Rm+amXShmVMrkIuA9wur3aUkfzA8Wy3Yl60Gn3EyA/nvUmU5sb69Pjq6IxJTHaBdNUdY+RUFTJ+4SGN4UGdAfKa/T6QWLYD6w4H/EOgf9nFLzprjSQFmc/h2MOIqJkrXdKmpmqVB3I1Fz2re5xPV88bWZGg2JTqAZNyOD9ZkTRyK1IYiaJu6fb1EwbYYFnU7QqLS7cylc+lTLiVSqEbUQbaLL9ZCZt60OZxLeotuctbJYtUHHAu4VOra3m8i9+SqL+TeSF12ojEIcNSlkj4TMiPVO4iHJj38iDrSQAtixeE7oeY4KyZof45jVSqvBY/2F8H2PPW6rARmycU7SOQDjlUsC9L4Nd3I24LnRCyt/5xBewy71R5uDRqmcCs+eKH7esMdlIujno6aixAvxl0mBe0y38z6rVKKYF5O+qZvV76r3ZGsHUu0tOlUbWUFz/qRMt/waoT+KOpS7++L4rHizuVr4p9KS7vrH75VcJeeKl3FwaGWVdx6cPOZLF/7ewunQkWoPuVOzx9eDNslMAk6uHil3aGlZf3hehI/nDo/8H83x9/Ah7ZogapOAAA"
+_CURRENCY_DATA = "H4sIAAAAAAACA83Wi5sT5b0H8N+LQBVBkZuiCBG0XCx3ARFwJ8lks9lksmEm2UsE5N1kNpndycwymdklKyBYbbHoQSqCrRQEvFGVYr3UolVUFOsFqUpFPd4raK1S8Qro6fnOzMLznP/g7PN83pnMvNffe5lNNYXDt1IrY3TqfcOy+VmfVc3p88bW9qUpocX960gLj3z14+uLz18oVE1bsDN2zQ0CuX+B9f51V6fwr7mPDr/us++qpnp/x6u85/TvqvRHd962O3DA/71rgTB23uqnvxlDfjnqviZXCCfye+21nCfMfOj5jic2Hasa8PNdL2yOjBE27A7ssD4ZLLil563+2q+v/W6/XOgPfvu5FcKKW8Kr9EPf+P2f88+ql1/C38gbhBc3RzCE8wTv8VX3C3e0I8eorpPlvkWtT+9fdrIfCz/eN/LtoZf479uGdo+3Rfiga9D2KK87mc+r/6Vo9+8Jwh9/d/ju51ZNEoprPl9SlckJbnN93mDd72VBdsM0t5fgl7vQ78fW4f83Du+3CseWtT5uK5cJ1wfdnozw+1G2/fqiVwrj3YY66oVnEI6rQ/v8ctf8w792rBV2xvr2uPiXp3XXl/PL35wTzvAKHqzCKD7ouuNqvx/DFvr5Vq8TvHA/8lrVF0sw029lvOe73vzm5LhOxOGV7xTM7ODu9h7wr/NuE16Tmvs3zuzfPe4Jfn0Hw347faPC20cxsK8nC4vcYe/oru+Fe4Wn3GanjvTGs3pLd3zX3ufH+ygXvP7sPO7HOxHy39+zTnhi07kT37nwRBwP+O+XLBLc6Tu6rL+3Xjb89s9CYoYbyT7C9263bUnwpuHRvsII9zK8n+DFY1Ct8Lh98zk968/y19/V6ZPt+PN3huCtq88bhT1xVHj7xYK33B+ccXJdevVtHOHn//4Bf//Ul4WNCF/8UMjvb36kcORVN1Cf+ut4ybNC6dDxbV/KVX7+lpF++f5b/f1yT5WwxV2+r/cQ6r0J7C1csMPCEjvdz3f5fX6+cyJ+vxb289fHc4eqvPW2Jiy4w3vI3OOP+/n5wpt7MYF/tfz5vf9NQcSuOb6tl1/f8uXd450uDO2JFgfMFE6cC//frz3oFOpJvag3/YROpdOoD51OfakfnUFnUn86iwbQQBpEg2kInU3n0FA6l86jYXQ+Dcf9CAog5wU0kkbRhXQRnvyURiMdQ2NpHF1MP8P9eJpAE2kSTaYpNJUuoWk0nWbQpTSTLsPbWTSb5tDlVIWDLUghlAqTiOcRqkYapRq0HqNailOCJNwnqQ75UzQXOWVSKE0ZqqcGaqQmytIVNI/m0wK6EnkWEkf+ZspRnlRqoQIVSaNWaiOdSmSQSe20iCy0UiabHOqgTlpMFeqiq2gJLaVldDUtRysr6Brk+TldS9fRL+iXuF9J19OvaBXdQDfSf9FquonW0K/pZlpLt9A6Wk+3Iia/od/SbbSBfof8G2kT3U6baQueb6U76E66i+6me2gb/Z7upfvofjzfTn+gHfQA/RH9fJAeoofpEfoTyj5Kf8bbnfQYPU5/oSfoSdpFT9HT9AztpmfpOdpDz9Nf6QX04UV6CeN9mfbSK7SP/kav0mv0Ou2nv9MbdIDepLfobfpvegc536X3UPP79AF9SB/RP+hjOkiHELdP6FP0/5/0GfL8iz6nL+gw/Zu+pCP0FX1N39C3qP87+p6O0jE6Tj/Qj/Q/9B8ixlgPdgrryXqx3uwnbA6dyk5jP1AfdjrrR31ZP3YTncHOZP3ZWWwAG0oD2SCkg9kQdjY7hw3F23PZeXgyjJ3PbqThbARqCLALWIFGslF4fiG7iP2UjWZj2D00lo1jF7OfsfFsApvIJqH+yWwKm8ouYdPwdjqbwS5lM9llbD/NYrNRwxx2ORtIVUxgOyjIQizMRBZh1SzKaliM1bI4SzCJJdk6qmMpNpfJTGFp1oMyrCf1oHovbfDSRi9t8tKsl17hpfO8dL6XLvDSK710oZdyL2320pyX5r1U9dIWLy14adFLNaQn/vpAPxgC58L5MAYmwhSYCbPBPRCrIe5+DiENWZgPLdAKJbBhMVwF18Kv4EZYDxtgE9wF22AHPAh/gadgN7wEr8B+OADvwEH41P2qw1dwDE5hRL2hL5wFg2AYBGAUjIXxMAmmw0wQIAI1kII0NMCV0AxFaIMKLIEVcC1cD2tgLWyATXAXbIPt8AA8BrvgGdgDe+Fv8B58DJ/AYfgavoP/QI8e6DecDcPhIhgD42EKTIPZEAQREpCBRlgIeShAGxhgQxcshWthJayCm2AtrIfb4W74PfwJdsIueAZehFdhP7wLH8An8AV8Cd/Djz3c4BP1gj7QD4bAMBgBo2A0jIMJMBlmwBwQIAq1UAcyZOAKWABFKEE7OLAUlsN1sBJWwRpYCxthM9wB98J2eBgegyfgWXgeXoZ98Ba8Dx/Bp3AYjsAxcLdDT+gLA2EIBGA0jIOpMB1mQxVUQwwSkIYszIc8tEIJOmEZrICVcAOshrWwHrbAnbAdHoZH4UnYDXvgZdgHr8Mb8B58CEfgWzgKrBfRqXA6nAkDYDAEYBSMhQkwGabDLLgcmmABcCiCCRYshqWwHH4B18MtcCtshM1wL2yHnfAkPA0vwl54B96Hz+Ao/AC9eqOP0B8GwlAYBqNhHEyEKXApzIIIxCEJ9dAEHFQoQgls6IRlsAJuhHXwG9gEW2Ab7IAHYQ+8AAfgbfgQPobDcASOwo+Af03oNBgKw2AUjIZxMANmweUQhmpIQD00AQcVdCjDVXANrITVsA42wFbYBjvgYXgMdsNeeA3ehYPwBXwLx2HKpCnTxk+eMn7q5EhGjjiWGciahureBKuTwZZCkRta2eZG920wkQjqzbjhCbVNzIpBvaBaGhc1g1vBumDQKJg6j3dyo4sHZSVoFVTDxruUWjaDkhi0SiqKihYvBTNi0CnbFtfx29R1FM8mg12q1cy1Vm5I3OB2SBFDvMhLvByqce8srhkhMR3iRkHnebVcTPM2HgrhFUrlzXIoK4ZUXetSG+uqQ2jICLfwQLXFjVxIwhur5OR5qK4+ZOpah8a7L4YZCkohs4x+SdxCfQ2pkGmXMQSecnQekhMhi3dpuqxyPZQUQ5ZjqFooVh1ycJfXvOrjNXKYl5rNvMZlTdUbg9X4qVqmaYSDYhg15Xm8CTeVEjcCsbLOjXw5nKgOFzVdDSebcDW4rBolzWjWwnWZsKmbpWaNx6XqsFkyLbMcFnGH2IblcNjEdARkLcfdbEY4kwo7zTxc5B2abYaz8XCXmisGZLXdada1XNxEL7kYj4uoHsOLW5hdsbZabNWaTcfWGsOiaKJdVGecLJRRxEjOQUQtzAy31HIkmooUKu12ysSQI3IyYmm2pfIkb2vhSjYRQbQwy1pCw8gw41okHYrYRc1sR5Q1y6quFau1Vi0qiVHujkvkOi9r0UgiqppWAUuJW1q0RoligfGwmtei6blRh9tqCfnmOqrdxfVosjrqaIbKAyGtXOZOtEmMOhXkr0kmakwj71i8nFBL7ZrFa+IinhQCcSQ1meoaxyhwq1JtWpphx5R4LKe68XcDwWNJOWa4k+a0q2pMdH8gPGXvgcaLMVmOYXpljeuxuSJuF8USSqxscVVXimqbqtdKYi2WJ4JXm2qq5e3caFKN2jqx1rTy3Ihn03HexduK7v5Jq4hMPKLEVaPCFUy8rhmFuNyACVJ5g2nEG8S408k1Ox5V4hWrUOlySylmKRFKJVTsONPIBuUE9pFdNCWum7aWkMWE1uxuv0STe1fhUjQoYa0VeDmH/YQXVkVqiCM379SwKXNFLjXJ7s+KO0Z0oKDZUr37JK91qGXZadEqnEtyRuIOptjd5nVOwcFDKSP7zzSnLDXWS+piLWdKYkIy9bzZgcPAkZJpyV2i2M9pp2BpbVJQlLB2czlT1CzsYimblMwudwEsclRJtRE1XZLiEmYRKzNe4XYyJSfVdq4ns2JS7QxkseMwU8lYXRJ5LV5wsOStvNnMk9FkUvMOniTHjCfr4knT6uSVOkmuwxZLxeUUb/OOrVQ0nuLtDg+4FforKO6eR03RlF9jBSsNc6ylIsmUajmKqadqUinMj9bejtzlVCKZMt1uZBHyytygPJfb3JIREl2Kiyd2TKCuJYAu2MWAxHMqFhEWuYojUa5LymbJjaPbPqIkZ0KyU/ZWWLOuyg3VMg6aPFdwWHInrwWCFscGkRVRwUmocSUsK2olV1R1XS0riYiiqZbFURGWqZcoUVHBPPJ2LCMlJCruyWGePGMUJaVglxcDCk4+w0vUshrwtnEiLiuWFkhwo40rsqhgcg0cWkokrnSqedUI1zQonZqNE9mtSmlKKRXEO90gprmGPqdrlTRv1fwoK26jWjqLRzj4Mdp0TShd5O5xkMe5bafrUmmsDZ7io/GF4OmkmHbwWUE+KZ12rDb3q+DW4wbJO/kz0cZMwQ1MJliTaXPPfbXGqnSg5mBEzBiarea9UAUiJcy/rZajoVT3Y0xvIW+WMk0NGctxJziTVTJdzarf0/pMfT03cLg49a6IWK8aapeDI8H7HHAroJjYUthu9UmxXlNtxERE1xuUdINatlXLCCi8ZPI0lmZTRG5S0fWs1JD1zjW3+/42yzZEs1qpmTd3qlHsEO9Lh7NQ1QuaUwo5Ok4kjYctE8cmD1faLaccKdvuqqnWDDdo3ldFjeKTxY1K1FLVnBqzvHMrZnO9kuA2vlwJzS463qfYWazi6+NYBexkG92wi/6slVNYk06B64qOTdqG9YSr+wVW2hHS/wX5sDdPARYAAA=="
 
 # Unit abbreviation to full English name mapping
 _UNIT_NAMES = {
@@ -692,7 +1039,21 @@ _UNIT_NAMES = {
     
     # Power units
     'w': 'watts',
+    'kw': 'kilowatts',
     'hp': 'horsepower',
+    
+    # Energy units
+    'j': 'joules',
+    'kj': 'kilojoules',
+    'cal': 'calories',
+    'kcal': 'kilocalories',
+    'wh': 'watt-hours',
+    'kwh': 'kilowatt-hours',
+    'btu': 'british thermal units',
+    
+    # Data units
+    'bit': 'bits',
+    'byte': 'bytes',
 }
 
 # Timezone data: key -> (full_name, UTC offset in hours)
@@ -848,20 +1209,22 @@ def _matches_search(unit_abbrev, unit_full_name, search_term):
         search_lower in unit_full_name_lower):
         return True
     
-    # Fuzzy matching for typos (similarity threshold of 0.6)
-    abbrev_similarity = difflib.SequenceMatcher(None, search_lower, unit_abbrev_lower).ratio()
-    name_similarity = difflib.SequenceMatcher(None, search_lower, unit_full_name_lower).ratio()
-    
-    # Also check if search term is similar to any word in the full name
-    name_words = unit_full_name_lower.split()
-    word_similarities = [difflib.SequenceMatcher(None, search_lower, word).ratio() for word in name_words]
-    max_word_similarity = max(word_similarities) if word_similarities else 0
-    
-    # Return True if any similarity score is above threshold
+    # Fuzzy matching for typos (similarity threshold of 0.6), against the
+    # abbreviation, the full name and each word of the full name
     similarity_threshold = 0.6
-    return (abbrev_similarity >= similarity_threshold or 
-            name_similarity >= similarity_threshold or
-            max_word_similarity >= similarity_threshold)
+    for text in [unit_abbrev_lower, unit_full_name_lower] + unit_full_name_lower.split():
+        if _is_similar(search_lower, text, similarity_threshold):
+            return True
+    return False
+
+def _is_similar(search, text, threshold):
+    """Check if the difflib similarity ratio of two strings reaches the threshold.
+    
+    The cheap upper bounds of the ratio are checked first, so most strings are
+    rejected without computing the full ratio."""
+    matcher = difflib.SequenceMatcher(None, search, text)
+    return (matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold
+            and matcher.ratio() >= threshold)
 
 # Top currencies to show in units() when not searching
 _TOP_CURRENCIES = ['$usd', '$eur', '$gbp', '$jpy', '$cad', '$aud', '$chf', '$cny']
@@ -877,6 +1240,19 @@ def _generate_units_lines(search="", categories=None):
     Returns:
         list: Array of strings representing the units display
     """
+    # Searches (mostly "did you mean" suggestions for a misspelled unit) are
+    # cached, as the fuzzy matching scans every unit, currency and timezone
+    if search:
+        key = (search.lower(), tuple(categories) if categories is not None else None)
+        lines = _suggestion_cache.get(key)
+        if lines is None:
+            lines = _generate_units_lines_uncached(search, categories)
+            _suggestion_cache.put(key, lines)
+        return list(lines)
+    return _generate_units_lines_uncached(search, categories)
+
+def _generate_units_lines_uncached(search="", categories=None):
+    """Generate the lines for _generate_units_lines without using the suggestion cache."""
     lines = [""]
     
     # Get all categories plus timezone
@@ -1006,81 +1382,649 @@ def _get_conversion_factor(from_unit, to_unit):
         to_unit (str): Target unit (category.unit format)
         
     Returns:
-        float or function: Conversion factor or function, or None if no direct conversion exists
+        float or _Affine: Conversion factor or affine transform, or None if no direct conversion exists
     """
     # Check forward direction
     if (from_unit, to_unit) in _CONVERSION_MATRIX:
         return _CONVERSION_MATRIX[(from_unit, to_unit)]
     
-    # Check reverse direction (invert the factor or find reverse function)
+    # Check reverse direction (invert the factor or transform)
     if (to_unit, from_unit) in _CONVERSION_MATRIX:
-        factor_or_func = _CONVERSION_MATRIX[(to_unit, from_unit)]
-        if callable(factor_or_func):
-            # For functions, we need to look up the reverse function
-            # This is handled in the conversion matrix with bidirectional entries
-            return None  # Let the search continue to find the proper reverse function
-        else:
-            return 1 / factor_or_func
+        return _invert_conversion(_CONVERSION_MATRIX[(to_unit, from_unit)])
     
     return None
 
+def _invert_conversion(factor_or_affine):
+    """Get the conversion factor or affine transform for the reverse direction."""
+    if isinstance(factor_or_affine, _Affine):
+        return factor_or_affine.inverse()
+    return 1 / factor_or_affine
+
+# Adjacency index over the conversion matrix (initialized lazily)
+# Maps each internal unit to a list of (connected_unit, conversion_factor_or_affine)
+# tuples, with the inverses of reverse edges already computed. Entries keep the
+# order of _CONVERSION_MATRIX so searches visit units exactly as a full scan would.
+_adjacency_index = None
+_adjacency_version = None
+
+# Number of edits made through _add_conversion (part of the matrix version)
+_matrix_edits = 0
+
+def _matrix_version():
+    """Get a token that changes whenever the conversion matrix changes.
+    
+    Edits made through _add_conversion bump the edit counter; the matrix size
+    also catches entries added to _CONVERSION_MATRIX directly."""
+    return (_matrix_edits, len(_CONVERSION_MATRIX))
+
+def _index_edge(index, unit1, unit2, factor_or_affine):
+    """Add both directions of a conversion matrix entry to an adjacency index."""
+    if unit1 not in index:
+        index[unit1] = []
+    if unit2 not in index:
+        index[unit2] = []
+    index[unit1].append((unit2, factor_or_affine))
+    index[unit2].append((unit1, _invert_conversion(factor_or_affine)))
+
+def _get_adjacency_index():
+    """Get the adjacency index for the conversion matrix, rebuilding it if the matrix changed."""
+    global _adjacency_index, _adjacency_version
+    
+    version = _matrix_version()
+    if _adjacency_index is None or _adjacency_version != version:
+        index = {}
+        for (unit1, unit2), factor_or_affine in _CONVERSION_MATRIX.items():
+            _index_edge(index, unit1, unit2, factor_or_affine)
+        _adjacency_index = index
+        _adjacency_version = version
+    
+    return _adjacency_index
+
+def _add_conversion(unit1, unit2, factor_or_affine):
+    """
+    Add a conversion to the matrix and patch the derived indexes in place.
+    
+    Indexes that are current are updated incrementally; replacing an existing
+    entry changes the matrix version so they are rebuilt on next use instead.
+    
+    Args:
+        unit1 (str): Source unit (category.unit format)
+        unit2 (str): Target unit (category.unit format)
+        factor_or_affine: Factor such that unit1 * factor = unit2, or an _Affine
+            transform for units with an offset
+    """
+    global _matrix_edits, _adjacency_version, _base_unit_version, _alias_version
+    
+    previous_version = _matrix_version()
+    is_new = (unit1, unit2) not in _CONVERSION_MATRIX
+    # A new unit hanging off a known one (with a name that did not already resolve
+    # to another unit) cannot change any conversion that was resolved before
+    new_units = [unit for unit in (unit1, unit2) if unit not in _unit_registry.units]
+    is_leaf = (_unit_registry.version == previous_version and len(new_units) == 1
+               and _alias_index is not None and _alias_version == (previous_version, len(_UNIT_NAMES))
+               and _get_unit_name(new_units[0]).lower() not in _alias_index
+               and _get_unit_name(new_units[0]) not in _get_external_to_internal_mapping())
+    _CONVERSION_MATRIX[(unit1, unit2)] = factor_or_affine
+    _matrix_edits += 1
+    if not is_new:
+        return
+    
+    version = _matrix_version()
+    if is_leaf:
+        for cache in (_conversion_cache, _dimension_cache, _transform_cache):
+            if cache.version == previous_version:
+                cache.version = version
+    if _adjacency_index is not None and _adjacency_version == previous_version:
+        _index_edge(_adjacency_index, unit1, unit2, factor_or_affine)
+        _adjacency_version = version
+    
+    if _base_unit_table is not None and _base_unit_version == previous_version:
+        if _patch_base_unit_table(_base_unit_table, unit1, unit2, factor_or_affine):
+            _base_unit_version = version
+    
+    if _unit_registry.version == previous_version:
+        _unit_registry.add(unit1)
+        _unit_registry.add(unit2)
+        _unit_registry.version = version
+    
+    if _external_to_internal_cache is not None:
+        for unit in (unit1, unit2):
+            if '.' in unit:
+                _external_to_internal_cache[_get_unit_name(unit)] = unit
+    
+    if _alias_index is not None and _alias_version == (previous_version, len(_UNIT_NAMES)):
+        for unit in (unit1, unit2):
+            if '.' in unit:
+                # Unit names outrank long-name aliases, as in _build_alias_index
+                key = _get_unit_name(unit).lower()
+                existing = _alias_index.get(key)
+                if existing is None or _get_unit_name(existing).lower() != key:
+                    _alias_index[key] = unit
+        _alias_version = (version, len(_UNIT_NAMES))
+
 def _get_connected_units(unit):
     """
     Get all units that can be directly converted from the given unit.
     
+    Uses the adjacency index, so the cost is proportional to the number of
+    connections rather than the size of the conversion matrix.
+    
     Args:
         unit (str): The unit to find connections for (category.unit format)
         
     Returns:
-        list: List of (connected_unit, conversion_factor_or_function) tuples
+        list: List of (connected_unit, conversion_factor_or_affine) tuples
     """
-    connections = []
+    return _get_adjacency_index().get(unit, [])
+
+class _LRUCache:
+    """
+    Bounded least-recently-used cache with hit, miss and eviction counters.
     
-    # Check all matrix entries for connections
-    for (unit1, unit2), factor_or_func in _CONVERSION_MATRIX.items():
-        if unit1 == unit:
-            connections.append((unit2, factor_or_func))
-        elif unit2 == unit:
-            if callable(factor_or_func):
-                # For functions, we don't invert - the reverse should be explicitly defined
-                continue
-            else:
-                connections.append((unit1, 1/factor_or_func))
-    
-    return connections
-
-import ast
-import keyword
-import re
-
-def _escape_keywords(unit_str):
-    """Escape Python keywords and special characters in a unit string for parsing."""
-    escaped_str = unit_str
-    escaped_keywords = {}
-    
-    # Escape $ (currency prefix) - replace $xxx with _dollar_xxx
-    dollar_pattern = r'\$([a-zA-Z]+)'
-    for match in re.finditer(dollar_pattern, escaped_str):
-        original = match.group(0)  # e.g., $USD
-        code = match.group(1)  # e.g., USD
-        replacement = f'_dollar_{code}'
-        escaped_keywords[replacement] = original
-    escaped_str = re.sub(dollar_pattern, r'_dollar_\1', escaped_str)
-    
-    # Escape Python keywords
-    for kw in keyword.kwlist:
-        pattern = r'\b' + kw + r'\b'
-        if re.search(pattern, escaped_str):
-            replacement = f'{kw}_escaped_unit_'
-            escaped_keywords[replacement] = kw
-            escaped_str = re.sub(pattern, replacement, escaped_str)
-    return escaped_str, escaped_keywords
-
-def _unescape_keywords(text, escaped_keywords):
-    """Restore escaped keywords and special characters back to their original form."""
-    for replacement, original in escaped_keywords.items():
-        text = text.replace(replacement, original)
-    return text
+    A versioned cache is tied to the conversion matrix: the first access after
+    the matrix changes empties it, so stale entries are never returned.
+    """
+    
+    def __init__(self, maxsize, versioned=True):
+        self.maxsize = maxsize
+        self.versioned = versioned
+        self.version = None
+        self.data = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def _check_version(self):
+        """Empty the cache if the conversion matrix changed since it was filled."""
+        if self.versioned:
+            version = _matrix_version()
+            if version != self.version:
+                self.data.clear()
+                self.version = version
+    
+    def get(self, key, default=None):
+        """Get a cached value, marking it as most recently used."""
+        self._check_version()
+        if key in self.data:
+            # Re-insert so the dictionary order runs from least to most recently used
+            value = self.data.pop(key)
+            self.data[key] = value
+            self.hits += 1
+            return value
+        self.misses += 1
+        return default
+    
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full."""
+        self._check_version()
+        if key in self.data:
+            del self.data[key]
+        elif len(self.data) >= self.maxsize:
+            del self.data[next(iter(self.data))]
+            self.evictions += 1
+        self.data[key] = value
+    
+    def clear(self):
+        """Remove all entries (the counters are kept)."""
+        self.data.clear()
+    
+    def __len__(self):
+        return len(self.data)
+
+# Base-unit table compiled from the conversion matrix (initialized lazily)
+# Each connected group of units (a category) is compiled once from a spanning tree
+# into internal unit -> (base_unit, to_base, from_base), where the affine transforms
+# convert a value in the unit to the group's base unit and back. The transforms
+# hold exact fractions, so the path taken through the group cannot add rounding. Both directions are
+# composed from the stored edges so no conversion pays for a double inversion. Converting between two
+# units is then two affine operations instead of a graph search.
+_base_unit_table = None
+_base_unit_version = None
+
+def _as_affine(factor_or_affine):
+    """Get a matrix entry (a factor or an _Affine) as an exact affine transform."""
+    if isinstance(factor_or_affine, _Affine):
+        return _to_fraction(factor_or_affine)
+    return _Affine(_to_fraction(factor_or_affine), _to_fraction(0))
+
+def _get_exact_edge(unit1, unit2):
+    """Get the exact transform of a matrix entry in either direction.
+    
+    Reverse entries are inverted after conversion to fractions, so the inverse
+    of 2.54 is exactly 50/127."""
+    if (unit1, unit2) in _CONVERSION_MATRIX:
+        return _as_affine(_CONVERSION_MATRIX[(unit1, unit2)])
+    return _as_affine(_CONVERSION_MATRIX[(unit2, unit1)]).inverse()
+
+def _link_base_unit(table, unit, next_unit, edge):
+    """Record next_unit in the table given the exact edge unit -> next_unit from a known unit."""
+    base_unit, to_base, from_base = table[unit]
+    table[next_unit] = (base_unit, edge.inverse().then(to_base), from_base.then(edge))
+
+def _compile_base_units(table, adjacency, start):
+    """Compile every unit reachable from start into the table.
+    
+    The best connected unit of the group becomes its base unit, so units with a
+    direct conversion to that hub use the stored factor rather than a longer path."""
+    members = [start]
+    seen = {start}
+    position = 0
+    while position < len(members):
+        for next_unit, _ in adjacency.get(members[position], []):
+            if next_unit not in seen:
+                seen.add(next_unit)
+                members.append(next_unit)
+        position += 1
+    root = start
+    for unit in members:
+        if len(adjacency.get(unit, [])) > len(adjacency.get(root, [])):
+            root = unit
+    
+    table[root] = (root, _Affine(_to_fraction(1), _to_fraction(0)), _Affine(_to_fraction(1), _to_fraction(0)))
+    queue = [root]
+    position = 0
+    while position < len(queue):
+        unit = queue[position]
+        position += 1
+        for next_unit, _ in adjacency.get(unit, []):
+            if next_unit not in table:
+                _link_base_unit(table, unit, next_unit, _get_exact_edge(unit, next_unit))
+                queue.append(next_unit)
+
+def _get_base_unit_table():
+    """Get the base-unit table for the conversion matrix, recompiling it if the matrix changed."""
+    global _base_unit_table, _base_unit_version
+    
+    version = _matrix_version()
+    if _base_unit_table is None or _base_unit_version != version:
+        adjacency = _get_adjacency_index()
+        table = {}
+        for unit in adjacency:
+            if unit not in table:
+                _compile_base_units(table, adjacency, unit)
+        _base_unit_table = table
+        _base_unit_version = version
+    
+    return _base_unit_table
+
+def _patch_base_unit_table(table, unit1, unit2, factor_or_affine):
+    """
+    Add a new matrix entry to a compiled base-unit table.
+    
+    Returns:
+        bool: True if the table was patched, False if it must be recompiled
+    """
+    if unit1 in table and unit2 in table:
+        # Both units already reach a base unit; a second path changes nothing
+        # unless it joins two separate groups
+        return table[unit1][0] == table[unit2][0]
+    edge = _as_affine(factor_or_affine)
+    if unit1 in table:
+        _link_base_unit(table, unit1, unit2, edge)
+        return True
+    if unit2 in table:
+        _link_base_unit(table, unit2, unit1, edge.inverse())
+        return True
+    table[unit1] = (unit1, _Affine(_to_fraction(1), _to_fraction(0)), _Affine(_to_fraction(1), _to_fraction(0)))
+    _link_base_unit(table, unit1, unit2, edge)
+    return True
+
+# Cache of (from_unit, to_unit) internal units -> (exact transform, float transform),
+# or False for units that are not connected
+_transform_cache = _LRUCache(256)
+
+def _get_affine_transform(from_unit, to_unit):
+    """
+    Get the affine transform between two internal units from the base-unit table.
+    
+    The transform is derived from the exact one (see _get_exact_transform), so
+    each float is rounded once, however many conversions it was composed from.
+    
+    Args:
+        from_unit (str): Source unit (category.unit format)
+        to_unit (str): Target unit (category.unit format)
+        
+    Returns:
+        tuple: (scale, offset) such that to_value = from_value * scale + offset,
+               or None if the units are not connected
+    """
+    transforms = _get_transforms(from_unit, to_unit)
+    return transforms and transforms[1]
+
+def _get_exact_transform(from_unit, to_unit):
+    """
+    Get the exact affine transform between two internal units.
+    
+    Returns:
+        tuple: (scale, offset) as Fractions, or None if the units are not connected
+        
+    Examples:
+        _get_exact_transform('distance.mi', 'distance.in')    # (Fraction(63360, 1), Fraction(0, 1))
+    """
+    transforms = _get_transforms(from_unit, to_unit)
+    return transforms and transforms[0]
+
+def _get_transforms(from_unit, to_unit):
+    """Get (exact transform, float transform) between two internal units (cached), or None."""
+    key = (from_unit, to_unit)
+    transforms = _transform_cache.get(key)
+    if transforms is None:
+        exact = _compose_transform(from_unit, to_unit)
+        transforms = exact and (exact, _round_transform(exact))
+        _transform_cache.put(key, transforms or False)
+    return transforms or None
+
+def _round_transform(transform):
+    """Get an exact (scale, offset) as floats, keeping a whole-number shift (like the identity
+    or a timezone change) as ints so whole values stay whole."""
+    scale, offset = transform
+    if scale == 1 and offset == int(offset):
+        return (1, int(offset))
+    return (float(scale), float(offset))
+
+def _compose_transform(from_unit, to_unit):
+    """Compose the exact (scale, offset) between two internal units, or None if they are not connected."""
+    if from_unit == to_unit:
+        return (_to_fraction(1), _to_fraction(0))
+    
+    # Prefixed units convert through their base units
+    from_base, from_decimal, from_binary = _split_prefixed_unit(from_unit)
+    to_base, to_decimal, to_binary = _split_prefixed_unit(to_unit)
+    if from_base != from_unit or to_base != to_unit:
+        transform = _get_exact_transform(from_base, to_base)
+        if transform is None:
+            return None
+        from_scale = _to_fraction(10) ** from_decimal * 2 ** from_binary
+        to_scale = _to_fraction(10) ** to_decimal * 2 ** to_binary
+        return (transform[0] * from_scale / to_scale, transform[1] / to_scale)
+    
+    # A direct conversion in the matrix is authoritative
+    if (from_unit, to_unit) in _CONVERSION_MATRIX or (to_unit, from_unit) in _CONVERSION_MATRIX:
+        transform = _get_exact_edge(from_unit, to_unit)
+        return (transform.scale, transform.offset)
+    
+    table = _get_base_unit_table()
+    if from_unit not in table or to_unit not in table:
+        return None
+    from_base, from_to_base, _ = table[from_unit]
+    to_base, _, to_from_base = table[to_unit]
+    if from_base != to_base:
+        return None
+    transform = from_to_base.then(to_from_base)
+    return (transform.scale, transform.offset)
+
+def _get_base_unit_path(unit):
+    """Get the units from a unit's base unit down to the unit, as compiled into the base-unit table."""
+    table = _get_base_unit_table()
+    if unit not in table:
+        return [unit]
+    root = table[unit][0]
+    adjacency = _get_adjacency_index()
+    # Repeat the compile's breadth-first walk from the base unit to recover the parents
+    parents = {root: None}
+    queue = [root]
+    position = 0
+    while position < len(queue) and unit not in parents:
+        current = queue[position]
+        position += 1
+        for next_unit, _ in adjacency.get(current, []):
+            if next_unit not in parents:
+                parents[next_unit] = current
+                queue.append(next_unit)
+    path = []
+    while unit is not None:
+        path.append(unit)
+        unit = parents.get(unit)
+    return path[::-1]
+
+def _get_conversion_route(from_unit, to_unit):
+    """
+    Describe how _compose_transform connects two internal units.
+    
+    Returns:
+        tuple: (method, path) where method is 'same', 'prefix', 'direct' or
+               'table', and path lists the internal units the transform was
+               composed through
+    """
+    if from_unit == to_unit:
+        return ('same', [from_unit])
+    
+    from_base = _split_prefixed_unit(from_unit)[0]
+    to_base = _split_prefixed_unit(to_unit)[0]
+    if from_base != from_unit or to_base != to_unit:
+        path = _get_conversion_route(from_base, to_base)[1]
+        if from_base != from_unit:
+            path = [from_unit] + path
+        if to_base != to_unit:
+            path = path + [to_unit]
+        return ('prefix', path)
+    
+    if (from_unit, to_unit) in _CONVERSION_MATRIX or (to_unit, from_unit) in _CONVERSION_MATRIX:
+        return ('direct', [from_unit, to_unit])
+    
+    # The transform goes through the base unit; below the units' common
+    # ancestor the two halves cancel exactly, so the path starts there
+    from_path = _get_base_unit_path(from_unit)
+    to_path = _get_base_unit_path(to_unit)
+    common = 0
+    while common < min(len(from_path), len(to_path)) and from_path[common] == to_path[common]:
+        common += 1
+    return ('table', from_path[common - 1:][::-1] + to_path[common:])
+
+# Unit expressions are parsed into nested tuples by a small recursive-descent parser,
+# which needs neither ast nor re and so also runs on MicroPython:
+#   ('unit', name), ('number', value), ('neg', operand), ('pos', operand) and
+#   (operator, left, right) for the operators '*', '/', '**', '+' and '-'
+# Unit names are any run of letters, digits, _, $ and non-ASCII characters, so
+# '$usd', 'in' and '\u00b5s' are plain names. Powers can be written with ** or ^. '+' and '-' are parsed only so that
+# expressions using them can be reported as unsupported.
+_BINARY_OPERATORS = ('*', '/', '**', '+', '-')
+
+def _is_name_char(char):
+    """Check if a character can be part of a unit name."""
+    return char.isalpha() or char.isdigit() or char in '_$' or ord(char) > 127
+
+def _tokenize_unit_expression(text):
+    """Split a unit expression into ('name' | 'number' | 'op', text) tokens, or None if it has invalid characters."""
+    tokens = []
+    position = 0
+    length = len(text)
+    while position < length:
+        char = text[position]
+        if char in ' \t':
+            position += 1
+        elif char == '*' and text[position + 1:position + 2] == '*':
+            tokens.append(('op', '**'))
+            position += 2
+        elif char == '^':
+            # m^2 is the usual way to write powers outside Python
+            tokens.append(('op', '**'))
+            position += 1
+        elif char in '*/+-()':
+            tokens.append(('op', char))
+            position += 1
+        elif char.isdigit() or char == '.':
+            start = position
+            while position < length and (text[position].isdigit() or text[position] == '.'):
+                position += 1
+            tokens.append(('number', text[start:position]))
+        elif _is_name_char(char):
+            start = position
+            while position < length and _is_name_char(text[position]):
+                position += 1
+            tokens.append(('name', text[start:position]))
+        else:
+            return None
+    return tokens
+
+def _parse_unit_expression(text):
+    """
+    Parse a unit or unit expression in a single pass.
+    
+    Operators have Python's precedence: ** (or ^) binds tightest (and takes a
+    signed exponent), then * and /, then + and -.
+    
+    Returns:
+        tuple: The expression tree, or None if the text is not a valid expression
+        
+    Examples:
+        _parse_unit_expression('mi/h')      # ('/', ('unit', 'mi'), ('unit', 'h'))
+        _parse_unit_expression('m**-2')     # ('**', ('unit', 'm'), ('neg', ('number', 2)))
+    """
+    tokens = _tokenize_unit_expression(text)
+    if not tokens:
+        return None
+    position = 0
+    
+    def peek():
+        return tokens[position] if position < len(tokens) else (None, None)
+    
+    def parse_binary(operators, parse_operand):
+        """Parse a left-associative chain of operands joined by the given operators."""
+        nonlocal position
+        left = parse_operand()
+        while left is not None and peek() in operators:
+            operator = tokens[position][1]
+            position += 1
+            right = parse_operand()
+            if right is None:
+                return None
+            left = (operator, left, right)
+        return left
+    
+    def parse_sum():
+        return parse_binary((('op', '+'), ('op', '-')), parse_product)
+    
+    def parse_product():
+        return parse_binary((('op', '*'), ('op', '/')), parse_unary)
+    
+    def parse_unary():
+        nonlocal position
+        if peek() in (('op', '-'), ('op', '+')):
+            sign = 'neg' if tokens[position][1] == '-' else 'pos'
+            position += 1
+            operand = parse_unary()
+            return operand and (sign, operand)
+        return parse_power()
+    
+    def parse_power():
+        nonlocal position
+        base = parse_atom()
+        if base is not None and peek() == ('op', '**'):
+            position += 1
+            exponent = parse_unary()
+            return exponent and ('**', base, exponent)
+        return base
+    
+    def parse_atom():
+        nonlocal position
+        kind, token = peek()
+        position += 1
+        if kind == 'name':
+            return ('unit', token)
+        if kind == 'number':
+            try:
+                return ('number', float(token) if '.' in token else int(token))
+            except ValueError:
+                return None
+        if token == '(':
+            inner = parse_sum()
+            if inner is None or peek() != ('op', ')'):
+                return None
+            position += 1
+            return inner
+        return None
+    
+    tree = parse_sum()
+    if position != len(tokens):
+        return None
+    return tree
+
+class _UnitExpression:
+    """A parsed unit string: its expression tree (None if it does not parse), unit names,
+    combined flag and canonical spelling (see _get_canonical_unit_text)."""
+    __slots__ = ('tree', 'units', 'combined', 'canonical')
+    
+    def __init__(self, tree, units, combined, canonical):
+        self.tree = tree
+        self.units = units
+        self.combined = combined
+        self.canonical = canonical
+
+def _get_canonical_unit_text(tree, unit_str):
+    """
+    Spell a unit expression in a canonical normal form.
+    
+    The expression is flattened into a constant and a map of unit names to
+    exponents, written with the names sorted, so equivalent spellings of an
+    expression get the same text. Expressions that cannot be flattened (like
+    'm+s') keep their own text.
+    
+    Examples:
+        _get_canonical_unit_text(_parse_unit_expression('lb*ft'), 'lb*ft')      # 'ft*lb'
+        _get_canonical_unit_text(_parse_unit_expression('m/s/s'), 'm/s/s')      # 'm*s**-2'
+        _get_canonical_unit_text(_parse_unit_expression('m^2'), 'm^2')          # 'm**2'
+    """
+    powers = {}
+    constant = [1]
+    
+    def collect(node, exponent):
+        """Add a node raised to exponent into powers; False if it cannot be flattened."""
+        if node[0] == 'unit':
+            powers[node[1]] = powers.get(node[1], 0) + exponent
+            return True
+        if node[0] == 'number':
+            constant[0] *= _to_fraction(node[1]) ** exponent
+            return True
+        if node[0] in ('*', '/'):
+            return collect(node[1], exponent) and collect(node[2], exponent if node[0] == '*' else -exponent)
+        if node[0] == '**':
+            power = _get_exponent(node[2])
+            return power is not None and collect(node[1], exponent * power)
+        return False
+    
+    if tree is None or not collect(tree, 1):
+        return unit_str
+    parts = [] if constant[0] == 1 else [str(constant[0])]
+    for name in sorted(powers):
+        if powers[name] == 1:
+            parts.append(name)
+        elif powers[name]:
+            parts.append(f'{name}**{powers[name]}')
+    return '*'.join(parts) or '1'
+
+def _get_unit_expression(unit_str):
+    """
+    Get the parsed form of a unit string, parsing it only the first time (cached).
+    
+    Returns:
+        _UnitExpression: With the tree, the unit names it uses (the whole string if
+        it does not parse) and whether it combines units with an operator
+        
+    Examples:
+        _get_unit_expression('mi/h').units      # ['mi', 'h']
+        _get_unit_expression('mi/h').combined   # True
+    """
+    expression = _unit_expression_cache.get(unit_str)
+    if expression is None:
+        tree = _parse_unit_expression(unit_str)
+        if tree is None:
+            expression = _UnitExpression(None, [unit_str], False, unit_str)
+        else:
+            units = []
+            
+            def extract_names(node):
+                if node[0] == 'unit':
+                    units.append(node[1])
+                elif node[0] in _BINARY_OPERATORS:
+                    extract_names(node[1])
+                    extract_names(node[2])
+            
+            extract_names(tree)
+            expression = _UnitExpression(tree, units, tree[0] in _BINARY_OPERATORS,
+                                         _get_canonical_unit_text(tree, unit_str))
+        _unit_expression_cache.put(unit_str, expression)
+    return expression
 
 def _get_unit_conversion_factor(from_unit, to_unit):
     """
@@ -1088,177 +2032,227 @@ def _get_unit_conversion_factor(from_unit, to_unit):
     Returns the factor such that: from_value * factor = to_value
     Returns None if conversion is not possible.
     
-    For function-based conversions (like temperature), computes the scale factor
-    using f(1) - f(0), which gives the rate of change.
+    For conversions with offsets (like temperature), only the scale is used,
+    which gives the rate of change.
     """
     from_unit = from_unit.strip()
     to_unit = to_unit.strip()
     
-    if from_unit.lower() == to_unit.lower():
+    if from_unit == to_unit:
         return 1.0
     
     if not _is_valid_unit(from_unit) or not _is_valid_unit(to_unit):
         return None
     
-    try:
-        from_internal = _to_internal_unit(from_unit)
-        to_internal = _to_internal_unit(to_unit)
-        
-        # Check for direct conversion first
-        factor = _get_conversion_factor(from_internal, to_internal)
-        if factor is not None:
-            if callable(factor):
-                # For function-based conversions (like temperature with offset),
-                # compute the scale factor: f(1) - f(0) gives the rate of change
-                return factor(1) - factor(0)
-            return factor
-        
-        # Try multi-step conversion
-        visited = set()
-        queue = [(from_internal, 1.0)]
-        
-        while queue:
-            current_unit, current_factor = queue.pop(0)
-            
-            if current_unit == to_internal:
-                return current_factor
-            
-            if current_unit in visited:
-                continue
-            
-            visited.add(current_unit)
-            
-            connected = _get_connected_units(current_unit)
-            for next_unit, conv in connected:
-                if next_unit not in visited:
-                    if callable(conv):
-                        # Compute scale factor from function
-                        scale = conv(1) - conv(0)
-                        queue.append((next_unit, current_factor * scale))
-                    else:
-                        queue.append((next_unit, current_factor * conv))
-        
+    transform = _get_affine_transform(_to_internal_unit(from_unit), _to_internal_unit(to_unit))
+    if transform is None:
         return None
-    except:
+    return transform[0]
+
+# Cache of unit expression -> (constant, powers), cleared when the matrix changes
+_dimension_cache = _LRUCache(256)
+
+# Cache of external unit name -> internal unit (or the name itself when it does not
+# resolve), cleared when the matrix or the unit names change
+_resolved_unit_cache = _LRUCache(512)
+
+# Cache of (misspelling, categories) -> "did you mean" lines from _generate_units_lines,
+# cleared when the matrix or the unit names change
+_suggestion_cache = _LRUCache(64)
+
+# Cache of raw unit string -> _UnitExpression, shared by everything that needs to
+# know the structure of a unit string (parsing does not depend on the matrix)
+_unit_expression_cache = _LRUCache(256, versioned=False)
+
+# Cache of unit name -> (base internal unit, power of ten, power of two), or False for names without a prefix
+_prefixed_unit_cache = _LRUCache(256, versioned=False)
+
+def _get_simple_unit_dimensions(internal_unit):
+    """Get (scale, dimensions) for an internal unit, or None if it has no dimensions."""
+    category = _get_unit_category(internal_unit)
+    if category not in _CATEGORY_DIMENSIONS:
+        return None
+    reference, size, dimensions = _CATEGORY_DIMENSIONS[category]
+    transform = _get_exact_transform(internal_unit, reference)
+    if transform is None:
         return None
+    # Only the scale is used: offsets (like temperature) do not apply to rates
+    return (transform[0] * _to_fraction(size), dimensions)
+
+def _get_exponent(node):
+    """Get the whole-number exponent of a ** operation from its expression node, or None."""
+    if node[0] in ('neg', 'pos'):
+        exponent = _get_exponent(node[1])
+        if exponent is not None and node[0] == 'neg':
+            return -exponent
+        return exponent
+    if node[0] == 'number' and type(node[1]) is int:
+        return node[1]
+    return None
 
-def _evaluate_unit_expression(expr_str):
+def _reduce_unit_expression(unit_str):
     """
-    Parse a unit expression and return a function that computes the conversion factor.
+    Reduce a unit or unit expression to a constant and the powers of its units.
+    
+    Results are cached per expression.
     
-    Returns a tuple: (is_valid, eval_func) where eval_func takes a target expression
-    and returns the conversion factor, or None if not computable.
+    Args:
+        unit_str (str): A unit like 'mi' or an expression using *, / and **
+        
+    Returns:
+        tuple: (constant, powers) where powers maps internal units to their
+               (non-zero) exponents in sorted order, or None if the expression
+               has unknown units or unsupported operations
+        
+    Examples:
+        _reduce_unit_expression('km/h')     # (1, {'distance.km': 1, 'time.h': -1})
+        _reduce_unit_expression('m**2/s')   # (1, {'distance.m': 2, 'time.s': -1})
     """
-    escaped_str, escaped_keywords = _escape_keywords(expr_str)
+    cached = _dimension_cache.get(unit_str)
+    if cached is not None:
+        return cached
     
-    try:
-        tree = ast.parse(escaped_str, mode='eval')
-    except SyntaxError:
-        return (False, None)
-    
-    def get_unit_from_node(node):
-        """Extract unit name from an AST node."""
-        if isinstance(node, ast.Name):
-            return _unescape_keywords(node.id, escaped_keywords)
-        elif isinstance(node, ast.BinOp):
-            # Return the unparsed expression
-            unparsed = ast.unparse(node) if hasattr(ast, 'unparse') else None
-            if unparsed:
-                return _unescape_keywords(unparsed, escaped_keywords)
+    tree = _get_unit_expression(unit_str).tree
+    if tree is None:
         return None
     
-    return (True, tree.body)
+    def combine(left, right, sign):
+        """Multiply (sign 1) or divide (sign -1) two reduced expressions."""
+        powers = dict(left[1])
+        for unit, exponent in right[1].items():
+            powers[unit] = powers.get(unit, 0) + sign * exponent
+        constant = left[0] * right[0] if sign > 0 else left[0] / right[0]
+        return (constant, powers)
+    
+    def reduce(node):
+        """Recursively reduce an expression node to (constant, powers)."""
+        if node[0] == 'unit':
+            internal_unit = _to_internal_unit(node[1])
+            if not _is_known_unit(internal_unit):
+                return None
+            if _get_unit_category(internal_unit) not in _CATEGORY_DIMENSIONS:
+                return None
+            return (_to_fraction(1), {internal_unit: 1})
+        if node[0] == 'number':
+            return (_to_fraction(node[1]), {})
+        if node[0] not in ('*', '/', '**'):
+            return None
+        
+        left = reduce(node[1])
+        if left is None:
+            return None
+        if node[0] == '**':
+            exponent = _get_exponent(node[2])
+            if exponent is None:
+                return None
+            return (left[0] ** exponent, {unit: e * exponent for unit, e in left[1].items()})
+        
+        right = reduce(node[2])
+        if right is None:
+            return None
+        return combine(left, right, 1 if node[0] == '*' else -1)
+    
+    result = reduce(tree)
+    if result is not None:
+        # Normal form: units sorted, with cancelled units dropped
+        powers = result[1]
+        result = (result[0], {unit: powers[unit] for unit in sorted(powers) if powers[unit]})
+        _dimension_cache.put(unit_str, result)
+    return result
 
-def _compute_conversion_factor(from_expr, to_expr):
+def _get_powers_dimensions(constant, powers):
     """
-    Compute the conversion factor between two unit expressions.
+    Get (scale, dimensions) for a reduced expression, or None if a unit has no dimensions.
     
-    Recursively handles expressions like "(ft*in)/h" -> "(m*cm)/s"
+    The scale is an exact fraction.
     
-    Returns the conversion factor, or None if conversion is not possible.
+    Units of the same category are scaled against the first of them directly, so
+    mi/km uses the stored mi -> km factor and only the category's net power is
+    scaled to base units.
+    """
+    scale = constant
+    anchors = {}
+    for unit, exponent in powers.items():
+        if not exponent:
+            continue
+        category = _get_unit_category(unit)
+        if category not in anchors:
+            anchors[category] = (unit, exponent)
+            continue
+        anchor, net_exponent = anchors[category]
+        transform = _get_exact_transform(unit, anchor)
+        if transform is None:
+            return None
+        scale *= transform[0] ** exponent
+        anchors[category] = (anchor, net_exponent + exponent)
+    
+    dimensions = _DIMENSIONLESS
+    for anchor, net_exponent in anchors.values():
+        if net_exponent:
+            unit_dimensions = _get_simple_unit_dimensions(anchor)
+            if unit_dimensions is None:
+                return None
+            scale *= unit_dimensions[0] ** net_exponent
+            dimensions = tuple(a + b * net_exponent for a, b in zip(dimensions, unit_dimensions[1]))
+    return (scale, dimensions)
+
+def _get_unit_dimensions(unit_str):
     """
-    from_escaped, from_keywords = _escape_keywords(from_expr)
-    to_escaped, to_keywords = _escape_keywords(to_expr)
+    Get the scale and base-dimension exponents of a unit or unit expression.
     
-    try:
-        from_tree = ast.parse(from_escaped, mode='eval').body
-        to_tree = ast.parse(to_escaped, mode='eval').body
-    except SyntaxError:
-        return None
+    The scale is the size of one of the unit in SI base units (and US dollars
+    for currencies) as an exact fraction, with exponents over _BASE_DIMENSIONS.
     
-    def get_factor(from_node, to_node):
-        """Recursively compute conversion factor between two AST nodes."""
-        # Both are simple names (base case)
-        if isinstance(from_node, ast.Name) and isinstance(to_node, ast.Name):
-            from_unit = _unescape_keywords(from_node.id, from_keywords)
-            to_unit = _unescape_keywords(to_node.id, to_keywords)
-            return _get_unit_conversion_factor(from_unit, to_unit)
-        
-        # Both are binary operations
-        if isinstance(from_node, ast.BinOp) and isinstance(to_node, ast.BinOp):
-            # Must have the same operator type
-            if type(from_node.op) != type(to_node.op):
-                return None
-            
-            # Recursively compute factors for left and right operands
-            left_factor = get_factor(from_node.left, to_node.left)
-            right_factor = get_factor(from_node.right, to_node.right)
-            
-            if left_factor is None or right_factor is None:
-                return None
-            
-            # Combine based on operator
-            if isinstance(from_node.op, ast.Mult):
-                # (A * B) -> (C * D): factor = (C/A) * (D/B)
-                return left_factor * right_factor
-            elif isinstance(from_node.op, ast.Div):
-                # (A / B) -> (C / D): factor = (C/A) / (D/B) = (C/A) * (B/D)
-                return left_factor / right_factor
-            else:
-                return None
+    Returns:
+        tuple: (scale, dimensions), or None if the expression cannot be reduced
         
-        # Mismatched structures
+    Examples:
+        _get_unit_dimensions('km/h')    # (Fraction(5, 18), (1, 0, -1, 0, 0, 0))
+        _get_unit_dimensions('kW*h')    # (Fraction(3600000, 1), (2, 1, -2, 0, 0, 0))
+    """
+    reduced = _reduce_unit_expression(unit_str)
+    if reduced is None:
+        return None
+    return _get_powers_dimensions(*reduced)
+
+def _get_dimension_transform(from_unit, to_unit):
+    """
+    Get the transform between two dimensionally compatible units or expressions.
+    
+    The quotient of the two expressions is formed first, so units they share
+    (like the hours in mi/h -> km/h) cancel exactly before any scaling.
+    
+    Returns:
+        tuple: (scale, 0) as Fractions, or None if the dimensions differ or cannot be found
+    """
+    from_reduced = _reduce_unit_expression(from_unit)
+    to_reduced = _reduce_unit_expression(to_unit)
+    if from_reduced is None or to_reduced is None:
         return None
     
-    return get_factor(from_tree, to_tree)
+    powers = dict(from_reduced[1])
+    for unit, exponent in to_reduced[1].items():
+        powers[unit] = powers.get(unit, 0) - exponent
+    quotient = _get_powers_dimensions(from_reduced[0] / to_reduced[0], powers)
+    if quotient is None or quotient[1] != _DIMENSIONLESS:
+        return None
+    return (quotient[0], _to_fraction(0))
 
 def _is_combined_unit(unit_str):
     """Check if a unit string represents a combined unit (e.g., "mi/h" or "ft*lb")."""
-    escaped_str, _ = _escape_keywords(unit_str)
-    try:
-        tree = ast.parse(escaped_str, mode='eval')
-        return isinstance(tree.body, ast.BinOp)
-    except SyntaxError:
-        return False
+    return _get_unit_expression(unit_str).combined
 
 def _get_all_units_in_expression(expr_str):
     """Extract all unit names from a unit expression."""
-    escaped_str, escaped_keywords = _escape_keywords(expr_str)
-    
-    try:
-        tree = ast.parse(escaped_str, mode='eval')
-    except SyntaxError:
-        return [expr_str]
-    
-    units = []
-    
-    def extract_names(node):
-        if isinstance(node, ast.Name):
-            units.append(_unescape_keywords(node.id, escaped_keywords))
-        elif isinstance(node, ast.BinOp):
-            extract_names(node.left)
-            extract_names(node.right)
-    
-    extract_names(tree.body)
-    return units
+    return list(_get_unit_expression(expr_str).units)
 
 def _convert_simple(from_unit, to_unit, value):
     """
     Convert a value from one simple unit to another.
     
     This is the internal conversion function that handles single units only.
-    Uses BFS to find conversion path, applying functions directly for 
-    conversions with offsets (like temperature).
+    Uses the compiled base-unit table, so any conversion is two affine
+    operations (including conversions with offsets like temperature).
     
     Args:
         from_unit (str): The source unit
@@ -1271,7 +2265,7 @@ def _convert_simple(from_unit, to_unit, value):
     Raises:
         ValueError: If no conversion path exists between valid units
     """
-    if from_unit.lower() == to_unit.lower():
+    if from_unit == to_unit:
         return value
     
     # Check if units are valid before attempting conversion
@@ -1281,24 +2275,34 @@ def _convert_simple(from_unit, to_unit, value):
     if not from_unit_valid or not to_unit_valid:
         return None
     
-    # Convert to internal format
-    from_unit_internal = _to_internal_unit(from_unit)
-    to_unit_internal = _to_internal_unit(to_unit)
+    transform = _get_affine_transform(_to_internal_unit(from_unit), _to_internal_unit(to_unit))
+    if transform is None:
+        raise ValueError(f"No conversion path found from '{from_unit}' to '{to_unit}'")
     
-    # Check for direct conversion first
-    conversion_factor_or_func = _get_conversion_factor(from_unit_internal, to_unit_internal)
-    if conversion_factor_or_func is not None:
-        if callable(conversion_factor_or_func):
-            return conversion_factor_or_func(value)
-        else:
-            return value * conversion_factor_or_func
+    scale, offset = transform
+    return value * scale + offset
+
+def _convert_by_search(from_unit, to_unit, value):
+    """
+    Convert a value between simple units by searching the conversion graph.
     
-    # Use BFS to find conversion path, applying functions/factors to the value
-    visited = set()
+    Uses BFS to find a conversion path, applying factors/affine transforms to
+    the value at every hop. This is the reference behavior the base-unit table is
+    compiled to match; conversions use _convert_simple instead.
+    
+    Raises:
+        ValueError: If no conversion path exists between the units
+    """
+    from_unit_internal = _to_internal_unit(from_unit)
+    to_unit_internal = _to_internal_unit(to_unit)
+    
+    visited = set()
     queue = [(from_unit_internal, value)]
+    position = 0
     
-    while queue:
-        current_unit, current_value = queue.pop(0)
+    while position < len(queue):
+        current_unit, current_value = queue[position]
+        position += 1
         
         if current_unit == to_unit_internal:
             return current_value
@@ -1308,96 +2312,208 @@ def _convert_simple(from_unit, to_unit, value):
         
         visited.add(current_unit)
         
-        connected = _get_connected_units(current_unit)
-        for next_unit, conv in connected:
+        for next_unit, conv in _get_connected_units(current_unit):
             if next_unit not in visited:
-                if callable(conv):
+                if isinstance(conv, _Affine):
                     new_value = conv(current_value)
                 else:
                     new_value = current_value * conv
                 queue.append((next_unit, new_value))
     
-    # If we get here, no conversion path was found
     raise ValueError(f"No conversion path found from '{from_unit}' to '{to_unit}'")
 
-def convert(from_unit="", to_unit="", value=0):
+def _apply_transform(value, scale, offset, out=None):
     """
-    Convert a value from one unit to another using dynamic programming.
+    Apply an affine transform (value * scale + offset) to a number or a batch of numbers.
     
-    This function can handle direct conversions or find multi-step conversion paths
-    through intermediate units. It also supports combined units:
-    - Ratio units like "mi/h" or "m/s" (division)
-    - Product units like "ft*lb" or "m*kg" (multiplication)
+    Batches can be lists, tuples, ranges, array.array or NumPy arrays; the result
+    is the same kind of container (a list for ranges). NumPy arrays, and arrays
+    when NumPy is available, are converted with vectorized operations.
     
-    For example:
-    - Direct: miles -> kilometers 
-    - Multi-step: miles -> feet -> inches
-    - Complex: grams -> pounds -> ounces
-    - Temperature: celsius -> fahrenheit (using conversion functions for offsets)
-    - Ratio units: mi/h -> m/s, km/h -> mph
-    - Product units: ft*lb -> m*kg, in*oz -> cm*g
+    Args:
+        value: A number or a batch of numbers
+        scale: Multiplier of the transform
+        offset: Offset added after scaling (0 for plain factors)
+        out: Optional list or array to write the results into (may be value itself);
+            arrays must hold floats
+        
+    Returns:
+        The converted number or batch (out, when given)
+        
+    Raises:
+        TypeError: If out is an array that cannot hold floats
+    """
+    if isinstance(value, (int, float)) and out is None:
+        if offset:
+            return value * scale + offset
+        return value * scale
+    
+    if out is not None:
+        _check_out_buffer(out)
+    
+    # Only look for NumPy if it has already been imported - a value cannot be
+    # a NumPy array otherwise, and importing it is slow on small devices
+    numpy = sys.modules.get('numpy')
+    if (numpy is not None and isinstance(value, (array.array, numpy.ndarray))
+            and (out is None or isinstance(out, (array.array, numpy.ndarray)))):
+        return _apply_transform_numpy(numpy, value, scale, offset, out)
+    
+    if isinstance(value, (list, tuple, range, array.array)):
+        if out is not None:
+            for i, item in enumerate(value):
+                out[i] = item * scale + offset
+            return out
+        if offset:
+            results = [item * scale + offset for item in value]
+        else:
+            results = [item * scale for item in value]
+        if isinstance(value, tuple):
+            return tuple(results)
+        if isinstance(value, array.array):
+            return array.array('d', results)
+        return results
+    
+    if offset:
+        return value * scale + offset
+    return value * scale
+
+def _check_out_buffer(out):
+    """Reject an out array that cannot hold floats, whether or not NumPy is loaded."""
+    if isinstance(out, array.array):
+        is_float = out.typecode in ('f', 'd')
+    else:
+        # NumPy arrays have a dtype, whose kind is 'f' for floats
+        dtype = getattr(out, 'dtype', None)
+        is_float = dtype is None or dtype.kind == 'f'
+    if not is_float:
+        raise TypeError("The out array must hold floats (like array('d')), so converted values are not truncated")
+
+def _apply_transform_numpy(numpy, value, scale, offset, out):
+    """Vectorized _apply_transform for NumPy arrays and array.array buffers."""
+    if isinstance(value, array.array):
+        # View the array's buffer without copying; results go to a new array('d')
+        source = numpy.frombuffer(value, dtype=value.typecode)
+        if out is None:
+            out = array.array('d', bytes(8 * len(value)))
+    else:
+        source = value
     
-    If from_unit or to_unit are empty strings, displays available units instead.
+    if out is None:
+        result = source * scale
+        if offset:
+            result += offset
+        return result
+    
+    if isinstance(out, array.array):
+        target = numpy.frombuffer(out, dtype=out.typecode)
+    else:
+        target = out
+    numpy.multiply(source, scale, out=target)
+    if offset:
+        numpy.add(target, offset, out=target)
+    return out
+
+# Cache of resolved conversions: (from_unit, to_unit) -> (exact transform, float
+# transform), where each transform is (scale, offset). Units are keyed by their
+# internal units and expressions by their canonical spelling (see
+# _get_conversion_key). Tied to the conversion matrix version, so loading
+# currencies or adding units invalidates entries computed against the old matrix.
+_CONVERSION_CACHE_SIZE = 256
+_conversion_cache = _LRUCache(_CONVERSION_CACHE_SIZE)
+
+def _get_conversion_key(from_unit, to_unit):
+    """Get the conversion cache key for two units: simple units as their internal
+    units, and expressions in canonical form.
+    
+    Equivalent spellings like 'MI', 'mi' and 'miles', or 'ft*lb' and 'lb*ft',
+    share one cache entry. Timezones (and invalid names) are used as written."""
+    if '*' in from_unit or '/' in from_unit or '^' in from_unit:
+        from_unit = _get_unit_expression(from_unit).canonical
+    else:
+        from_unit = _to_internal_unit(from_unit)
+    if '*' in to_unit or '/' in to_unit or '^' in to_unit:
+        to_unit = _get_unit_expression(to_unit).canonical
+    else:
+        to_unit = _to_internal_unit(to_unit)
+    return (from_unit, to_unit)
+
+def _resolve_conversion(from_unit, to_unit, exact=False, times=None):
+    """
+    Resolve the transform between two units, using the conversion cache.
     
-    The algorithm uses a breadth-first search to find the shortest conversion path
-    between any two units in the conversion matrix.
+    The transform is worked out exactly once per pair of units; the float
+    transform is rounded from it and cached alongside.
     
     Args:
-        from_unit (str): The source unit (can be simple like "mi", ratio like "mi/h", or product like "ft*lb")
-        to_unit (str): The target unit (can be simple like "km", ratio like "m/s", or product like "m*kg")
-        value (float): The value to convert
+        from_unit (str): The source unit (simple, combined, or timezone)
+        to_unit (str): The target unit (simple, combined, or timezone)
+        exact (bool): Get the transform as Fractions instead of floats
+        times (dict): If given, seconds spent working out an uncached transform
+            are added to its 'parse', 'validate' and 'search' entries
         
     Returns:
-        float: The converted value, or None if units are invalid
+        tuple: (scale, offset) such that to_value = from_value * scale + offset,
+               or None if the units are invalid (an explanation is printed)
         
     Raises:
         ValueError: If no conversion path exists between valid units
-        
-    Examples:
-        >>> convert('hours', 'minutes', 2)
-        120.0
-        >>> convert('miles', 'inches', 1)  # Multi-step: miles -> feet -> inches
-        63360.0
-        >>> convert('c', 'f', 0)  # Temperature: 0°C to 32°F
-        32.0
-        >>> convert('mi/h', 'm/s', 10)  # Ratio units: 10 mph to m/s
-        4.4704
-        >>> convert('ft*lb', 'm*kg', 1)  # Product units: foot-pounds to meter-kg
-        0.1382549544
-        >>> convert()  # Display available units
     """
-    # If from_unit or to_unit are empty, display available units
-    if not from_unit or not to_unit:
-        header_lines = [
-            "Convert - convert values between two units.",
-            "Usage: convert(from, to, value)",
-            "",
-            "Supports combined units:",
-            "  Ratio units (/):",
-            "    convert('mi/h', 'm/s', 60)  # 60 mph to m/s",
-            "    convert('km/h', 'mi/h', 100)  # 100 km/h to mph",
-            "  Product units (*):",
-            "    convert('ft*lb', 'm*kg', 1)  # foot-pounds to meter-kg",
-            "    convert('in*oz', 'cm*g', 10)  # inch-ounces to cm-grams",
-            "",
-            "Available units are:"
-        ]
-        units_lines = _generate_units_lines()
-        all_lines = header_lines + units_lines
-        _print_buffered(all_lines)
+    key = _get_conversion_key(from_unit, to_unit)
+    transforms = _conversion_cache.get(key)
+    if transforms is None:
+        transform = _compute_conversion(from_unit, to_unit, times)
+        if transform is None:
+            return None
+        transforms = (transform, _round_transform(transform))
+        _conversion_cache.put(key, transforms)
+    return transforms[0] if exact else transforms[1]
+
+def _clock():
+    """Get the time in seconds (MicroPython has no perf_counter)."""
+    if hasattr(time, 'perf_counter'):
+        return time.perf_counter()
+    return time.ticks_us() / 1e6
+
+def _record_phase(times, phase, start):
+    """Add the time since start to a phase of a conversion's timings (if kept), returning the current time."""
+    if times is None:
         return None
+    now = _clock()
+    times[phase] += now - start
+    return now
+
+def _compute_conversion(from_unit, to_unit, times=None):
+    """
+    Work out the exact transform between two units without using the conversion cache.
     
-    # Lazy-load currency data for currency conversions
-    _ensure_currency_data_loaded()
+    Handles timezones, combined units and simple units, printing helpful
+    messages when a unit is invalid.
     
-    if from_unit.lower() == to_unit.lower():
-        return value
+    Args:
+        from_unit (str): The source unit (simple, combined, or timezone)
+        to_unit (str): The target unit (simple, combined, or timezone)
+        times (dict): If given, seconds spent parsing the units, validating them
+            and searching for the transform are added to its 'parse',
+            'validate' and 'search' entries
+    
+    Returns:
+        tuple: (scale, offset) as Fractions such that to_value = from_value * scale + offset,
+               or None if the units are invalid
+        
+    Raises:
+        ValueError: If no conversion path exists between valid units
+    """
+    start = None if times is None else _clock()
+    if from_unit == to_unit:
+        _record_phase(times, 'parse', start)
+        return (_to_fraction(1), _to_fraction(0))
     
     # Handle timezone conversions (additive offset, not multiplicative)
     from_is_tz = _is_timezone(from_unit)
     to_is_tz = _is_timezone(to_unit)
     
     if from_is_tz or to_is_tz:
+        start = _record_phase(times, 'parse', start)
         if not from_is_tz:
             # Check if from_unit looks like a timezone attempt - suggest close matches
             error_lines = [f"Could not convert the timezone '{from_unit}'. Did you mean one of the following?"]
@@ -1413,29 +2529,26 @@ def convert(from_unit="", to_unit="", value=0):
             _print_buffered(all_lines)
             return None
         
+        start = _record_phase(times, 'validate', start)
         from_offset = _get_timezone_offset(from_unit)
         to_offset = _get_timezone_offset(to_unit)
         
         # Timezone conversion: add the difference in offsets
         # If PST (-8) to China CST (+8), difference is +16
-        offset_diff = to_offset - from_offset
-        return value + offset_diff
+        offset_diff = _to_fraction(to_offset) - _to_fraction(from_offset)
+        _record_phase(times, 'search', start)
+        return (_to_fraction(1), offset_diff)
     
     # Check if we're dealing with combined units (expressions with * or /)
     from_is_combined = _is_combined_unit(from_unit)
     to_is_combined = _is_combined_unit(to_unit)
     
-    # Handle combined unit conversions (e.g., mi/h -> m/s or ft*lb -> m*kg or (ft*in)/h -> (m*cm)/s)
+    # Handle combined unit conversions (e.g., mi/h -> m/s, kW*h -> J or (ft*in)/h -> m**2/s)
     if from_is_combined or to_is_combined:
-        # Both must be combined units for combined conversion
-        if from_is_combined != to_is_combined:
-            error_lines = [f"Cannot convert between simple and combined units: '{from_unit}' to '{to_unit}'"]
-            _print_buffered(error_lines)
-            return None
-        
         # Check if all component units are valid
         from_units = _get_all_units_in_expression(from_unit)
         to_units = _get_all_units_in_expression(to_unit)
+        start = _record_phase(times, 'parse', start)
         
         invalid_units = []
         for unit in from_units + to_units:
@@ -1446,18 +2559,28 @@ def convert(from_unit="", to_unit="", value=0):
             error_lines = [f"Invalid unit(s): {', '.join(invalid_units)}. Type 'units' to see available conversions."]
             _print_buffered(error_lines)
             return None
+        start = _record_phase(times, 'validate', start)
         
-        # Compute the conversion factor using recursive AST evaluation
-        factor = _compute_conversion_factor(from_unit, to_unit)
+        # Reduce both expressions to base dimensions and compare them
+        if _get_unit_dimensions(from_unit) is None or _get_unit_dimensions(to_unit) is None:
+            error_lines = [f"Cannot convert '{from_unit}' to '{to_unit}'. Unit expressions can only use *, / and ** with whole-number powers."]
+            _print_buffered(error_lines)
+            return None
         
-        if factor is None:
-            error_lines = [f"Cannot convert '{from_unit}' to '{to_unit}'. Expressions must have matching structure."]
+        transform = _get_dimension_transform(from_unit, to_unit)
+        _record_phase(times, 'search', start)
+        if transform is None:
+            error_lines = [f"Cannot convert '{from_unit}' to '{to_unit}'. The units have incompatible dimensions."]
             _print_buffered(error_lines)
             return None
         
-        return value * factor
+        return transform
     
     # Handle simple unit conversion
+    from_internal = _to_internal_unit(from_unit)
+    to_internal = _to_internal_unit(to_unit)
+    start = _record_phase(times, 'parse', start)
+    
     # Check if units are valid before attempting conversion
     from_unit_valid = _is_valid_unit(from_unit)
     to_unit_valid = _is_valid_unit(to_unit)
@@ -1479,13 +2602,1211 @@ def convert(from_unit="", to_unit="", value=0):
         all_lines = error_lines + units_lines
         _print_buffered(all_lines)
         return None
+    start = _record_phase(times, 'validate', start)
+    
+    transform = _get_exact_transform(from_internal, to_internal)
+    if transform is None:
+        # Units in different categories still convert if their dimensions match
+        transform = _get_dimension_transform(from_unit, to_unit)
+    _record_phase(times, 'search', start)
+    if transform is None:
+        raise ValueError(f"No conversion path found from '{from_unit}' to '{to_unit}'")
+    return transform
+
+
+def convert(from_unit="", to_unit="", value=0, out=None, exact=False, explain=False):
+    """
+    Convert a value from one unit to another using dynamic programming.
+    
+    This function can handle direct conversions or find multi-step conversion paths
+    through intermediate units. It also supports combined units:
+    - Ratio units like "mi/h" or "m/s" (division)
+    - Product units like "ft*lb" or "m*kg" (multiplication)
+    - Powers like "m**2" or "s**-1"
+    Any two units or expressions with the same dimensions convert, whatever their
+    structure (for example "kW*h" -> "J" or "mps" -> "km/h").
+    
+    For example:
+    - Direct: miles -> kilometers 
+    - Multi-step: miles -> feet -> inches
+    - Complex: grams -> pounds -> ounces
+    - Temperature: celsius -> fahrenheit (using affine transforms for offsets)
+    - Ratio units: mi/h -> m/s, km/h -> mph
+    - Product units: ft*lb -> m*kg, in*oz -> cm*g
+    - Different structures: kW*h -> J, (ft*in)/h -> m**2/s
+    
+    If from_unit or to_unit are empty strings, displays available units instead.
+    
+    Each category of units is compiled once into a table of transforms to a common
+    base unit, so any conversion within a category takes two affine operations.
+    Conversion factors are composed as exact fractions and rounded to a float
+    once per pair of units, so results do not depend on the path taken. With
+    exact=True the result is an exact Fraction instead.
+    
+    Args:
+        from_unit (str): The source unit (can be simple like "mi", ratio like "mi/h", or product like "ft*lb")
+        to_unit (str): The target unit (can be simple like "km", ratio like "m/s", or product like "m*kg"),
+                       or a list of target units to get a list of converted values
+        value (float): The value to convert, or a batch of values (list, tuple, range,
+                       array.array or NumPy array) converted with a single lookup
+        out: Optional list or array to write converted batch values into
+        exact (bool): Convert exactly, giving Fractions (batches become lists,
+                      or tuples for tuples); floats are read as the decimal they show
+        explain (bool): Return a dict describing how the conversion was resolved
+                        (see _explain_conversion) instead of the value
+        
+    Returns:
+        float: The converted value (or a batch of the same kind), or None if units are invalid
+        
+    Raises:
+        ValueError: If no conversion path exists between valid units
+        
+    Examples:
+        >>> convert('hours', 'minutes', 2)
+        120.0
+        >>> convert('miles', 'inches', 1)  # Multi-step: miles -> feet -> inches
+        63360.0
+        >>> convert('c', 'f', 0)  # Temperature: 0°C to 32°F
+        32.0
+        >>> convert('mi/h', 'm/s', 10)  # Ratio units: 10 mph to m/s
+        4.4704
+        >>> convert('ft*lb', 'm*kg', 1)  # Product units: foot-pounds to meter-kg
+        0.1382549544
+        >>> convert('kW*h', 'J', 1)  # Same dimensions, different structure
+        3600000.0
+        >>> convert('mi', 'km', [1, 2, 5])  # Batch: one lookup for all values
+        [1.609344, 3.218688, 8.04672]
+        >>> convert('mi', ['km', 'm', 'ft'], 5)  # Several target units at once
+        [8.04672, 8046.72, 26400.0]
+        >>> convert('mi', 'in', 1, exact=True)  # Exact result
+        Fraction(63360, 1)
+        >>> convert('ft', 'km', 1, explain=True)['path']  # How the units were connected
+        ['distance.ft', 'distance.in', 'distance.cm', 'distance.m', 'distance.km']
+        >>> convert()  # Display available units
+    """
+    # If from_unit or to_unit are empty, display available units
+    if not from_unit or not to_unit:
+        header_lines = [
+            "Convert - convert values between two units.",
+            "Usage: convert(from, to, value)",
+            "",
+            "Supports combined units:",
+            "  Ratio units (/):",
+            "    convert('mi/h', 'm/s', 60)  # 60 mph to m/s",
+            "    convert('km/h', 'mi/h', 100)  # 100 km/h to mph",
+            "  Product units (*):",
+            "    convert('ft*lb', 'm*kg', 1)  # foot-pounds to meter-kg",
+            "    convert('in*oz', 'cm*g', 10)  # inch-ounces to cm-grams",
+            "  Any units with the same dimensions (**, mixed structures):",
+            "    convert('kW*h', 'J', 1)  # kilowatt-hours to joules",
+            "",
+            "Available units are:"
+        ]
+        units_lines = _generate_units_lines()
+        all_lines = header_lines + units_lines
+        _print_buffered(all_lines)
+        return None
+    
+    # Lazy-load currency data for currency conversions
+    _ensure_currency_data_loaded()
+    
+    if exact:
+        if not _can_convert_exactly():
+            return None
+        value = _to_exact_value(value)
+    
+    if explain:
+        if isinstance(to_unit, (list, tuple)):
+            return [_explain_conversion(from_unit, unit, value, exact) for unit in to_unit]
+        return _explain_conversion(from_unit, to_unit, value, exact)
+    
+    # Several target units: resolve the source unit once for all of them
+    if isinstance(to_unit, (list, tuple)):
+        return _convert_to_units(from_unit, to_unit, value, exact)
+    
+    transform = _resolve_conversion(from_unit, to_unit, exact)
+    if transform is None:
+        return None
+    return _apply_transform(value, transform[0], transform[1], out)
+
+def _explain_conversion(from_unit, to_unit, value, exact=False):
+    """
+    Convert a value and describe how the conversion was resolved.
+    
+    Returns:
+        dict: With the keys
+            'value': the converted value
+            'from_internal', 'to_internal': the resolved internal units, or the
+                reduced unit powers for expressions (None for timezones)
+            'method': 'same', 'prefix', 'direct' or 'table' for simple units,
+                'dimensions' for expressions and 'timezone' for timezones
+            'path': the internal units the factor was composed through
+                (None for expressions and timezones)
+            'scale', 'offset': the transform, as floats (or Fractions if exact)
+            'cached': True if the transform came from the conversion cache
+            'times': seconds spent in 'parse', 'validate' and 'search' while
+                working out the transform (all zero when it was cached)
+        or None if the units are invalid (an explanation is printed)
+        
+    Examples:
+        >>> convert('mi', 'km', 3, explain=True)
+        {'value': 4.828032, 'from_internal': 'distance.mi', 'to_internal': 'distance.km',
+         'method': 'direct', 'path': ['distance.mi', 'distance.km'], 'scale': 1.609344, ...}
+    """
+    _conversion_cache._check_version()
+    cached = _get_conversion_key(from_unit, to_unit) in _conversion_cache.data
+    
+    times = {'parse': 0.0, 'validate': 0.0, 'search': 0.0}
+    transform = _resolve_conversion(from_unit, to_unit, exact, times)
+    if transform is None:
+        return None
+    
+    is_timezone = _is_timezone(from_unit) or _is_timezone(to_unit)
+    is_combined = not is_timezone and (_is_combined_unit(from_unit) or _is_combined_unit(to_unit))
+    if is_timezone:
+        from_internal = to_internal = None
+    elif is_combined:
+        from_internal = _reduce_unit_expression(from_unit)
+        to_internal = _reduce_unit_expression(to_unit)
+        from_internal = from_internal and from_internal[1]
+        to_internal = to_internal and to_internal[1]
+    else:
+        from_internal = _to_internal_unit(from_unit)
+        to_internal = _to_internal_unit(to_unit)
+    
+    if is_timezone:
+        method, path = ('timezone', None)
+    elif is_combined:
+        method, path = ('dimensions', None)
+    else:
+        method, path = _get_conversion_route(from_internal, to_internal)
+        if method != 'same' and _get_transforms(from_internal, to_internal) is None:
+            # Units in different categories convert through their dimensions
+            method, path = ('dimensions', None)
+    
+    return {
+        'value': _apply_transform(value, transform[0], transform[1]),
+        'from_internal': from_internal,
+        'to_internal': to_internal,
+        'method': method,
+        'path': path,
+        'scale': transform[0],
+        'offset': transform[1],
+        'cached': cached,
+        'times': times,
+    }
+
+def _can_convert_exactly():
+    """Check that exact conversions are available, printing an explanation if not."""
+    if fractions is None:
+        _print_buffered(["Exact conversions need the fractions module, which this Python does not have."])
+        return False
+    return True
+
+def _to_exact_value(value):
+    """Get a number as a Fraction, or a batch of numbers as a list (or tuple) of Fractions."""
+    if isinstance(value, tuple):
+        return tuple(_to_fraction(item) for item in value)
+    if isinstance(value, (list, range, array.array)):
+        return [_to_fraction(item) for item in value]
+    return _to_fraction(value)
+
+def _is_simple_unit(unit):
+    """Check if a unit is a valid simple unit (not a timezone or combined unit)."""
+    return not _is_timezone(unit) and not _is_combined_unit(unit) and _is_valid_unit(unit)
+
+def _convert_to_units(from_unit, to_units, value, exact=False):
+    """
+    Convert a value from one unit into several target units.
+    
+    The source unit is parsed and validated once; each simple target is then a
+    lookup in the compiled base-unit table. Other targets (combined units,
+    timezones) go through the regular conversion path.
+    
+    Returns:
+        list: The converted values in the order of to_units, or None if a unit is invalid
+        
+    Raises:
+        ValueError: If no conversion path exists between valid units
+    """
+    from_internal = None
+    if _is_simple_unit(from_unit):
+        from_internal = _to_internal_unit(from_unit)
+    
+    results = []
+    for to_unit in to_units:
+        transform = None
+        if from_internal is not None and _is_simple_unit(to_unit):
+            transforms = _get_transforms(from_internal, _to_internal_unit(to_unit))
+            transform = transforms and transforms[0 if exact else 1]
+        if transform is None:
+            transform = _resolve_conversion(from_unit, to_unit, exact)
+            if transform is None:
+                return None
+        results.append(_apply_transform(value, transform[0], transform[1]))
+    return results
+
+def convert_all(from_unit, value=1):
+    """
+    Convert a value into every unit of its category.
+    
+    Args:
+        from_unit (str): The source unit (a simple unit or timezone)
+        value (float): The value to convert
+        
+    Returns:
+        dict: Converted values keyed by unit name, or None if the unit is invalid
+        
+    Examples:
+        >>> convert_all('mi', 5)
+        {'cm': 804672.0, 'ft': 26400.0, 'in': 316800.0, 'km': 8.04672, ...}
+    """
+    _ensure_currency_data_loaded()
+    
+    if _is_timezone(from_unit):
+        to_units = sorted(_TIMEZONE_DATA.keys())
+    elif _is_simple_unit(from_unit):
+        category = _get_unit_category(_to_internal_unit(from_unit))
+        to_units = sorted(_get_units_by_category(category))
+    else:
+        error_lines = [f"Could not convert the unit '{from_unit}'. Did you mean one of the following?"]
+        units_lines = _generate_units_lines(from_unit)
+        _print_buffered(error_lines + units_lines)
+        return None
+    
+    results = _convert_to_units(from_unit, to_units, value)
+    return dict(zip(to_units, results))
+
+def normalize(pairs, to_unit):
+    """
+    Convert a list of (value, unit) pairs with mixed units into a single unit.
+    
+    Pairs are grouped by unit so each distinct unit is resolved only once,
+    which keeps large ledgers and logs fast. Currencies work the same way.
+    
+    Args:
+        pairs (list): (value, unit) pairs, e.g. [(3, 'mi'), (400, 'm')]
+        to_unit (str): The unit to convert every value into
+        
+    Returns:
+        list: The converted values in the original order, or None if a unit is invalid
+        
+    Examples:
+        >>> normalize([(3, 'mi'), (400, 'm'), (2, 'km')], 'km')
+        [4.828032, 0.4, 2]
+    """
+    _ensure_currency_data_loaded()
+    
+    pairs = list(pairs)
+    
+    # Group positions by unit: unit -> [index, ...]
+    groups = {}
+    for index, (_, unit) in enumerate(pairs):
+        if unit in groups:
+            groups[unit].append(index)
+        else:
+            groups[unit] = [index]
+    
+    results = [None] * len(pairs)
+    for unit, indices in groups.items():
+        transform = _resolve_conversion(unit, to_unit)
+        if transform is None:
+            return None
+        scale, offset = transform
+        for index in indices:
+            results[index] = pairs[index][0] * scale + offset
+    return results
+
+class _Converter:
+    """A conversion between two units that has already been resolved (see converter())."""
+    
+    __slots__ = ('from_unit', 'to_unit', 'scale', 'offset')
+    
+    def __init__(self, from_unit, to_unit, scale, offset):
+        self.from_unit = from_unit
+        self.to_unit = to_unit
+        self.scale = scale
+        self.offset = offset
+    
+    def __call__(self, value, out=None):
+        if out is None and isinstance(value, (int, float)):
+            if self.offset:
+                return value * self.scale + self.offset
+            return value * self.scale
+        return _apply_transform(value, self.scale, self.offset, out)
+    
+    def __repr__(self):
+        return f"converter({self.from_unit!r}, {self.to_unit!r})"
+
+def converter(from_unit, to_unit):
+    """
+    Create a reusable function that converts values from one unit to another.
+    
+    The units are parsed, validated and resolved once, so calling the result
+    costs a single multiplication (or multiply-add for temperatures and
+    timezones). Use it when converting many values between the same units.
+    
+    Args:
+        from_unit (str): The source unit (simple, combined, or timezone)
+        to_unit (str): The target unit (simple, combined, or timezone)
+        
+    Returns:
+        A callable taking a value in from_unit and returning it in to_unit,
+        or None if the units are invalid
+        
+    Examples:
+        >>> mph = converter('mi/h', 'm/s')
+        >>> [mph(v) for v in (10, 20, 30)]
+        [4.4704, 8.9408, 13.4112]
+    """
+    _ensure_currency_data_loaded()
+    
+    transform = _resolve_conversion(from_unit, to_unit)
+    if transform is None:
+        return None
+    return _Converter(from_unit, to_unit, transform[0], transform[1])
+
+# Cache of source text -> source to execute for _rewrite_unit_literal
+_unit_literal_cache = _LRUCache(64)
+
+# Cache of (from_unit, to_unit) -> converter for rewritten unit literals
+_inline_converter_cache = _LRUCache(64)
+
+def _is_literal_value(text):
+    """Check if text is a value a unit literal can start with: a number, a name like _ or _3, or (...)."""
+    if text.startswith('(') and text.endswith(')'):
+        return True
+    if _is_unit_name(text):
+        return text not in _PYTHON_KEYWORDS
+    try:
+        float(text.replace('_', ''))
+        return True
+    except ValueError:
+        return False
+
+def _is_literal_unit(text):
+    """Check if text is a unit, unit expression or timezone that a unit literal can use."""
+    if _is_timezone(text):
+        return True
+    expression = _get_unit_expression(text)
+    if expression.tree is None:
+        return False
+    if all(_is_valid_unit(unit) for unit in expression.units):
+        return True
+    # Currencies ($eur, or their names) only exist once the currency data is loaded
+    if _CURRENCY_DATA_LOADED:
+        return False
+    _ensure_currency_data_loaded()
+    return all(_is_valid_unit(unit) for unit in expression.units)
+
+def _split_unit_literal(text):
+    """Split 'value unit -> unit' or 'value unit in unit' into (value, from_unit, to_unit), or None."""
+    splits = []
+    if '->' in text:
+        left, right = text.split('->', 1)
+        splits.append((left, right))
+    else:
+        # 'in' is also a unit (inches), so try every ' in ' until one fits
+        position = text.find(' in ')
+        while position != -1:
+            splits.append((text[:position], text[position + 4:]))
+            position = text.find(' in ', position + 1)
+    
+    for left, right in splits:
+        parts = left.strip().rsplit(None, 1)
+        to_unit = right.strip()
+        if (len(parts) == 2 and _is_literal_value(parts[0]) and to_unit
+                and _is_literal_unit(parts[1]) and _is_literal_unit(to_unit)):
+            return (parts[0], parts[1], to_unit)
+    return None
+
+def _rewrite_unit_literal(source):
+    """
+    Rewrite a unit literal like '5 mi -> km' or '60 mi/h in m/s' into a conversion call.
+    
+    The value can be a number, a name (like _ or _3) or an expression in
+    parentheses. Rewrites are cached by source text; other source is returned
+    unchanged.
+    
+    Examples:
+        _rewrite_unit_literal('5 mi -> km')         # "_inline_convert('mi', 'km', 5)"
+        _rewrite_unit_literal('60 mi/h in m/s')     # "_inline_convert('mi/h', 'm/s', 60)"
+        _rewrite_unit_literal('x in items')         # 'x in items'
+    """
+    if '->' not in source and ' in ' not in source:
+        return source
+    
+    rewritten = _unit_literal_cache.get(source)
+    if rewritten is None:
+        literal = _split_unit_literal(source.strip())
+        if literal is None:
+            rewritten = source
+        else:
+            value, from_unit, to_unit = literal
+            rewritten = f'_inline_convert({from_unit!r}, {to_unit!r}, {value})'
+        _unit_literal_cache.put(source, rewritten)
+    return rewritten
+
+def _inline_convert(from_unit, to_unit, value):
+    """Convert a value for a rewritten unit literal, using a cached converter."""
+    key = (from_unit, to_unit)
+    unit_converter = _inline_converter_cache.get(key)
+    if unit_converter is None:
+        unit_converter = converter(from_unit, to_unit)
+        if unit_converter is None:
+            return None
+        _inline_converter_cache.put(key, unit_converter)
+    return unit_converter(value)
+
+def iconvert(from_unit, to_unit, values, exact=False):
+    """
+    Lazily convert a stream of values from one unit to another.
+    
+    The units are resolved once; values are then converted one at a time as
+    they are consumed, so iterables of any length (generators, file readers,
+    sensor input) are converted in constant memory. Strings (like lines read
+    from a file) are read as numbers, and blank ones are skipped.
+    
+    Args:
+        from_unit (str): The source unit (simple, combined, or timezone)
+        to_unit (str): The target unit (simple, combined, or timezone)
+        values: Any iterable of numbers or numeric strings
+        exact (bool): Convert exactly, giving Fractions
+        
+    Returns:
+        An iterator over the converted values, or None if the units are invalid
+        
+    Examples:
+        >>> list(iconvert('c', 'f', (x * 10 for x in range(3))))
+        [32.0, 50.0, 68.0]
+        >>> with open('speeds.txt') as f:
+        ...     fastest = max(iconvert('mi/h', 'km/h', f))
+    """
+    _ensure_currency_data_loaded()
+    if exact and not _can_convert_exactly():
+        return None
+    
+    transform = _resolve_conversion(from_unit, to_unit, exact)
+    if transform is None:
+        return None
+    return _ConversionStream(values, transform[0], transform[1], exact)
+
+class _ConversionStream:
+    """Iterator returned by iconvert(), applying value * scale + offset to each value of an iterable."""
+    __slots__ = ('values', 'scale', 'offset', 'exact')
+    
+    def __init__(self, values, scale, offset, exact):
+        self.values = iter(values)
+        self.scale = scale
+        self.offset = offset
+        self.exact = exact
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        while True:
+            value = next(self.values)
+            if isinstance(value, str):
+                value = value.strip()
+                if not value:
+                    continue
+                value = fractions.Fraction(value) if self.exact else float(value)
+            elif self.exact:
+                value = _to_fraction(value)
+            return value * self.scale + self.offset
+
+# Plain numbers a quantity can be scaled by
+_NUMBER_TYPES = (int, float) if fractions is None else (int, float, fractions.Fraction)
+
+# Interned unit names of quantities: name -> the one string object used for it,
+# so quantities in the same unit share it and unit checks are identity checks
+_quantity_units = {}
+
+def _combine_units(left, operator, right):
+    """Join two unit expressions with * or /, parenthesizing a compound right operand."""
+    if '*' in right or '/' in right:
+        right = f'({right})'
+    return f'{left}{operator}{right}'
+
+class Quantity:
+    """
+    A value with a unit, like 5*mi (unit names can be used directly in calculations).
+    
+    Quantities can be added, subtracted and compared across units: the right
+    operand is converted into the left operand's unit, resolving one cached
+    factor per pair of units. Multiplying or dividing quantities combines their
+    units. Use .to(unit) to convert.
+    
+    Temperatures with different zero points (c, f and k) cannot be added or
+    subtracted, as the result would depend on where each scale starts.
+    
+    Examples:
+        >>> 5*mi + 3*km
+        6.864113576712002 mi
+        >>> (5*mi + 3*km).to('km')
+        11.04672 km
+        >>> 100*km / (2*u.h)
+        50.0 km/h
+    """
+    __slots__ = ('value', 'unit')
+    
+    def __init__(self, value, unit):
+        self.value = value
+        self.unit = _quantity_units.setdefault(unit, unit)
+    
+    def to(self, unit):
+        """Convert to another unit, or return None if the units are invalid (an explanation is printed)."""
+        transform = _resolve_conversion(self.unit, unit)
+        if transform is None:
+            return None
+        return Quantity(self.value * transform[0] + transform[1], unit)
     
+    def _value_in_unit(self, other, additive=False):
+        """Get another quantity's value in this quantity's unit.
+        
+        With additive=True (for + and -), units with different zero points are rejected."""
+        if other.unit is self.unit:
+            return other.value
+        transform = _resolve_conversion(other.unit, self.unit)
+        if transform is None:
+            raise ValueError(f"Cannot convert '{other.unit}' to '{self.unit}'")
+        if additive and transform[1]:
+            raise ValueError(f"Cannot add or subtract '{other.unit}' and '{self.unit}', which start from "
+                             f"different zeros. Convert one with .to('{self.unit}') first.")
+        return other.value * transform[0] + transform[1]
+    
+    def __add__(self, other):
+        if isinstance(other, Quantity):
+            return Quantity(self.value + self._value_in_unit(other, True), self.unit)
+        return NotImplemented
+    
+    def __radd__(self, other):
+        # sum() starts from 0
+        if isinstance(other, (int, float)) and other == 0:
+            return self
+        return NotImplemented
+    
+    def __sub__(self, other):
+        if isinstance(other, Quantity):
+            return Quantity(self.value - self._value_in_unit(other, True), self.unit)
+        return NotImplemented
+    
+    def __mul__(self, other):
+        if isinstance(other, Quantity):
+            return Quantity(self.value * other.value, _combine_units(self.unit, '*', other.unit))
+        if isinstance(other, _NUMBER_TYPES):
+            return Quantity(self.value * other, self.unit)
+        if isinstance(other, (list, tuple, range, array.array)):
+            # A batch of numbers becomes a QuantityArray
+            return QuantityArray(_apply_transform(array.array('d', other), self.value, 0), self.unit)
+        return NotImplemented
+    
+    def __rmul__(self, other):
+        if isinstance(other, _NUMBER_TYPES):
+            return Quantity(other * self.value, self.unit)
+        if isinstance(other, (list, tuple, range, array.array)):
+            return QuantityArray(_apply_transform(array.array('d', other), self.value, 0), self.unit)
+        return NotImplemented
+    
+    def __truediv__(self, other):
+        if isinstance(other, Quantity):
+            from_dimensions = _get_unit_dimensions(other.unit)
+            to_dimensions = _get_unit_dimensions(self.unit)
+            if from_dimensions and to_dimensions and from_dimensions[1] == to_dimensions[1]:
+                # Same dimensions: the units cancel out
+                return self.value / self._value_in_unit(other)
+            return Quantity(self.value / other.value, _combine_units(self.unit, '/', other.unit))
+        if isinstance(other, _NUMBER_TYPES):
+            return Quantity(self.value / other, self.unit)
+        return NotImplemented
+    
+    def __rtruediv__(self, other):
+        if isinstance(other, _NUMBER_TYPES):
+            return Quantity(other / self.value, _combine_units('1', '/', self.unit))
+        return NotImplemented
+    
+    def __pow__(self, exponent):
+        if isinstance(exponent, int):
+            unit = f'({self.unit})' if '*' in self.unit or '/' in self.unit else self.unit
+            return Quantity(self.value ** exponent, f'{unit}**{exponent}')
+        return NotImplemented
+    
+    def __neg__(self):
+        return Quantity(-self.value, self.unit)
+    
+    def __pos__(self):
+        return self
+    
+    def __abs__(self):
+        return Quantity(abs(self.value), self.unit)
+    
+    def __round__(self, ndigits=None):
+        return Quantity(round(self.value, ndigits), self.unit)
+    
+    def __float__(self):
+        return float(self.value)
+    
+    def __eq__(self, other):
+        if isinstance(other, Quantity):
+            # Quantities that cannot be converted are unequal, so they can share a list or dict
+            try:
+                return self.value == self._value_in_unit(other)
+            except ValueError:
+                return False
+        return NotImplemented
+    
+    def __lt__(self, other):
+        if isinstance(other, Quantity):
+            return self.value < self._value_in_unit(other)
+        return NotImplemented
+    
+    def __le__(self, other):
+        if isinstance(other, Quantity):
+            return self.value <= self._value_in_unit(other)
+        return NotImplemented
+    
+    def __gt__(self, other):
+        if isinstance(other, Quantity):
+            return self.value > self._value_in_unit(other)
+        return NotImplemented
+    
+    def __ge__(self, other):
+        if isinstance(other, Quantity):
+            return self.value >= self._value_in_unit(other)
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return f'{self.value!r} {self.unit}'
+
+class QuantityArray:
+    """
+    Many values with one unit, stored compactly in an array('d').
+    
+    Iterating gives the plain values, so sum(), mean() and the other statistics
+    functions work directly; the sum(), mean(), min() and max() methods keep the
+    unit. Arithmetic is elementwise, and .to(unit) converts every value with a
+    single bulk scale (vectorized when NumPy is loaded).
+    
+    Examples:
+        >>> distances = QuantityArray([3, 5, 10], 'mi')
+        >>> distances.to('km')
+        QuantityArray([4.828032, 8.04672, 16.09344], 'km')
+        >>> distances.mean()
+        6.0 mi
+        >>> [1, 2, 3] * km + 500 * u.m
+        QuantityArray([1.5, 2.5, 3.5], 'km')
+    """
+    __slots__ = ('values', 'unit')
+    
+    def __init__(self, values, unit):
+        self.values = values if _is_double_array(values) else array.array('d', values)
+        self.unit = _quantity_units.setdefault(unit, unit)
+    
+    def to(self, unit):
+        """Convert every value to another unit, or return None if the units are invalid (an explanation is printed)."""
+        transform = _resolve_conversion(self.unit, unit)
+        if transform is None:
+            return None
+        return QuantityArray(_apply_transform(self.values, transform[0], transform[1]), unit)
+    
+    def _values_in_unit(self, other):
+        """Get another quantity array's values in this array's unit."""
+        if other.unit is self.unit:
+            return other.values
+        # Checks the units like adding single quantities does
+        Quantity(0, self.unit)._value_in_unit(Quantity(0, other.unit), True)
+        return other.to(self.unit).values
+    
+    def _combine(self, other, operation, unit):
+        """Apply an elementwise operation with another quantity array's values."""
+        if len(other) != len(self.values):
+            raise ValueError(f"Cannot combine arrays of {len(self.values)} and {len(other)} values")
+        values = array.array('d', map(operation, self.values, other))
+        return QuantityArray(values, unit)
+    
+    def __add__(self, other):
+        if isinstance(other, QuantityArray):
+            return self._combine(self._values_in_unit(other), float.__add__, self.unit)
+        if isinstance(other, Quantity):
+            offset = Quantity(0, self.unit)._value_in_unit(other, True)
+            return QuantityArray(_apply_transform(self.values, 1, offset), self.unit)
+        return NotImplemented
+    
+    def __sub__(self, other):
+        if isinstance(other, QuantityArray):
+            return self._combine(self._values_in_unit(other), float.__sub__, self.unit)
+        if isinstance(other, Quantity):
+            offset = Quantity(0, self.unit)._value_in_unit(other, True)
+            return QuantityArray(_apply_transform(self.values, 1, -offset), self.unit)
+        return NotImplemented
+    
+    def __mul__(self, other):
+        if isinstance(other, QuantityArray):
+            return self._combine(other.values, float.__mul__, _combine_units(self.unit, '*', other.unit))
+        if isinstance(other, Quantity):
+            return QuantityArray(_apply_transform(self.values, other.value, 0), _combine_units(self.unit, '*', other.unit))
+        if isinstance(other, (int, float)):
+            return QuantityArray(_apply_transform(self.values, other, 0), self.unit)
+        return NotImplemented
+    
+    def __rmul__(self, other):
+        if isinstance(other, (int, float)):
+            return QuantityArray(_apply_transform(self.values, other, 0), self.unit)
+        return NotImplemented
+    
+    def __truediv__(self, other):
+        if isinstance(other, QuantityArray):
+            return self._combine(other.values, float.__truediv__, _combine_units(self.unit, '/', other.unit))
+        if isinstance(other, Quantity):
+            return QuantityArray(_apply_transform(self.values, 1 / other.value, 0), _combine_units(self.unit, '/', other.unit))
+        if isinstance(other, (int, float)):
+            return QuantityArray(_apply_transform(self.values, 1 / other, 0), self.unit)
+        return NotImplemented
+    
+    def __neg__(self):
+        return QuantityArray(_apply_transform(self.values, -1, 0), self.unit)
+    
+    def sum(self):
+        """Get the sum of the values, with the unit."""
+        return Quantity(math.fsum(self.values), self.unit)
+    
+    def mean(self):
+        """Get the mean (average) of the values, with the unit."""
+        if not self.values:
+            raise ValueError("mean requires at least one data point")
+        return Quantity(math.fsum(self.values) / len(self.values), self.unit)
+    
+    def min(self):
+        """Get the smallest value, with the unit."""
+        return Quantity(min(self.values), self.unit)
+    
+    def max(self):
+        """Get the largest value, with the unit."""
+        return Quantity(max(self.values), self.unit)
+    
+    def __len__(self):
+        return len(self.values)
+    
+    def __iter__(self):
+        return iter(self.values)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return QuantityArray(self.values[index], self.unit)
+        return Quantity(self.values[index], self.unit)
+    
+    def __repr__(self):
+        return f'QuantityArray({list(self.values)!r}, {self.unit!r})'
+
+def _is_double_array(values):
+    """Check if values are already an array('d') that a QuantityArray can keep without copying."""
+    return isinstance(values, array.array) and values.typecode == 'd'
+
+# Python keywords, which cannot be used as names (the keyword module is not
+# available on MicroPython)
+_PYTHON_KEYWORDS = (
+    'False', 'None', 'True', 'and', 'as', 'assert', 'async', 'await', 'break',
+    'class', 'continue', 'def', 'del', 'elif', 'else', 'except', 'finally', 'for',
+    'from', 'global', 'if', 'import', 'in', 'is', 'lambda', 'nonlocal', 'not', 'or',
+    'pass', 'raise', 'return', 'try', 'while', 'with', 'yield',
+)
+
+def _bind_unit_global(name):
+    """Make a unit name usable in calculations like 5*mi, unless the name is already taken.
+    
+    Single-letter units (m, s, c, ...) are not bound, so a typo or an unset
+    variable still raises NameError; use them through u, as in 5*u.m."""
+    namespace = globals()
+    if (_is_unit_name(name) and len(name) > 1 and name not in _PYTHON_KEYWORDS
+            and name not in namespace and not hasattr(builtins, name)):
+        namespace[name] = Quantity(1, name)
+
+class _UnitNamespace:
+    """Every unit as an attribute, for calculations like 5*u.m or 2*u.h (see u)."""
+    __slots__ = ()
+    
+    def __getattr__(self, name):
+        if name.startswith('_') or not _is_valid_unit(name):
+            raise AttributeError(f"There is no unit named '{name}'. Type 'units' to see available conversions.")
+        return Quantity(1, name)
+    
+    def __repr__(self):
+        return "<units: use like 5*u.m>"
+
+# Units by name, including those too short to be bound as globals: 5*u.m, 100*km/(2*u.h)
+u = _UnitNamespace()
+
+# Units defined at runtime with defunit(): name -> (category, long_name)
+_defined_units = {}
+
+def _add_unit_name(unit, long_name):
+    """Add a full name to _UNIT_NAMES, patching the alias index in place if it is current."""
+    global _alias_version
+    
+    current = _alias_index is not None and _alias_version == (_matrix_version(), len(_UNIT_NAMES))
+    _UNIT_NAMES[unit] = long_name
+    _resolved_unit_cache.clear()
+    _suggestion_cache.clear()
+    if current:
+        internal_unit = _get_external_to_internal_mapping().get(unit)
+        if internal_unit is not None:
+            for form in _alias_forms(long_name):
+                _alias_index.setdefault(form, internal_unit)
+        _alias_version = (_matrix_version(), len(_UNIT_NAMES))
+
+def defunit(name, category, factor, base_unit, long_name=""):
+    """
+    Define a new unit that can be used at once in convert(), units() and find().
+    
+    The unit is added to the conversion indexes incrementally, so defining many
+    units (for example from an init script) does not rebuild them. Defining a
+    unit again with the same name replaces it.
+    
+    Args:
+        name (str): Name of the new unit, like 'pallet' (letters, digits and _)
+        category (str): Category of the unit, which must match base_unit's
+        factor (float): How many base_units make one of the new unit
+        base_unit (str): An existing unit to define the new unit from
+        long_name (str): Optional full name shown by units() and find()
+        
+    Examples:
+        >>> defunit('pallet', 'weight', 1200, 'lb', 'pallets')
+        >>> convert('pallet', 'kg', 2)
+        1088.6208
+        >>> defunit('sprint', 'time', 2, 'wk')
+        >>> convert('sprint', 'd', 3)
+        42.0
+    """
+    _ensure_currency_data_loaded()
+    
+    error_lines, base_internal = _check_unit_definition(name, category, factor, base_unit)
+    if error_lines:
+        _print_buffered(error_lines)
+        return
+    _define_unit(name.lower(), category.lower(), factor, base_internal, long_name)
+
+def _is_unit_name(name):
+    """Check if a string can name a unit (letters, digits and _, starting with a letter or _)."""
+    return (isinstance(name, str) and name != '' and not name[0].isdigit()
+            and name.replace('_', 'a').isalnum())
+
+def _check_unit_definition(name, category, factor, base_unit, pack_units=None):
+    """
+    Validate a unit definition for defunit() or a unit pack.
+    
+    Args:
+        name, category, factor, base_unit: As for defunit()
+        pack_units (dict): Units defined earlier in the same pack (name -> category),
+            which can be base units before they are in the conversion matrix
+        
+    Returns:
+        tuple: (error_lines, base_internal) where error_lines is empty if the
+               definition is valid
+    """
+    if not _is_unit_name(name):
+        return ([f"Invalid unit name {name!r}. Use letters, digits and underscores, starting with a letter."], None)
+    name = name.lower()
+    category = category.lower()
+    
+    if pack_units is not None and name in pack_units:
+        return ([f"The unit '{name}' is defined more than once."], None)
+    if name not in _defined_units and (_is_valid_unit(name) or _is_timezone(name)):
+        return ([f"The unit '{name}' already exists. Type 'units' to see available conversions."], None)
+    if name in _defined_units and _defined_units[name][0] != category:
+        # Units defined from this one would be left in the old category
+        old_internal = f'{_defined_units[name][0]}.{name}'
+        dependents = sorted(_get_unit_name(unit1) for unit1, unit2 in _CONVERSION_MATRIX if unit2 == old_internal)
+        if dependents:
+            return ([f"The unit '{name}' cannot move to {category} while {', '.join(dependents)} "
+                     f"{'is' if len(dependents) == 1 else 'are'} defined from it."], None)
+    
+    if not isinstance(factor, (int, float)) or isinstance(factor, bool) or factor <= 0:
+        return ([f"The factor for '{name}' must be a positive number, not {factor!r}."], None)
+    
+    if pack_units is not None and base_unit.lower() in pack_units:
+        base_internal = f'{pack_units[base_unit.lower()]}.{base_unit.lower()}'
+    elif not _is_valid_unit(base_unit) or _is_combined_unit(base_unit):
+        error_lines = [f"Could not define '{name}' from the unit '{base_unit}'. Did you mean one of the following?"]
+        return (error_lines + _generate_units_lines(base_unit), None)
+    else:
+        base_internal = _to_internal_unit(base_unit)
+    
+    base_category = _get_unit_category(base_internal)
+    if base_category != category:
+        return ([f"The unit '{base_unit}' is a {base_category} unit, not a {category} unit."], None)
+    return ([], base_internal)
+
+def _remove_defined_unit(name):
+    """Remove a unit defined with defunit(), with its conversions and names, before it is redefined."""
+    global _matrix_edits
+    
+    category, long_name = _defined_units.pop(name)
+    internal_unit = f'{category}.{name}'
+    for key in [key for key in _CONVERSION_MATRIX if key[0] == internal_unit]:
+        del _CONVERSION_MATRIX[key]
+    # Removing entries changes the matrix version, so the registry, alias index and
+    # other derived indexes are rebuilt without the old definition on next use
+    _matrix_edits += 1
+    if _external_to_internal_cache is not None and _external_to_internal_cache.get(name) == internal_unit:
+        del _external_to_internal_cache[name]
+    _UNIT_NAMES.pop(name, None)
+    _resolved_unit_cache.clear()
+    _suggestion_cache.clear()
+
+def _undefine_unit(name):
+    """Remove a unit defined with defunit() or a unit pack completely, including its
+    bound name and, for the base unit of a pack's category, the category's dimensions."""
+    category = _defined_units[name][0]
+    internal_unit = f'{category}.{name}'
+    _remove_defined_unit(name)
+    namespace = globals()
+    if isinstance(namespace.get(name), Quantity) and namespace[name].unit == name:
+        del namespace[name]
+    if _CATEGORY_DIMENSIONS.get(category, (None,))[0] == internal_unit:
+        del _CATEGORY_DIMENSIONS[category]
+
+def _define_unit(name, category, factor, base_internal, long_name):
+    """Add a validated unit definition to the conversion matrix and the unit names."""
+    internal_unit = f'{category}.{name}'
+    if name in _defined_units:
+        # Redefining: remove the old entry (which may be in another category) so
+        # the unit has a single definition
+        _remove_defined_unit(name)
+    
+    _add_conversion(internal_unit, base_internal, factor)
+    _defined_units[name] = (category, long_name)
+    if long_name:
+        _add_unit_name(name, long_name)
+    _bind_unit_global(name)
+
+def _define_base_unit(name, category, scale, dimensions, long_name):
+    """Add the base unit of a new category from a unit pack, with its size in base dimensions (if any)."""
+    internal_unit = f'{category}.{name}'
+    if name in _defined_units:
+        _remove_defined_unit(name)
+    
+    # A base unit has no conversion of its own, so an identity entry registers it
+    # even if no other unit is defined from it
+    _add_conversion(internal_unit, internal_unit, 1)
+    if dimensions is not None:
+        _CATEGORY_DIMENSIONS[category] = (internal_unit, scale, tuple(dimensions))
+    _defined_units[name] = (category, long_name)
+    if long_name:
+        _add_unit_name(name, long_name)
+    _bind_unit_global(name)
+
+# Compiled unit pack cache: a header followed by the pack's records.
+# The header holds the source file's size and CRC-32, so a cache stays valid until
+# the contents change, whatever the file's mtime (which may only have whole seconds).
+_UNIT_PACK_MAGIC = b'PYCOUNITS2'
+_UNIT_PACK_HEADER = '<10sIIBI'
+
+def _parse_unit_pack(text):
+    """
+    Parse and validate the text of a unit pack.
+    
+    Each line defines one unit, either from an existing unit or a unit defined
+    earlier in the pack, or as the base unit of a new category:
+    
+        name  category  factor  base_unit  [long name]
+        name  category  =       dimensions [long name]
+    
+    where dimensions is a unit expression giving the size of the base unit
+    (like kg/(m*s**2) for pascals), or - if it has no dimensions.
+    
+    Returns:
+        tuple: (records, error) where records is a list of
+               ('unit', name, category, factor, base_internal, long_name) and
+               ('base', name, category, scale, dimensions, long_name) tuples,
+               and error is a message or None
+    """
+    records = []
+    pack_units = {}
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        fields = line.split(None, 4)
+        if len(fields) < 4:
+            return (None, f"Line {number}: expected 'name category factor base_unit [long name]'")
+        name, category, factor, base = fields[:4]
+        long_name = fields[4] if len(fields) > 4 else ""
+        name = name.lower()
+        category = category.lower()
+        
+        if factor == '=':
+            if not _is_unit_name(name) or not _is_unit_name(category):
+                return (None, f"Line {number}: invalid unit or category name")
+            if name in pack_units:
+                return (None, f"Line {number}: the unit '{name}' is defined more than once")
+            if name not in _defined_units and (category in _get_all_categories() or category in _CATEGORY_DIMENSIONS):
+                return (None, f"Line {number}: the category '{category}' already exists")
+            if base == '-':
+                scale, dimensions = (1, None)
+            else:
+                reduced = _get_unit_dimensions(base)
+                if reduced is None:
+                    return (None, f"Line {number}: could not work out the dimensions of '{base}'")
+                scale, dimensions = reduced
+            pack_units[name] = category
+            records.append(('base', name, category, scale, dimensions, long_name))
+            continue
+        
+        try:
+            factor = float(factor)
+        except ValueError:
+            return (None, f"Line {number}: the factor must be a number, not '{factor}'")
+        error_lines, base_internal = _check_unit_definition(name, category, factor, base, pack_units)
+        if error_lines:
+            return (None, f"Line {number}: {error_lines[0]}")
+        pack_units[name] = category
+        records.append(('unit', name, category, factor, base_internal, long_name))
+    return (records, None)
+
+def _pack_string(text):
+    """Encode a string as a length-prefixed UTF-8 field."""
+    data = text.encode('utf-8')
+    return struct.pack('<H', len(data)) + data
+
+def _write_unit_pack_cache(cache_path, records, size, crc):
+    """Write compiled unit pack records to a binary cache file (errors are ignored)."""
+    parts = [struct.pack(_UNIT_PACK_HEADER, _UNIT_PACK_MAGIC, size, crc,
+                         len(_BASE_DIMENSIONS), len(records))]
+    for kind, name, category, number, detail, long_name in records:
+        if kind == 'unit':
+            parts.append(struct.pack('<Bd', 0, number) + _pack_string(detail))
+        elif detail is None:
+            parts.append(struct.pack('<Bd', 1, number))
+        else:
+            parts.append(struct.pack('<Bd', 2, number) + struct.pack(f'<{len(detail)}b', *detail))
+        parts.append(_pack_string(name) + _pack_string(category) + _pack_string(long_name))
+    try:
+        with open(cache_path, 'wb') as f:
+            f.write(b''.join(parts))
+    except OSError:
+        pass
+
+def _read_unit_pack_cache(cache_path, size, crc):
+    """
+    Read compiled unit pack records from a binary cache file with a single read.
+    
+    The cache is valid for a source file of the same size and CRC-32.
+    
+    Returns:
+        list: The records, as returned by _parse_unit_pack, or None if the cache
+              is missing, stale or damaged
+    """
     try:
-        return _convert_simple(from_unit, to_unit, value)
-    except ValueError as e:
-        raise e
+        with open(cache_path, 'rb') as f:
+            data = f.read()
+        magic, cached_size, cached_crc, dimension_count, count = struct.unpack_from(_UNIT_PACK_HEADER, data)
+        if (magic != _UNIT_PACK_MAGIC or cached_size != size or cached_crc != crc
+                or dimension_count != len(_BASE_DIMENSIONS)):
+            return None
+        
+        position = struct.calcsize(_UNIT_PACK_HEADER)
+        
+        def read_string():
+            nonlocal position
+            length = struct.unpack_from('<H', data, position)[0]
+            position += 2 + length
+            return data[position - length:position].decode('utf-8')
+        
+        records = []
+        for _ in range(count):
+            kind, number = struct.unpack_from('<Bd', data, position)
+            position += 9
+            if kind == 0:
+                detail = read_string()
+            elif kind == 1:
+                detail = None
+            else:
+                detail = struct.unpack_from(f'<{dimension_count}b', data, position)
+                position += dimension_count
+            name = read_string()
+            category = read_string()
+            long_name = read_string()
+            records.append(('unit' if kind == 0 else 'base', name, category, number, detail, long_name))
+        return records
+    except (OSError, ValueError, IndexError, struct.error):
+        return None
 
+def _check_unit_pack_records(records):
+    """Check that the units cached records are defined from still exist in this session.
+    
+    A pack can build on units defined with defunit(), which a cache written in
+    another session cannot vouch for."""
+    pack_units = set()
+    for kind, name, category, number, detail, long_name in records:
+        if kind == 'unit' and detail not in pack_units and not _is_known_unit(detail):
+            return False
+        pack_units.add(f'{category}.{name}')
+    return True
 
+def loadunits(path):
+    """
+    Load a pack of extra units from a data file.
+    
+    Each line defines one unit, with # starting a comment:
+    
+        pallet  weight    1200        lb   pallets
+        pa      pressure  =           kg/(m*s**2)  pascals
+        psi     pressure  6894.76     pa   pounds per square inch
+    
+    A line with = starts a new category with its base unit, giving its size as a
+    unit expression (or - if it has no dimensions). The first load compiles the
+    pack into a binary cache next to the file (path + '.cache'), so later loads
+    of the same contents read it in one go instead of parsing the text again.
+    
+    Args:
+        path (str): Path of the unit pack file
+        
+    Returns:
+        int: The number of units that can now be converted, or None if the pack
+             could not be loaded
+        
+    Examples:
+        >>> loadunits('shop.units')
+        3
+        >>> convert('psi', 'kg/(m*s**2)', 1)
+        6894.76
+    """
+    _ensure_currency_data_loaded()
+    
+    try:
+        with open(path, 'rb') as f:
+            source = f.read()
+    except OSError:
+        _print_buffered([f"Could not read the unit pack '{path}'."])
+        return None
+    # The CRC is cheap next to parsing, and unlike the mtime it always sees an edit
+    size, crc = len(source), binascii.crc32(source) & 0xffffffff
+    cache_path = path + '.cache'
+    
+    records = _read_unit_pack_cache(cache_path, size, crc)
+    if records is not None and not _check_unit_pack_records(records):
+        records = None
+    if records is None:
+        try:
+            text = source.decode('utf-8')
+        except UnicodeError:
+            _print_buffered([f"Could not load the unit pack '{path}'. It is not UTF-8 text."])
+            return None
+        records, error = _parse_unit_pack(text)
+        if error:
+            _print_buffered([f"Could not load the unit pack '{path}'. {error}."])
+            return None
+        _write_unit_pack_cache(cache_path, records, size, crc)
+    
+    for kind, name, category, number, detail, long_name in records:
+        if kind == 'unit':
+            _define_unit(name, category, number, detail, long_name)
+        else:
+            _define_base_unit(name, category, number, detail, long_name)
+    return sum(1 for record in records if _is_valid_unit(record[1]))
 
 def tally():
     """Count the number of characters in user input (useful for tallying)."""
@@ -1544,51 +3865,69 @@ def _ensure_currency_data_loaded():
     _CURRENCY_DATA_LOADED = True
     _load_currency_data()
 
+def _read_currency_table(table):
+    """
+    Read the records of a binary currency table (see fetch_exchange_rates.py).
+    
+    Rates and names are read straight from the table as each record is
+    reached, so no decoded copy of the whole table is ever built.
+    
+    Args:
+        table (bytes): The decompressed table
+        
+    Yields:
+        (currency_code, country, currency, exchange_rate) for each record
+    """
+    magic, count, string_count, _ = struct.unpack_from('<4sHHH', table, 0)
+    if magic != b'PYCC':
+        raise ValueError("not a currency table")
+    rates_start = 10
+    refs_start = rates_start + 8 * count
+    offsets_start = refs_start + 6 * count
+    strings_start = offsets_start + 4 * (string_count + 1)
+    
+    def read_string(index):
+        start, end = struct.unpack_from('<II', table, offsets_start + 4 * index)
+        return str(table[strings_start + start:strings_start + end], 'utf-8')
+    
+    for i in range(count):
+        rate = struct.unpack_from('<d', table, rates_start + 8 * i)[0]
+        code, country, currency = struct.unpack_from('<3H', table, refs_start + 6 * i)
+        yield (read_string(code), read_string(country), read_string(currency), rate)
+
 def _load_currency_data():
     """Decode and load currency exchange rates into the conversion matrix and unit names."""
     try:
-        import json
-        # Decode base64 and decompress gzip
+        # Decode base64 and decompress gzip, dropping each stage once it is used
         compressed = base64.b64decode(_CURRENCY_DATA)
-        json_bytes = gzip.decompress(compressed)
-        data = json.loads(json_bytes.decode('utf-8'))
-        
-        records = data.get('data', [])
+        table = gzip.decompress(compressed)
+        del compressed
         
         # Track seen codes for conversion matrix (only add once per code)
         seen_codes = set()
         
         # Add each currency to the conversion matrix and unit names
         # Currency codes are prefixed with "$" to avoid conflicts (e.g., $CAD, $CUP)
-        for record in records:
-            currency_code = record.get('currency_code')
-            exchange_rate = record.get('exchange_rate')
-            country = record.get('country') or ''
-            currency = record.get('currency') or ''
+        for currency_code, country, currency, exchange_rate in _read_currency_table(table):
+            code_lower = currency_code.lower()
+            prefixed_code = f"${code_lower}"
+            
+            # Store country-specific entry for display/search: $eur_germany -> "Germany (Euro)"
+            country_key = country.lower().replace(' ', '_').replace('-', '_')
+            display_key = f"{prefixed_code}_{country_key}"
+            _UNIT_NAMES[display_key] = f"{country} ({currency})"
             
-            if currency_code:
-                code_lower = currency_code.lower()
-                prefixed_code = f"${code_lower}"
+            # Add to conversion matrix only once per code
+            if code_lower not in seen_codes:
+                seen_codes.add(code_lower)
                 
-                # Store country-specific entry for display/search: $eur_germany -> "Germany (Euro)"
-                country_key = country.lower().replace(' ', '_').replace('-', '_')
-                display_key = f"{prefixed_code}_{country_key}"
-                _UNIT_NAMES[display_key] = f"{country} ({currency})"
+                # Also store the base code for conversion lookups
+                _UNIT_NAMES[prefixed_code] = f"{country} ({currency})"
                 
-                # Add to conversion matrix only once per code
-                if code_lower not in seen_codes:
-                    seen_codes.add(code_lower)
-                    
-                    # Also store the base code for conversion lookups
-                    _UNIT_NAMES[prefixed_code] = f"{country} ({currency})"
-                    
-                    if exchange_rate and currency_code.upper() != 'USD':
-                        try:
-                            rate = float(exchange_rate)
-                            # USD to foreign currency: 1 USD = rate foreign
-                            _CONVERSION_MATRIX[('currency.$usd', f'currency.{prefixed_code}')] = rate
-                        except (ValueError, TypeError):
-                            pass
+                # Missing rates are stored as NaN, which never equals itself
+                if exchange_rate == exchange_rate and exchange_rate and code_lower != 'usd':
+                    # USD to foreign currency: 1 USD = rate foreign
+                    _add_conversion('currency.$usd', f'currency.{prefixed_code}', exchange_rate)
         
         # Make sure USD is in unit names
         _UNIT_NAMES['$usd'] = 'United States (Dollar)'
@@ -1673,6 +4012,14 @@ million = 1_000_000
 billion = 1_000_000_000
 trillion = 1_000_000_000_000
 
+# Bind unit names (mi, km, kg, ...) to quantities for calculations like 5*mi + 3*km.
+# Names already in use (like min, e or the data size constants) keep their meaning,
+# and single-letter units are only available through u.
+for _unit in _get_unit_registry().units:
+    if not _unit.startswith('currency.'):
+        _bind_unit_global(_get_unit_name(_unit))
+del _unit
+
 print("""
              +------------+
              |+-------8< +|
@@ -8,6 +8,11 @@ coverage report -m
 import unittest
 import sys
 import io
+import math
+import os
+import array
+import tempfile
+from fractions import Fraction
 from unittest.mock import patch, MagicMock
 import pyco
 
@@ -856,6 +861,1251 @@ class TestPycoMultiStepConversions(unittest.TestCase):
                            f"Redundant entry found for {unit1}-{unit2}")
             seen_pairs.add(normalized_pair)
 
+class TestPycoAdjacencyIndex(unittest.TestCase):
+    """Test the adjacency index used to walk the conversion matrix"""
+    
+    def _scan_connected_units(self, unit):
+        """Reference implementation: scan the whole matrix for connections"""
+        connections = []
+        for (unit1, unit2), factor_or_func in pyco._CONVERSION_MATRIX.items():
+            if unit1 == unit:
+                connections.append((unit2, factor_or_func))
+            elif unit2 == unit and not callable(factor_or_func):
+                connections.append((unit1, 1/factor_or_func))
+        return connections
+    
+    def test_index_matches_matrix_scan(self):
+        """Test that indexed connections match a full scan of the matrix, in order"""
+        pyco._ensure_currency_data_loaded()
+        for unit in ['distance.m', 'volume.ml', 'temperature.c', 'currency.$usd', 'currency.$eur']:
+            with self.subTest(unit=unit):
+                self.assertEqual(pyco._get_connected_units(unit), self._scan_connected_units(unit))
+    
+    def test_unknown_unit_has_no_connections(self):
+        """Test that a unit missing from the matrix has no connections"""
+        self.assertEqual(pyco._get_connected_units('distance.nonexistent'), [])
+    
+    def test_add_conversion_patches_index(self):
+        """Test that _add_conversion updates the existing index instead of rebuilding it"""
+        key = ('distance.ft', 'distance.m')
+        index = pyco._get_adjacency_index()
+        try:
+            pyco._add_conversion('distance.ft', 'distance.m', 0.3048)
+            self.assertIs(pyco._get_adjacency_index(), index)
+            self.assertIn(('distance.m', 0.3048), pyco._get_connected_units('distance.ft'))
+            self.assertIn(('distance.ft', 1/0.3048), pyco._get_connected_units('distance.m'))
+        finally:
+            del pyco._CONVERSION_MATRIX[key]
+        self.assertNotIn(('distance.m', 0.3048), pyco._get_connected_units('distance.ft'))
+    
+    def test_direct_matrix_edit_rebuilds_index(self):
+        """Test that entries added to the matrix directly are picked up"""
+        key = ('distance.ft', 'distance.m')
+        index = pyco._get_adjacency_index()
+        try:
+            pyco._CONVERSION_MATRIX[key] = 0.3048
+            self.assertIsNot(pyco._get_adjacency_index(), index)
+            self.assertIn(('distance.m', 0.3048), pyco._get_connected_units('distance.ft'))
+        finally:
+            del pyco._CONVERSION_MATRIX[key]
+
+class TestPycoBaseUnitTable(unittest.TestCase):
+    """Test the compiled base-unit table used for conversions"""
+    
+    def test_all_pairs_match_search(self):
+        """Test that every pair of units converts like the BFS search engine"""
+        pyco._ensure_currency_data_loaded()
+        for category in pyco._get_all_categories():
+            units = pyco._get_units_by_category(category)
+            if category == 'currency':
+                units = [u for u in units if u in ['$usd', '$eur', '$gbp', '$jpy', '$cad']]
+            test_value = 1.0 if category != 'temperature' else 25.0
+            for from_unit in units:
+                for to_unit in units:
+                    with self.subTest(from_unit=from_unit, to_unit=to_unit):
+                        expected = pyco._convert_by_search(from_unit, to_unit, test_value)
+                        result = pyco._convert_simple(from_unit, to_unit, test_value)
+                        # The volume units have redundant edges that disagree in the
+                        # sixth significant digit, so paths may differ slightly
+                        self.assertLess(abs(result - expected), 1e-5 * abs(expected) + 1e-9)
+    
+    def test_direct_conversions_use_stored_factor(self):
+        """Test that units with a direct matrix entry convert with exactly that factor"""
+        self.assertEqual(pyco._get_affine_transform('volume.tsp', 'volume.ml'), (4.92892, 0))
+        self.assertEqual(pyco._get_affine_transform('speed.kn', 'speed.mph'), (1.15078, 0))
+        self.assertEqual(pyco._get_affine_transform('temperature.c', 'temperature.f'), (1.8, 32))
+    
+    def test_temperature_offsets(self):
+        """Test that offset conversions without a direct entry go through the table"""
+        scale, offset = pyco._get_affine_transform('temperature.k', 'temperature.f')
+        self.assertAlmostEqual(scale, 1.8)
+        self.assertAlmostEqual(273.15 * scale + offset, 32.0)
+    
+    def test_unconnected_units(self):
+        """Test that units in different categories have no transform"""
+        self.assertIsNone(pyco._get_affine_transform('distance.m', 'weight.kg'))
+        self.assertIsNone(pyco._get_affine_transform('distance.m', 'distance.nonexistent'))
+        with self.assertRaises(ValueError):
+            pyco._convert_simple('mi', 'kg', 1)
+    
+    def test_add_conversion_patches_table(self):
+        """Test that a new unit is added to the compiled table without recompiling"""
+        key = ('distance.testfurlong', 'distance.m')
+        table = pyco._get_base_unit_table()
+        try:
+            pyco._add_conversion('distance.testfurlong', 'distance.m', 201.168)
+            self.assertIs(pyco._get_base_unit_table(), table)
+            self.assertAlmostEqual(pyco.convert('testfurlong', 'mi', 8), 1.0)
+        finally:
+            del pyco._CONVERSION_MATRIX[key]
+            pyco._external_to_internal_cache.pop('testfurlong', None)
+        self.assertNotIn('distance.testfurlong', pyco._get_base_unit_table())
+
+class TestPycoAffineTransforms(unittest.TestCase):
+    """Test the affine transforms used for conversions with offsets"""
+    
+    def test_inverse_and_compose(self):
+        """Test inverting and composing affine transforms"""
+        c_to_f = pyco._Affine(9/5, 32)
+        self.assertEqual(c_to_f(100), 212)
+        self.assertAlmostEqual(c_to_f.inverse()(212), 100)
+        self.assertEqual(c_to_f.then(c_to_f.inverse()).scale, 1)
+        c_to_k = pyco._Affine(1, 273.15)
+        k_to_f = c_to_k.inverse().then(c_to_f)
+        self.assertEqual(k_to_f.scale, 1.8)
+        self.assertAlmostEqual(k_to_f(273.15), 32)
+        self.assertEqual(c_to_f.delta(), pyco._Affine(1.8))
+    
+    def test_matrix_has_no_functions(self):
+        """Test that temperature is stored as one affine entry per relationship"""
+        self.assertEqual(pyco._CONVERSION_MATRIX[('temperature.c', 'temperature.f')], pyco._Affine(9/5, 32))
+        self.assertNotIn(('temperature.f', 'temperature.c'), pyco._CONVERSION_MATRIX)
+        for conv in pyco._CONVERSION_MATRIX.values():
+            self.assertTrue(isinstance(conv, (int, float, pyco._Affine)))
+    
+    def test_reverse_edges_are_inverted(self):
+        """Test that the adjacency index inverts temperature edges like factors"""
+        connected = dict(pyco._get_connected_units('temperature.f'))
+        self.assertEqual(connected['temperature.c'], pyco._Affine(9/5, 32).inverse())
+    
+    def test_exact_scales(self):
+        """Test that temperature scales are exact, for absolute and delta conversions"""
+        self.assertEqual(pyco._get_affine_transform('temperature.k', 'temperature.f')[0], 1.8)
+        self.assertEqual(pyco._get_unit_conversion_factor('c', 'f'), 1.8)
+        self.assertEqual(pyco.convert('c/h', 'f/h', 10), 18)
+        self.assertEqual(pyco.convert('c', 'f', 100), 212)
+    
+    def test_add_affine_conversion(self):
+        """Test that a new offset unit converts to every connected unit"""
+        key = ('temperature.f', 'temperature.testrankine')
+        try:
+            pyco._add_conversion('temperature.f', 'temperature.testrankine', pyco._Affine(1, 459.67))
+            self.assertAlmostEqual(pyco.convert('k', 'testrankine', 100), 180)
+            self.assertAlmostEqual(pyco.convert('testrankine', 'c', 491.67), 0)
+        finally:
+            del pyco._CONVERSION_MATRIX[key]
+            pyco._external_to_internal_cache.pop('testrankine', None)
+
+class TestPycoUnitRegistry(unittest.TestCase):
+    """Test the unit registry used for validity and category lookups"""
+    
+    def test_registry_matches_matrix(self):
+        """Test that the registry holds exactly the units in the conversion matrix"""
+        registry = pyco._get_unit_registry()
+        all_units = set()
+        for unit1, unit2 in pyco._CONVERSION_MATRIX:
+            all_units.add(unit1)
+            all_units.add(unit2)
+        self.assertEqual(set(registry.units), all_units)
+        for unit, category in registry.units.items():
+            self.assertEqual(category, pyco._get_unit_category(unit))
+            self.assertIn(unit, registry.categories[category])
+    
+    def test_lookups(self):
+        """Test validity and category lookups through the registry"""
+        self.assertTrue(pyco._is_valid_unit('mi'))
+        self.assertTrue(pyco._is_valid_unit('C'))
+        self.assertFalse(pyco._is_valid_unit('nonexistent'))
+        self.assertIn('km', pyco._get_units_by_category('distance'))
+        self.assertEqual(pyco._get_units_by_category('nonexistent'), [])
+        self.assertIn('distance', pyco._get_all_categories())
+    
+    def test_returns_fresh_lists(self):
+        """Test that callers can modify returned lists without corrupting the registry"""
+        categories = pyco._get_all_categories()
+        categories.append('timezone')
+        self.assertNotIn('timezone', pyco._get_all_categories())
+        units = pyco._get_units_by_category('distance')
+        units.clear()
+        self.assertIn('km', pyco._get_units_by_category('distance'))
+    
+    def test_add_conversion_patches_registry(self):
+        """Test that new units are registered without rebuilding the registry"""
+        key = ('testcategory.testunit', 'testcategory.testbase')
+        registry = pyco._get_unit_registry()
+        units = registry.units
+        try:
+            pyco._add_conversion('testcategory.testunit', 'testcategory.testbase', 2)
+            self.assertIs(pyco._get_unit_registry().units, units)
+            self.assertTrue(pyco._is_valid_unit('testunit'))
+            self.assertIn('testcategory', pyco._get_all_categories())
+            self.assertEqual(set(pyco._get_units_by_category('testcategory')), {'testunit', 'testbase'})
+        finally:
+            del pyco._CONVERSION_MATRIX[key]
+            pyco._external_to_internal_cache.pop('testunit', None)
+            pyco._external_to_internal_cache.pop('testbase', None)
+        self.assertFalse(pyco._is_valid_unit('testunit'))
+        self.assertNotIn('testcategory', pyco._get_all_categories())
+
+class TestPycoAliasIndex(unittest.TestCase):
+    """Test the case-insensitive alias index used by _to_internal_unit"""
+    
+    def setUp(self):
+        pyco._ensure_currency_data_loaded()
+    
+    def test_mixed_case_units(self):
+        """Test that mixed-case unit names resolve through the index"""
+        self.assertEqual(pyco._to_internal_unit('KM'), 'distance.km')
+        self.assertEqual(pyco._to_internal_unit('$EUR'), 'currency.$eur')
+        self.assertEqual(pyco._to_internal_unit('Hp'), 'power.hp')
+    
+    def test_long_names(self):
+        """Test that long names resolve in plural and singular form"""
+        self.assertEqual(pyco._to_internal_unit('kilometers'), 'distance.km')
+        self.assertEqual(pyco._to_internal_unit('Miles'), 'distance.mi')
+        self.assertEqual(pyco._to_internal_unit('mile'), 'distance.mi')
+        self.assertEqual(pyco._to_internal_unit('inch'), 'distance.in')
+        self.assertEqual(pyco._to_internal_unit('foot'), 'distance.ft')
+        self.assertEqual(pyco._to_internal_unit('fluid ounces'), 'volume.floz')
+        self.assertEqual(pyco._to_internal_unit('Celsius'), 'temperature.c')
+        self.assertAlmostEqual(pyco.convert('Miles', 'kilometers', 1), 1.609344)
+    
+    def test_currency_names(self):
+        """Test that only currency names used by a single code are aliases"""
+        self.assertEqual(pyco._to_internal_unit('euro'), 'currency.$eur')
+        self.assertEqual(pyco._to_internal_unit('Euros'), 'currency.$eur')
+        self.assertEqual(pyco._to_internal_unit('yen'), 'currency.$jpy')
+        self.assertEqual(pyco._to_internal_unit('dollar'), 'dollar')
+        # Weight units outrank the ambiguous currency name
+        self.assertEqual(pyco._to_internal_unit('pound'), 'weight.lb')
+    
+    def test_unit_names_outrank_long_names(self):
+        """Test that every unit name maps to its own unit"""
+        mapping = pyco._get_external_to_internal_mapping()
+        index = pyco._get_alias_index()
+        for name, internal_unit in mapping.items():
+            self.assertEqual(pyco._get_unit_name(index[name.lower()]).lower(), name.lower())
+    
+    def test_add_conversion_patches_index(self):
+        """Test that new units are added to the index without rebuilding it"""
+        key = ('distance.TestLeague', 'distance.m')
+        index = pyco._get_alias_index()
+        try:
+            pyco._add_conversion('distance.TestLeague', 'distance.m', 4828.032)
+            self.assertIs(pyco._get_alias_index(), index)
+            self.assertEqual(pyco._to_internal_unit('TESTLEAGUE'), 'distance.TestLeague')
+        finally:
+            del pyco._CONVERSION_MATRIX[key]
+            pyco._external_to_internal_cache.pop('TestLeague', None)
+        self.assertEqual(pyco._to_internal_unit('testleague'), 'testleague')
+
+class TestPycoDefunit(unittest.TestCase):
+    """Test defining units at runtime with defunit()"""
+    
+    def tearDown(self):
+        for name in list(pyco._defined_units):
+            pyco._undefine_unit(name)
+    
+    def test_define_and_convert(self):
+        """Test that a defined unit converts at once, in both directions"""
+        self.assertIsNone(pyco.defunit('pallet', 'weight', 1200, 'lb', 'pallets'))
+        self.assertAlmostEqual(pyco.convert('pallet', 'lb', 2), 2400)
+        self.assertAlmostEqual(pyco.convert('kg', 'pallet', 544.3104), 1)
+        self.assertAlmostEqual(pyco.convert('pallets', 'lb', 1), 1200)
+        pyco.defunit('sprint', 'time', 2, 'wk')
+        self.assertAlmostEqual(pyco.convert('sprint', 'd', 3), 42)
+        self.assertAlmostEqual(pyco.convert('pallet/sprint', 'lb/wk', 1), 600)
+    
+    def test_units_and_find(self):
+        """Test that defined units show up in units() and find()"""
+        pyco.defunit('pallet', 'weight', 1200, 'lb', 'pallets')
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            pyco.units('pallet')
+        self.assertIn('pallets', captured_output.getvalue())
+        self.assertIn('pallet - pallets (weight unit)', pyco.find('pallet'))
+        self.assertIn('pallet - pallets (weight unit)', pyco.find('pal*'))
+        self.assertIn('pallet - pallets (weight unit)', pyco.find('*lets'))
+        self.assertIn('pallet', pyco._get_units_by_category('weight'))
+    
+    def test_indexes_are_patched(self):
+        """Test that defining units updates the indexes without rebuilding them"""
+        pyco._ensure_currency_data_loaded()
+        pyco.convert('mi', 'km', 1)
+        pyco._to_internal_unit('Miles')
+        adjacency = pyco._get_adjacency_index()
+        table = pyco._get_base_unit_table()
+        registry_units = pyco._get_unit_registry().units
+        aliases = pyco._get_alias_index()
+        cached = len(pyco._conversion_cache)
+        for i in range(20):
+            pyco.defunit(f'testcrate{i}', 'weight', i + 1, 'kg', f'testcrates{i}')
+        self.assertIs(pyco._get_adjacency_index(), adjacency)
+        self.assertIs(pyco._get_base_unit_table(), table)
+        self.assertIs(pyco._get_unit_registry().units, registry_units)
+        self.assertIs(pyco._get_alias_index(), aliases)
+        self.assertEqual(len(pyco._conversion_cache), cached)
+        self.assertAlmostEqual(pyco.convert('testcrates19', 'testcrate0', 1), 20)
+    
+    def test_redefine(self):
+        """Test that defining a unit again replaces it"""
+        pyco.defunit('pallet', 'weight', 1200, 'lb')
+        pyco.defunit('pallet', 'weight', 500, 'kg')
+        self.assertAlmostEqual(pyco.convert('pallet', 'kg', 1), 500)
+    
+    def test_redefine_in_another_category(self):
+        """Test that moving a unit to another category removes its old definition"""
+        pyco.defunit('pallet', 'weight', 1200, 'lb', 'pallets')
+        self.assertAlmostEqual(pyco.convert('pallets', 'lb', 1), 1200)
+        pyco.defunit('pallet', 'time', 2, 'wk')
+        self.assertNotIn(('weight.pallet', 'weight.lb'), pyco._CONVERSION_MATRIX)
+        self.assertIn(('time.pallet', 'time.wk'), pyco._CONVERSION_MATRIX)
+        self.assertNotIn('pallet', pyco._get_units_by_category('weight'))
+        self.assertAlmostEqual(pyco.convert('pallet', 'd', 1), 14)
+        with patch('sys.stdout', io.StringIO()):
+            self.assertIsNone(pyco.convert('pallets', 'lb', 1))
+        with self.assertRaises(ValueError):
+            pyco.convert('pallet', 'lb', 1)
+    
+    def test_redefine_with_dependents(self):
+        """Test that a unit other units are defined from cannot change category"""
+        pyco.defunit('pallet', 'weight', 1200, 'lb')
+        pyco.defunit('truckload', 'weight', 20, 'pallet')
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            pyco.defunit('pallet', 'time', 2, 'wk')
+        self.assertIn("cannot move to time while truckload is defined from it", captured_output.getvalue())
+        self.assertAlmostEqual(pyco.convert('truckload', 'lb', 1), 24000)
+    
+    def test_invalid_definitions(self):
+        """Test error handling for invalid unit definitions"""
+        cases = [
+            (('mi', 'distance', 1, 'm'), "already exists"),
+            (('pallet', 'time', 1, 'lb'), "is a weight unit, not a time unit"),
+            (('pallet', 'weight', -1, 'lb'), "positive number"),
+            (('pallet', 'weight', 1, 'xyz'), "Could not define 'pallet'"),
+            (('2pallet', 'weight', 1, 'lb'), "Invalid unit name"),
+            (('pallet/h', 'weight', 1, 'lb'), "Invalid unit name"),
+        ]
+        for args, message in cases:
+            with self.subTest(args=args):
+                captured_output = io.StringIO()
+                with patch('sys.stdout', captured_output):
+                    self.assertIsNone(pyco.defunit(*args))
+                self.assertIn(message, captured_output.getvalue())
+        self.assertEqual(pyco._defined_units, {})
+
+class TestPycoUnitPacks(unittest.TestCase):
+    """Test loading unit packs from data files with loadunits()"""
+    
+    PACK = """# Test pack
+testpallet  weight    1200     lb   testpallets
+testpa      pressure  =        kg/(m*s**2)   testpascals
+testkpa     pressure  1000     testpa
+testpsi     pressure  6894.76  testpa  test pounds per square inch
+"""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'test.units')
+        self.write(self.PACK)
+    
+    def tearDown(self):
+        self.directory.cleanup()
+        for name in list(pyco._defined_units):
+            pyco._undefine_unit(name)
+    
+    def write(self, text):
+        with open(self.path, 'w') as f:
+            f.write(text)
+    
+    def test_load_pack(self):
+        """Test that the units of a pack convert after loading it"""
+        self.assertEqual(pyco.loadunits(self.path), 4)
+        self.assertAlmostEqual(pyco.convert('testpallet', 'lb', 1), 1200)
+        self.assertAlmostEqual(pyco.convert('testpsi', 'testkpa', 1), 6.89476)
+        self.assertAlmostEqual(pyco.convert('testpsi', 'kg/(m*s**2)', 1), 6894.76)
+        self.assertAlmostEqual(pyco.convert('testpascals', 'testpa', 5), 5)
+        self.assertIn('testpsi', pyco._get_units_by_category('pressure'))
+    
+    def test_cache_is_used(self):
+        """Test that later loads read the binary cache instead of parsing"""
+        pyco.loadunits(self.path)
+        self.assertTrue(os.path.exists(self.path + '.cache'))
+        with patch('pyco._parse_unit_pack') as mock_parse:
+            self.assertEqual(pyco.loadunits(self.path), 4)
+        mock_parse.assert_not_called()
+        self.assertAlmostEqual(pyco.convert('testpsi', 'testkpa', 1), 6.89476)
+    
+    def test_touched_file_uses_hash(self):
+        """Test that a new mtime with unchanged contents still uses the cache"""
+        pyco.loadunits(self.path)
+        stat = os.stat(self.path)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 10))
+        with patch('pyco._parse_unit_pack') as mock_parse:
+            self.assertEqual(pyco.loadunits(self.path), 4)
+        mock_parse.assert_not_called()
+    
+    def test_changed_file_is_recompiled(self):
+        """Test that a changed pack is parsed again"""
+        pyco.loadunits(self.path)
+        self.write(self.PACK.replace('1200', '1000'))
+        stat = os.stat(self.path)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 10))
+        self.assertEqual(pyco.loadunits(self.path), 4)
+        self.assertAlmostEqual(pyco.convert('testpallet', 'lb', 1), 1000)
+    
+    def test_same_size_edit_keeps_mtime(self):
+        """Test that an edit with the same size and mtime is still recompiled"""
+        pyco.loadunits(self.path)
+        stat = os.stat(self.path)
+        self.write(self.PACK.replace('1200', '1000'))
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(os.stat(self.path).st_size, stat.st_size)
+        self.assertEqual(pyco.loadunits(self.path), 4)
+        self.assertAlmostEqual(pyco.convert('testpallet', 'lb', 1), 1000)
+    
+    def test_damaged_cache_is_ignored(self):
+        """Test that a damaged cache file falls back to parsing the pack"""
+        with open(self.path + '.cache', 'wb') as f:
+            f.write(b'PYCOUNITS2 damaged')
+        self.assertEqual(pyco.loadunits(self.path), 4)
+        self.assertAlmostEqual(pyco.convert('testpallet', 'lb', 1), 1200)
+    
+    def test_base_unit_only(self):
+        """Test that a pack with only a base unit makes it convertible"""
+        self.write("testpa pressure = kg/(m*s**2) testpascals\n")
+        self.assertEqual(pyco.loadunits(self.path), 1)
+        self.assertTrue(pyco._is_valid_unit('testpa'))
+        self.assertAlmostEqual(pyco.convert('testpa', 'kg/(m*s**2)', 3), 3)
+        self.assertAlmostEqual(pyco.convert('testpa', 'testpa', 2), 2)
+    
+    def test_cache_checks_session_units(self):
+        """Test that a cached pack built on a defunit() unit is parsed again in a session without it"""
+        pyco.defunit('testcrate', 'weight', 40, 'lb')
+        self.write("testtruck weight 20 testcrate\n")
+        self.assertEqual(pyco.loadunits(self.path), 1)
+        self.assertAlmostEqual(pyco.convert('testtruck', 'lb', 1), 800)
+        for name in ('testtruck', 'testcrate'):
+            pyco._undefine_unit(name)
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            self.assertIsNone(pyco.loadunits(self.path))
+        self.assertIn("Could not define 'testtruck'", captured_output.getvalue())
+        self.assertFalse(pyco._is_valid_unit('testtruck'))
+    
+    def test_undefine_pack_units(self):
+        """Test that undefining a pack's units removes them, their names and the new category"""
+        pyco.loadunits(self.path)
+        for name in list(pyco._defined_units):
+            pyco._undefine_unit(name)
+        self.assertEqual(pyco._defined_units, {})
+        self.assertNotIn('pressure', pyco._CATEGORY_DIMENSIONS)
+        self.assertFalse(hasattr(pyco, 'testpsi'))
+        for name in ('testpa', 'testpsi', 'testpallet'):
+            self.assertFalse(pyco._is_valid_unit(name))
+        self.assertEqual(pyco.loadunits(self.path), 4)
+    
+    def test_invalid_packs(self):
+        """Test error handling for missing and invalid packs"""
+        cases = [
+            ("testpallet weight 1200\n", "Line 1: expected"),
+            ("testpallet weight heavy lb\n", "must be a number"),
+            ("# comment\n\ntestpallet weight 1200 xyz\n", "Line 3: Could not define 'testpallet'"),
+            ("testpa weight = kg\n", "the category 'weight' already exists"),
+            ("testpa pressure = kg/xyz\n", "could not work out the dimensions"),
+        ]
+        for text, message in cases:
+            with self.subTest(text=text):
+                self.write(text)
+                captured_output = io.StringIO()
+                with patch('sys.stdout', captured_output):
+                    self.assertIsNone(pyco.loadunits(self.path))
+                self.assertIn(message, captured_output.getvalue())
+        self.assertEqual(pyco._defined_units, {})
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            self.assertIsNone(pyco.loadunits(self.path + '.missing'))
+            self.assertIsNone(pyco.loadunits(self.directory.name))
+        self.assertEqual(captured_output.getvalue().count("Could not read the unit pack"), 2)
+        with open(self.path, 'wb') as f:
+            f.write(b'testpallet weight 1200 lb \xff\xfe\n')
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            self.assertIsNone(pyco.loadunits(self.path))
+        self.assertIn("It is not UTF-8 text", captured_output.getvalue())
+
+class TestPycoExactConversions(unittest.TestCase):
+    """Test exact conversions with Fraction factors"""
+    
+    def test_to_fraction(self):
+        """Test reading floats as the fractions they stand for"""
+        self.assertEqual(pyco._to_fraction(0.3048), Fraction(381, 1250))
+        self.assertEqual(pyco._to_fraction(1/12), Fraction(1, 12))
+        self.assertEqual(pyco._to_fraction(3), Fraction(3))
+        self.assertEqual(pyco._to_fraction(pyco._Affine(1.8, 32)), pyco._Affine(Fraction(9, 5), Fraction(32)))
+    
+    def test_exact_conversions(self):
+        """Test that exact conversions give Fractions"""
+        self.assertEqual(pyco.convert('mi', 'in', 1, exact=True), Fraction(63360))
+        self.assertEqual(pyco.convert('in', 'ft', 1, exact=True), Fraction(1, 12))
+        self.assertEqual(pyco.convert('c', 'f', 37.5, exact=True), Fraction(199, 2))
+        self.assertEqual(pyco.convert('mi/h', 'km/h', 60, exact=True), Fraction('96.56064'))
+        self.assertIsInstance(pyco.convert('m', 'ft', 1, exact=True), Fraction)
+    
+    def test_without_fractions_module(self):
+        """Test that conversions are composed in floats where fractions is missing (MicroPython)"""
+        pyco._conversion_cache.clear()
+        # A new matrix version makes the conversion tables rebuild without Fractions
+        with patch('pyco.fractions', None), patch('pyco._matrix_edits', pyco._matrix_edits + 1):
+            self.assertEqual(pyco._to_fraction(0.3048), 0.3048)
+            self.assertAlmostEqual(pyco.convert('mi', 'km', 3), 4.828032)
+            self.assertAlmostEqual(pyco.convert('c', 'f', 100), 212)
+            self.assertAlmostEqual(pyco.convert('mi/h', 'm/s', 60), 26.8224)
+            self.assertEqual(pyco.convert('est', 'pst', 12), 9)
+            self.assertAlmostEqual((2 * pyco.mi * 1.5).value, 3)
+            captured_output = io.StringIO()
+            with patch('sys.stdout', captured_output):
+                self.assertIsNone(pyco.convert('mi', 'km', 1, exact=True))
+                self.assertIsNone(pyco.iconvert('mi', 'km', [1], exact=True))
+            self.assertEqual(captured_output.getvalue().count("need the fractions module"), 2)
+        pyco._conversion_cache.clear()
+        self.assertEqual(pyco.convert('mi', 'in', 1, exact=True), Fraction(63360))
+    
+    def test_exact_batches(self):
+        """Test exact conversions of batches and several target units"""
+        self.assertEqual(pyco.convert('ft', 'in', [1, 0.5], exact=True), [12, 6])
+        self.assertEqual(pyco.convert('ft', 'in', (1, 2), exact=True), (12, 24))
+        self.assertEqual(pyco.convert('mi', ['ft', 'km'], 1, exact=True), [5280, Fraction('1.609344')])
+    
+    def test_float_results_are_rounded_once(self):
+        """Test that float conversions are rounded from the exact factor"""
+        self.assertEqual(pyco.convert('mi', 'in', 1), 63360.0)
+        self.assertEqual(pyco.convert('in', 'mi', 63360), 1.0)
+        exact = pyco._get_exact_transform('distance.mi', 'distance.in')
+        self.assertEqual(pyco._get_affine_transform('distance.mi', 'distance.in'), (float(exact[0]), float(exact[1])))
+    
+    def test_exact_transforms_are_cached(self):
+        """Test that the exact and float transforms are cached together"""
+        pyco.convert('ft', 'cm', 1)
+        exact, transform = pyco._conversion_cache.data[('distance.ft', 'distance.cm')]
+        self.assertEqual(exact, (Fraction('30.48'), 0))
+        self.assertEqual(transform, (30.48, 0.0))
+        hits = pyco._conversion_cache.hits
+        self.assertEqual(pyco.convert('ft', 'cm', 2, exact=True), Fraction('60.96'))
+        self.assertEqual(pyco._conversion_cache.hits, hits + 1)
+
+class TestPycoExplainConversions(unittest.TestCase):
+    """Test convert(..., explain=True)"""
+    
+    def test_explain_simple_units(self):
+        """Test explaining conversions between simple units"""
+        info = pyco.convert('mi', 'km', 3, explain=True)
+        self.assertEqual(info['value'], 4.828032)
+        self.assertEqual(info['from_internal'], 'distance.mi')
+        self.assertEqual(info['to_internal'], 'distance.km')
+        self.assertEqual(info['method'], 'direct')
+        self.assertEqual(info['path'], ['distance.mi', 'distance.km'])
+        self.assertEqual((info['scale'], info['offset']), (1.609344, 0))
+        self.assertEqual(set(info['times']), {'parse', 'validate', 'search'})
+    
+    def test_explain_paths(self):
+        """Test that the path follows the base-unit table and prefixes"""
+        info = pyco.convert('ft', 'km', 1, explain=True)
+        self.assertEqual(info['method'], 'table')
+        self.assertEqual(info['path'][0], 'distance.ft')
+        self.assertEqual(info['path'][-1], 'distance.km')
+        for unit, next_unit in zip(info['path'], info['path'][1:]):
+            self.assertIsNotNone(pyco._get_conversion_factor(unit, next_unit))
+        info = pyco.convert('kWh', 'J', 1, explain=True)
+        self.assertEqual(info['method'], 'prefix')
+        self.assertEqual(info['path'], ['energy.kWh', 'energy.wh', 'energy.j'])
+    
+    def test_explain_expressions_and_timezones(self):
+        """Test explaining combined unit and timezone conversions"""
+        info = pyco.convert('mi/h', 'km/h', 60, explain=True)
+        self.assertEqual(info['method'], 'dimensions')
+        self.assertEqual(info['from_internal'], {'distance.mi': 1, 'time.h': -1})
+        self.assertIsNone(info['path'])
+        info = pyco.convert('est', 'pst', 12, explain=True)
+        self.assertEqual(info['method'], 'timezone')
+        self.assertEqual(info['value'], 9)
+    
+    def test_explain_cache(self):
+        """Test that explain reports whether the transform was cached"""
+        pyco._conversion_cache.clear()
+        self.assertFalse(pyco.convert('yr', 'd', 1, explain=True)['cached'])
+        self.assertTrue(pyco.convert('yr', 'd', 1, explain=True)['cached'])
+    
+    def test_explain_times(self):
+        """Test that each phase runs once and the times split a single conversion"""
+        pyco._conversion_cache.clear()
+        with patch('pyco._is_valid_unit', wraps=pyco._is_valid_unit) as mock_valid, \
+                patch('pyco._compute_conversion', wraps=pyco._compute_conversion) as mock_compute:
+            start = pyco.time.perf_counter()
+            info = pyco.convert('mi/h', 'm/s', 1, explain=True)
+            elapsed = pyco.time.perf_counter() - start
+        self.assertEqual(mock_compute.call_count, 1)
+        self.assertEqual(mock_valid.call_count, 4)
+        self.assertTrue(all(seconds > 0 for seconds in info['times'].values()))
+        self.assertLessEqual(sum(info['times'].values()), elapsed)
+        info = pyco.convert('mi/h', 'm/s', 1, explain=True)
+        self.assertEqual(info['times'], {'parse': 0.0, 'validate': 0.0, 'search': 0.0})
+    
+    def test_clock_only_read_when_explaining(self):
+        """Test that plain conversions don't read the clock, which falls back to ticks_us"""
+        pyco._conversion_cache.clear()
+        with patch('pyco._clock') as mock_clock:
+            self.assertEqual(pyco.convert('mi', 'ft', 2), 10560)
+        mock_clock.assert_not_called()
+        micro_time = MagicMock(spec=['ticks_us'])
+        micro_time.ticks_us.return_value = 2500000
+        with patch('pyco.time', micro_time):
+            self.assertEqual(pyco._clock(), 2.5)
+    
+    def test_explain_exact_and_invalid(self):
+        """Test explaining exact conversions and invalid units"""
+        info = pyco.convert('in', 'ft', 1, exact=True, explain=True)
+        self.assertEqual(info['value'], Fraction(1, 12))
+        self.assertEqual(info['scale'], Fraction(1, 12))
+        with patch('sys.stdout', io.StringIO()):
+            self.assertIsNone(pyco.convert('xyz', 'km', 1, explain=True))
+
+class TestPycoIConvert(unittest.TestCase):
+    """Test lazy conversion of iterables with iconvert()"""
+    
+    def test_iconvert_generator(self):
+        """Test converting a generator lazily"""
+        result = pyco.iconvert('c', 'f', (x * 10 for x in range(3)))
+        self.assertIs(iter(result), result)
+        self.assertEqual(list(result), [32.0, 50.0, 68.0])
+    
+    def test_iconvert_unbounded(self):
+        """Test that values are only converted as they are consumed"""
+        import itertools
+        result = pyco.iconvert('ft', 'in', itertools.count(1))
+        self.assertEqual([next(result) for _ in range(3)], [12, 24, 36])
+        self.assertEqual(max(pyco.iconvert('mi', 'km', range(1000))), 999 * 1.609344)
+    
+    def test_iconvert_strings(self):
+        """Test reading numbers from strings such as file lines"""
+        lines = io.StringIO('1\n\n2.5\n')
+        self.assertEqual(list(pyco.iconvert('ft', 'in', lines)), [12, 30])
+        self.assertEqual(list(pyco.iconvert('in', 'ft', ['1', '6'], exact=True)), [Fraction(1, 12), Fraction(1, 2)])
+        self.assertEqual(list(pyco.iconvert('ft', 'in', ['', 2, ' ', '3'])), [24, 36])
+    
+    def test_iconvert_invalid_units(self):
+        """Test that invalid units are reported when iconvert is called"""
+        with patch('sys.stdout', io.StringIO()):
+            self.assertIsNone(pyco.iconvert('xyz', 'km', [1]))
+    
+    def test_results_are_not_consumed(self):
+        """Test that iterator results are not materialized into _list"""
+        pyco._list = []
+        result = pyco.iconvert('mi', 'km', [1, 2])
+        pyco._process_result(result)
+        self.assertEqual(pyco._list, [])
+        self.assertEqual(list(result), [1.609344, 3.218688])
+    
+    def test_other_iterators_fill_list(self):
+        """Test that other iterator results, like map(), still populate _list"""
+        pyco._process_result(map(abs, [-1, 2]))
+        self.assertEqual(pyco._list, [1, 2])
+        pyco._process_result(x * 2 for x in range(3))
+        self.assertEqual(pyco._list, [0, 2, 4])
+
+class TestPycoQuantities(unittest.TestCase):
+    """Test calculating with unit quantities like 5*mi"""
+    
+    def test_unit_globals(self):
+        """Test that unit names are bound to quantities without shadowing other names"""
+        self.assertIsInstance(pyco.mi, pyco.Quantity)
+        self.assertEqual(pyco.km.value, 1)
+        self.assertNotIn('min', vars(pyco))
+        self.assertEqual(pyco.e, math.e)
+        self.assertEqual(pyco.kb, 1024)
+        self.assertNotIn('$usd', vars(pyco))
+    
+    def test_single_letter_units(self):
+        """Test that single-letter units are only available through u"""
+        for name in ['c', 'f', 'k', 'h', 'd', 's', 'm', 'g', 't', 'l', 'w', 'j']:
+            self.assertNotIsInstance(vars(pyco).get(name), pyco.Quantity)
+        self.assertEqual(repr(5 * pyco.u.m), '5 m')
+        self.assertEqual(repr(2 * pyco.u.mi), '2 mi')
+        with self.assertRaises(AttributeError):
+            pyco.u.xyz
+    
+    def test_temperature_arithmetic(self):
+        """Test that temperatures with different zero points cannot be added"""
+        with self.assertRaises(ValueError):
+            5 * pyco.u.c + 3 * pyco.u.f
+        with self.assertRaises(ValueError):
+            20 * pyco.u.c - 3 * pyco.u.k
+        with self.assertRaises(ValueError):
+            pyco.QuantityArray([1, 2], 'c') + pyco.QuantityArray([1, 2], 'f')
+        self.assertEqual(repr(20 * pyco.u.c - 5 * pyco.u.c), '15 c')
+        self.assertTrue(0 * pyco.u.c == 32 * pyco.u.f)
+        self.assertAlmostEqual((5 * pyco.u.c + (41 * pyco.u.f).to('c')).value, 10)
+    
+    def test_mixed_unit_arithmetic(self):
+        """Test that results are in the left operand's unit"""
+        total = 5 * pyco.mi + 3 * pyco.km
+        self.assertEqual(total.unit, 'mi')
+        self.assertAlmostEqual(total.value, 5 + 3 / 1.609344)
+        self.assertAlmostEqual(total.to('km').value, 11.04672)
+        self.assertEqual(repr(2 * pyco.u.m - 50 * pyco.cm), '1.5 m')
+        self.assertEqual(repr(sum([1 * pyco.u.m, 50 * pyco.cm])), '1.5 m')
+    
+    def test_one_factor_per_unit_pair(self):
+        """Test that mixed-unit sums reuse the cached factor for each pair"""
+        values = [1 * pyco.mi, 1 * pyco.km] * 50
+        with patch('pyco._compute_conversion', wraps=pyco._compute_conversion) as mock_compute:
+            pyco._conversion_cache.clear()
+            total = sum(values)
+        self.assertEqual(mock_compute.call_count, 1)
+        self.assertAlmostEqual(total.value, 50 + 50 / 1.609344)
+    
+    def test_products_and_ratios(self):
+        """Test combining units by multiplying and dividing quantities"""
+        speed = 100 * pyco.km / (2 * pyco.u.h)
+        self.assertEqual(repr(speed), '50.0 km/h')
+        self.assertAlmostEqual(speed.to('m/s').value, 13.888888888888889)
+        self.assertEqual(((2 * pyco.ft) ** 2).unit, 'ft**2')
+        self.assertEqual((1 / (2 * pyco.u.s)).unit, '1/s')
+        self.assertEqual((pyco.u.m / (pyco.u.s * pyco.u.s)).unit, 'm/(s*s)')
+        self.assertAlmostEqual(3 * pyco.mi / (1 * pyco.km), 4.828032)
+    
+    def test_comparisons(self):
+        """Test comparing quantities in different units"""
+        self.assertTrue(1 * pyco.mi > 1 * pyco.km)
+        self.assertTrue(5 * pyco.kg == 5000 * pyco.u.g)
+        self.assertFalse(1 * pyco.ft >= 1 * pyco.u.m)
+    
+    def test_equality_across_dimensions(self):
+        """Test that quantities that cannot be converted are unequal, while ordering them still raises"""
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            self.assertFalse(5 * pyco.mi == 5 * pyco.kg)
+            self.assertTrue(5 * pyco.mi != 5 * pyco.kg)
+            self.assertNotIn(5 * pyco.mi, [5 * pyco.kg, 3 * pyco.u.h])
+        self.assertEqual(captured_output.getvalue(), '')
+        with self.assertRaises(ValueError):
+            5 * pyco.mi < 5 * pyco.kg
+    
+    def test_incompatible_units(self):
+        """Test that adding quantities with different dimensions raises ValueError"""
+        with self.assertRaises(ValueError):
+            pyco.mi + pyco.kg
+        with self.assertRaises(TypeError):
+            pyco.mi + 1
+    
+    def test_defined_units_are_bound(self):
+        """Test that units defined with defunit() can be used in calculations"""
+        pyco.defunit('testcrate', 'weight', 20, 'kg')
+        try:
+            self.assertAlmostEqual((3 * pyco.testcrate).to('kg').value, 60)
+        finally:
+            del pyco._defined_units['testcrate']
+            del pyco._CONVERSION_MATRIX[('weight.testcrate', 'weight.kg')]
+            pyco._external_to_internal_cache.pop('testcrate', None)
+            del pyco.testcrate
+
+class TestPycoQuantityArrays(unittest.TestCase):
+    """Test QuantityArray for many values with one unit"""
+    
+    def test_bulk_conversion(self):
+        """Test converting all values at once"""
+        distances = pyco.QuantityArray([3, 5, 10], 'mi')
+        self.assertIsInstance(distances.values, array.array)
+        km = distances.to('km')
+        self.assertEqual(km.unit, 'km')
+        self.assertEqual(list(km), [4.828032, 8.04672, 16.09344])
+        self.assertEqual(list(pyco.QuantityArray([0, 100], 'c').to('f')), [32, 212])
+    
+    def test_bulk_conversion_is_one_lookup(self):
+        """Test that converting an array resolves the units once"""
+        temperatures = pyco.QuantityArray(range(1000), 'c')
+        with patch('pyco._resolve_conversion', wraps=pyco._resolve_conversion) as mock_resolve:
+            temperatures.to('k')
+        self.assertEqual(mock_resolve.call_count, 1)
+    
+    def test_elementwise_arithmetic(self):
+        """Test arithmetic with arrays, quantities and numbers"""
+        a = pyco.QuantityArray([1, 2], 'km')
+        b = pyco.QuantityArray([500, 1000], 'm')
+        self.assertEqual(list(a + b), [1.5, 3])
+        self.assertEqual(list(a - 500 * pyco.u.m), [0.5, 1.5])
+        self.assertEqual(list(a * 2), [2, 4])
+        self.assertEqual((a / (2 * pyco.u.h)).unit, 'km/h')
+        self.assertEqual((a * b).unit, 'km*m')
+        self.assertEqual(list(-a), [-1, -2])
+        for operation in (lambda x, y: x + y, lambda x, y: x * y, lambda x, y: x / y):
+            with self.assertRaisesRegex(ValueError, "arrays of 2 and 1 values"):
+                operation(a, pyco.QuantityArray([1], 'km'))
+    
+    def test_quantity_times_batch(self):
+        """Test that a unit times a list of numbers makes a QuantityArray"""
+        result = [1, 2, 3] * pyco.km
+        self.assertIsInstance(result, pyco.QuantityArray)
+        self.assertEqual(repr(result), "QuantityArray([1.0, 2.0, 3.0], 'km')")
+    
+    def test_statistics(self):
+        """Test summary methods, which keep the unit, and the statistics functions"""
+        distances = pyco.QuantityArray([3, 5, 10], 'mi')
+        self.assertEqual(repr(distances.sum()), '18.0 mi')
+        self.assertEqual(repr(distances.mean()), '6.0 mi')
+        self.assertEqual(repr(distances.min()), '3.0 mi')
+        self.assertEqual(repr(distances.max()), '10.0 mi')
+        self.assertEqual(pyco.median(distances), 5)
+        self.assertEqual(sum(distances), 18)
+        self.assertEqual(repr(pyco.average(distances)), '6.0 mi')
+        self.assertEqual(repr(distances[1]), '5.0 mi')
+        self.assertEqual(list(distances[1:]), [5, 10])
+    
+    def test_empty_mean(self):
+        """Test that the mean of an empty array raises ValueError, like statistics.mean"""
+        empty = pyco.QuantityArray([], 'mi')
+        with self.assertRaisesRegex(ValueError, "at least one data point"):
+            empty.mean()
+        self.assertEqual(repr(empty.sum()), '0.0 mi')
+    
+    def test_list_and_inputlist(self):
+        """Test that arrays are kept in _list and inputlist can tag a unit"""
+        distances = pyco.QuantityArray([1, 2], 'mi')
+        pyco._process_result(distances)
+        self.assertIs(pyco._list, distances)
+        with patch('builtins.input', side_effect=['1.5', '2.5', '']), patch('sys.stdout', io.StringIO()):
+            result = pyco.inputlist('kg')
+        self.assertIsInstance(result, pyco.QuantityArray)
+        self.assertEqual(result.unit, 'kg')
+        self.assertEqual(list(pyco._list), [1.5, 2.5])
+
+class TestPycoUnitResolutionCache(unittest.TestCase):
+    """Test caching of unit name lookups and "did you mean" suggestions"""
+    
+    def test_resolved_names_are_cached(self):
+        """Test that names, including misses, are resolved once"""
+        pyco._resolved_unit_cache.clear()
+        with patch('pyco._resolve_unit_name', wraps=pyco._resolve_unit_name) as mock_resolve:
+            for _ in range(3):
+                self.assertEqual(pyco._to_internal_unit('Kilometers'), 'distance.km')
+                self.assertEqual(pyco._to_internal_unit('kilomter'), 'kilomter')
+        self.assertEqual(mock_resolve.call_count, 2)
+    
+    def test_new_names_invalidate_misses(self):
+        """Test that a cached miss is dropped when the unit is defined"""
+        self.assertFalse(pyco._is_valid_unit('testfathom'))
+        pyco.defunit('testfathom', 'distance', 6, 'ft', 'test fathoms')
+        try:
+            self.assertEqual(pyco._to_internal_unit('testfathom'), 'distance.testfathom')
+            self.assertEqual(pyco._to_internal_unit('test fathoms'), 'distance.testfathom')
+        finally:
+            del pyco._defined_units['testfathom']
+            del pyco._CONVERSION_MATRIX[('distance.testfathom', 'distance.ft')]
+            pyco._external_to_internal_cache.pop('testfathom', None)
+            pyco._UNIT_NAMES.pop('testfathom', None)
+            del pyco.testfathom
+        self.assertEqual(pyco._to_internal_unit('testfathom'), 'testfathom')
+    
+    def test_suggestions_are_cached(self):
+        """Test that the fuzzy scan runs once per misspelling"""
+        pyco._suggestion_cache.clear()
+        with patch('pyco._generate_units_lines_uncached', wraps=pyco._generate_units_lines_uncached) as mock_scan:
+            with patch('sys.stdout', io.StringIO()) as captured_output:
+                self.assertIsNone(pyco.convert('kilomter', 'm', 1))
+                self.assertIsNone(pyco.convert('Kilomter', 'ft', 2))
+        self.assertEqual(mock_scan.call_count, 1)
+        self.assertEqual(captured_output.getvalue().count('km'), 2)
+    
+    def test_similarity_bounds(self):
+        """Test that the quick similarity checks agree with the full ratio"""
+        for search, text in [('kilomter', 'kilometers'), ('mlies', 'miles'), ('xyz', 'miles'), ('ft', 'feet')]:
+            ratio = pyco.difflib.SequenceMatcher(None, search, text).ratio()
+            self.assertEqual(pyco._is_similar(search, text, 0.6), ratio >= 0.6)
+
+class TestPycoUnitLiterals(unittest.TestCase):
+    """Test cases for unit literals like '5 mi -> km' rewritten by the pre-exec hook"""
+    
+    def test_rewrite_arrow_and_in(self):
+        """Test that both literal forms become a conversion call"""
+        self.assertEqual(pyco._pre_exec_hook('5 mi -> km'), "_inline_convert('mi', 'km', 5)")
+        self.assertEqual(pyco._pre_exec_hook('60 mi/h in m/s'), "_inline_convert('mi/h', 'm/s', 60)")
+        self.assertEqual(pyco._pending_command, '60 mi/h in m/s')
+    
+    def test_rewrite_values(self):
+        """Test negative numbers, names and parenthesized expressions as values"""
+        self.assertEqual(pyco._rewrite_unit_literal('-40 c -> f'), "_inline_convert('c', 'f', -40)")
+        self.assertEqual(pyco._rewrite_unit_literal('_3 kg in lb'), "_inline_convert('kg', 'lb', _3)")
+        self.assertEqual(pyco._rewrite_unit_literal('(2+3) km -> mi'), "_inline_convert('km', 'mi', (2+3))")
+    
+    def test_inches_as_unit(self):
+        """Test that 'in' can still be used as a unit on either side"""
+        self.assertEqual(pyco._rewrite_unit_literal('5 ft in in'), "_inline_convert('ft', 'in', 5)")
+        self.assertEqual(pyco._rewrite_unit_literal('5 in in cm'), "_inline_convert('in', 'cm', 5)")
+    
+    def test_currency_before_data_is_loaded(self):
+        """Test that currencies are recognized in a session that has not loaded them yet"""
+        pyco._unit_literal_cache.clear()
+        with patch('pyco._CURRENCY_DATA_LOADED', False), \
+                patch('pyco._load_currency_data') as mock_load, \
+                patch('pyco._is_valid_unit', lambda unit: mock_load.called or not unit.startswith('$')):
+            self.assertEqual(pyco._rewrite_unit_literal('5 $usd -> $eur'), "_inline_convert('$usd', '$eur', 5)")
+        mock_load.assert_called_once()
+    
+    def test_python_is_unchanged(self):
+        """Test that ordinary Python source is not rewritten"""
+        for source in ['x in items', '[x for x in y]', '1 if m in s else 2', 'def f() -> int: pass',
+                       '3 kg -> zz', 'print(5)']:
+            self.assertEqual(pyco._rewrite_unit_literal(source), source)
+    
+    def test_rewrite_is_cached(self):
+        """Test that a source line is only split and validated once"""
+        pyco._unit_literal_cache.clear()
+        with patch('pyco._split_unit_literal', wraps=pyco._split_unit_literal) as mock_split:
+            for _ in range(3):
+                pyco._rewrite_unit_literal('7 yd -> m')
+                pyco._rewrite_unit_literal('x in items')
+        self.assertEqual(mock_split.call_count, 2)
+    
+    def test_evaluate_rewrite(self):
+        """Test that the rewritten source gives the converted value"""
+        result = eval(pyco._rewrite_unit_literal('5 mi -> km'), vars(pyco))
+        self.assertAlmostEqual(result, 8.04672)
+        result = eval(pyco._rewrite_unit_literal('12 est -> pst'), vars(pyco))
+        self.assertAlmostEqual(result, 9)
+    
+    def test_inline_convert_reuses_converter(self):
+        """Test that repeated literals share one compiled converter"""
+        pyco._inline_converter_cache.clear()
+        with patch('pyco.converter', wraps=pyco.converter) as mock_converter:
+            self.assertAlmostEqual(pyco._inline_convert('ft', 'm', 10), 3.048)
+            self.assertAlmostEqual(pyco._inline_convert('ft', 'm', 20), 6.096)
+        self.assertEqual(mock_converter.call_count, 1)
+
+class TestPycoCurrencyTable(unittest.TestCase):
+    """Test cases for the binary currency table"""
+    
+    def _table(self):
+        return pyco.gzip.decompress(pyco.base64.b64decode(pyco._CURRENCY_DATA))
+    
+    def test_read_records(self):
+        """Test that records are read with their names and rates"""
+        records = list(pyco._read_currency_table(self._table()))
+        self.assertEqual(records[0], ('EUR', 'Euro Zone', 'Euro', 0.851))
+        self.assertTrue(all(code for code, _, _, _ in records))
+        self.assertIn(('JPY', 'Japan', 'Yen'), [record[:3] for record in records])
+    
+    def test_round_trip(self):
+        """Test that the table written by fetch_exchange_rates reads back the same"""
+        from fetch_exchange_rates import encode_currency_table
+        records = [
+            {'country': 'Euro Zone', 'currency': 'Euro', 'exchange_rate': '0.851', 'currency_code': 'EUR'},
+            {'country': 'Antigua & Barbuda', 'currency': 'East Caribbean Dollar', 'exchange_rate': '2.7', 'currency_code': None},
+            {'country': 'Côte d\'Ivoire', 'currency': 'Franc', 'exchange_rate': None, 'currency_code': 'XOF'},
+            {'country': 'Germany', 'currency': 'Euro', 'exchange_rate': '0.851', 'currency_code': 'EUR'},
+        ]
+        table = encode_currency_table(records, '2025-12-31')
+        decoded = list(pyco._read_currency_table(table))
+        self.assertEqual(decoded[0], ('EUR', 'Euro Zone', 'Euro', 0.851))
+        self.assertEqual(decoded[1][:3], ('XOF', 'Côte d\'Ivoire', 'Franc'))
+        self.assertTrue(math.isnan(decoded[1][3]))
+        self.assertEqual(decoded[2], ('EUR', 'Germany', 'Euro', 0.851))
+    
+    def test_bad_table(self):
+        """Test that data which is not a currency table is rejected"""
+        with self.assertRaises(ValueError):
+            list(pyco._read_currency_table(b'{"data": []}'))
+
+class TestPycoConversionCache(unittest.TestCase):
+    """Test the versioned LRU cache of resolved conversions"""
+    
+    def test_repeated_conversion_hits_cache(self):
+        """Test that converting the same pair twice resolves it once"""
+        pyco.convert('mi', 'in', 1)
+        hits = pyco._conversion_cache.hits
+        misses = pyco._conversion_cache.misses
+        self.assertAlmostEqual(pyco.convert('mi', 'in', 2), 126720, places=5)
+        self.assertEqual(pyco._conversion_cache.hits, hits + 1)
+        self.assertEqual(pyco._conversion_cache.misses, misses)
+    
+    def test_spellings_share_entry(self):
+        """Test that the cache is keyed on the resolved units, not their spelling"""
+        pyco._conversion_cache.clear()
+        pyco.convert('mi', 'km', 1)
+        misses = pyco._conversion_cache.misses
+        for from_unit, to_unit in [('MI', 'km'), ('miles', 'kilometers'), ('Mile', 'KM')]:
+            self.assertAlmostEqual(pyco.convert(from_unit, to_unit, 1), 1.609344)
+        self.assertEqual(pyco._conversion_cache.misses, misses)
+        self.assertEqual(len(pyco._conversion_cache), 1)
+    
+    def test_invalid_units_not_cached(self):
+        """Test that failed resolutions are not stored"""
+        with patch('sys.stdout', io.StringIO()):
+            self.assertIsNone(pyco.convert('xyz', 'abc', 5))
+        self.assertNotIn(('xyz', 'abc'), pyco._conversion_cache.data)
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full"""
+        cache = pyco._LRUCache(2, versioned=False)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.hits, 3)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(len(cache), 2)
+    
+    def test_matrix_change_invalidates_cache(self):
+        """Test that changing the conversion matrix drops cached conversions"""
+        pyco.convert('ft', 'm', 1)
+        self.assertIn(('distance.ft', 'distance.m'), pyco._conversion_cache.data)
+        key = ('distance.ft', 'distance.m')
+        try:
+            pyco._add_conversion('distance.ft', 'distance.m', 0.3)
+            self.assertAlmostEqual(pyco.convert('ft', 'm', 10), 3.0)
+        finally:
+            del pyco._CONVERSION_MATRIX[key]
+        self.assertAlmostEqual(pyco.convert('ft', 'm', 10), 3.048)
+
+class TestPycoConverterFactory(unittest.TestCase):
+    """Test converter() precompiled conversion callables"""
+    
+    def test_converter_matches_convert(self):
+        """Test that a converter gives the same results as convert()"""
+        for from_unit, to_unit in [('mi', 'km'), ('mi/h', 'm/s'), ('c', 'f'), ('pst', 'est'), ('$usd', '$eur')]:
+            with self.subTest(from_unit=from_unit, to_unit=to_unit):
+                conv = pyco.converter(from_unit, to_unit)
+                for value in (0, 1, 37.5, -40):
+                    self.assertEqual(conv(value), pyco.convert(from_unit, to_unit, value))
+    
+    def test_converter_temperature_offset(self):
+        """Test that temperature converters apply the offset"""
+        to_f = pyco.converter('c', 'f')
+        self.assertEqual(to_f(100), 212.0)
+        self.assertEqual(to_f(-40), -40.0)
+    
+    def test_converter_comprehension(self):
+        """Test using a converter over many readings"""
+        mph = pyco.converter('mi/h', 'm/s')
+        results = [mph(v) for v in (10, 20, 30)]
+        for result, expected in zip(results, [4.4704, 8.9408, 13.4112]):
+            self.assertAlmostEqual(result, expected)
+    
+    def test_converter_invalid_unit(self):
+        """Test that invalid units return None with the usual help"""
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            result = pyco.converter('kilo', 'lb')
+        self.assertIsNone(result)
+        self.assertIn("Could not convert the unit 'kilo'", captured_output.getvalue())
+    
+    def test_converter_repr(self):
+        """Test that a converter displays how it was created"""
+        self.assertEqual(repr(pyco.converter('mi', 'km')), "converter('mi', 'km')")
+    
+    def test_displayhook_does_not_call_converter(self):
+        """Test that the REPL displays a converter instead of calling it"""
+        conv = pyco.converter('mi', 'km')
+        with patch('sys.__displayhook__') as mock_display:
+            pyco._displayhook(conv)
+        mock_display.assert_called_once_with(conv)
+
+class TestPycoBatchConversions(unittest.TestCase):
+    """Test convert() over batches of values"""
+    
+    def test_convert_list(self):
+        """Test that a list converts to a list"""
+        result = pyco.convert('mi', 'km', [1, 2, 5])
+        self.assertIsInstance(result, list)
+        for value, expected in zip(result, [1.609344, 3.218688, 8.04672]):
+            self.assertAlmostEqual(value, expected)
+    
+    def test_convert_tuple_and_range(self):
+        """Test that tuples stay tuples and ranges become lists"""
+        self.assertEqual(pyco.convert('c', 'f', (0, 100)), (32.0, 212.0))
+        result = pyco.convert('m', 'cm', range(3))
+        self.assertIsInstance(result, list)
+        self.assertEqual(len(result), 3)
+        self.assertAlmostEqual(result[2], 200.0)
+    
+    def test_convert_array(self):
+        """Test that array.array converts to an array of floats"""
+        result = pyco.convert('c', 'f', array.array('i', [0, 100, -40]))
+        self.assertIsInstance(result, array.array)
+        self.assertEqual(result.typecode, 'd')
+        self.assertEqual(list(result), [32.0, 212.0, -40.0])
+    
+    def test_convert_into_out_buffer(self):
+        """Test converting in place with out="""
+        values = [0, 100]
+        result = pyco.convert('c', 'f', values, out=values)
+        self.assertIs(result, values)
+        self.assertEqual(values, [32.0, 212.0])
+        
+        buffer = array.array('d', [0.0, 0.0])
+        result = pyco.convert('c', 'f', array.array('d', [0, 100]), out=buffer)
+        self.assertIs(result, buffer)
+        self.assertEqual(list(buffer), [32.0, 212.0])
+    
+    def test_convert_list_variable(self):
+        """Test converting the _list of previous results"""
+        with patch('sys.__displayhook__'):
+            pyco._displayhook([1, 2])
+        result = pyco.convert('km', 'm', pyco._list)
+        self.assertEqual(result, [1000.0, 2000.0])
+    
+    def test_converter_batch(self):
+        """Test that a converter accepts batches too"""
+        to_f = pyco.converter('c', 'f')
+        self.assertEqual(to_f([0, 100]), [32.0, 212.0])
+    
+    def test_convert_numpy_array(self):
+        """Test the NumPy fast path"""
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy is not installed")
+        result = pyco.convert('c', 'f', numpy.array([0.0, 100.0]))
+        self.assertIsInstance(result, numpy.ndarray)
+        self.assertEqual(list(result), [32.0, 212.0])
+        
+        values = numpy.array([0.0, 100.0])
+        pyco.convert('c', 'f', values, out=values)
+        self.assertEqual(list(values), [32.0, 212.0])
+        
+        result = pyco.convert('c', 'f', array.array('d', [0, 100]))
+        self.assertIsInstance(result, array.array)
+        self.assertEqual(list(result), [32.0, 212.0])
+        
+        buffer = array.array('f', [0.0, 0.0])
+        pyco.convert('c', 'f', array.array('i', [0, 100]), out=buffer)
+        self.assertEqual(list(buffer), [32.0, 212.0])
+    
+    def test_convert_into_integer_buffer(self):
+        """Test that integer out arrays are rejected with and without NumPy"""
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        for has_numpy in (False, True):
+            if has_numpy and numpy is None:
+                continue
+            with self.subTest(has_numpy=has_numpy):
+                with patch.dict('sys.modules', {} if has_numpy else {'numpy': None}):
+                    buffer = array.array('i', [1, 3])
+                    with self.assertRaises(TypeError):
+                        pyco.convert('in', 'cm', array.array('d', [1, 3]), out=buffer)
+                    self.assertEqual(list(buffer), [1, 3])
+                    if has_numpy:
+                        with self.assertRaises(TypeError):
+                            pyco.convert('in', 'cm', numpy.array([1.0]), out=numpy.array([1]))
+
+class TestPycoMultiTargetConversions(unittest.TestCase):
+    """Test converting one value into several units at once"""
+    
+    def test_convert_to_unit_list(self):
+        """Test that a list of target units gives a list of values in order"""
+        result = pyco.convert('mi', ['km', 'm', 'ft'], 5)
+        self.assertEqual(len(result), 3)
+        self.assertAlmostEqual(result[0], 8.04672)
+        self.assertAlmostEqual(result[1], 8046.72)
+        self.assertAlmostEqual(result[2], 26400.0)
+    
+    def test_convert_to_units_matches_convert(self):
+        """Test that each target matches a separate convert() call"""
+        targets = ['ml', 'cup', 'tbsp', 'gal']
+        results = pyco.convert('floz', targets, 3)
+        for to_unit, result in zip(targets, results):
+            self.assertEqual(result, pyco.convert('floz', to_unit, 3))
+    
+    def test_convert_to_mixed_targets(self):
+        """Test that combined and temperature targets use the regular path"""
+        result = pyco.convert('c', ['f', 'k'], 100)
+        self.assertEqual(result[0], 212.0)
+        self.assertAlmostEqual(result[1], 373.15)
+        result = pyco.convert('mi/h', ['m/s', 'km/h'], 10)
+        self.assertAlmostEqual(result[0], 4.4704)
+        self.assertAlmostEqual(result[1], 16.09344)
+    
+    def test_convert_to_units_invalid_target(self):
+        """Test that an invalid target unit returns None"""
+        with patch('sys.stdout', io.StringIO()):
+            self.assertIsNone(pyco.convert('mi', ['km', 'xyz'], 5))
+    
+    def test_convert_all(self):
+        """Test converting a value into every unit of its category"""
+        result = pyco.convert_all('mi', 5)
+        self.assertEqual(set(result), set(pyco._get_units_by_category('distance')))
+        self.assertAlmostEqual(result['km'], 8.04672)
+        self.assertAlmostEqual(result['mi'], 5)
+    
+    def test_convert_all_timezones(self):
+        """Test converting a time into every timezone"""
+        result = pyco.convert_all('pst', 9)
+        self.assertEqual(result['est'], 12)
+        self.assertEqual(result['china_cst'], 25)
+    
+    def test_convert_all_invalid_unit(self):
+        """Test that convert_all with an invalid unit shows suggestions"""
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            self.assertIsNone(pyco.convert_all('kilo', 5))
+        self.assertIn("Could not convert the unit 'kilo'", captured_output.getvalue())
+
+class TestPycoNormalize(unittest.TestCase):
+    """Test normalize() for mixed-unit records"""
+    
+    def test_normalize_mixed_units(self):
+        """Test that mixed units convert into one unit in the original order"""
+        result = pyco.normalize([(3, 'mi'), (400, 'm'), (2, 'km')], 'km')
+        self.assertEqual(len(result), 3)
+        self.assertAlmostEqual(result[0], 4.828032)
+        self.assertAlmostEqual(result[1], 0.4)
+        self.assertAlmostEqual(result[2], 2.0)
+    
+    def test_normalize_resolves_each_unit_once(self):
+        """Test that repeated units share one resolution"""
+        pairs = [(i, 'mi' if i % 2 else 'ft') for i in range(100)]
+        with patch('pyco._resolve_conversion', wraps=pyco._resolve_conversion) as mock_resolve:
+            result = pyco.normalize(pairs, 'm')
+        self.assertEqual(mock_resolve.call_count, 2)
+        self.assertAlmostEqual(result[1], 1609.344)
+        self.assertAlmostEqual(result[2], 0.6096)
+    
+    def test_normalize_currencies(self):
+        """Test normalizing amounts in different currencies"""
+        result = pyco.normalize([(20, '$usd'), (10, '$eur'), (5, '$usd')], '$usd')
+        self.assertEqual(result[0], 20)
+        self.assertEqual(result[2], 5)
+        self.assertAlmostEqual(result[1], pyco.convert('$eur', '$usd', 10))
+    
+    def test_normalize_temperatures(self):
+        """Test that offsets are applied per record"""
+        self.assertEqual(pyco.normalize([(0, 'c'), (32, 'f')], 'c'), [0, 0.0])
+    
+    def test_normalize_invalid_unit(self):
+        """Test that an invalid unit returns None"""
+        with patch('sys.stdout', io.StringIO()):
+            self.assertIsNone(pyco.normalize([(1, 'mi'), (2, 'xyz')], 'km'))
+    
+    def test_normalize_empty(self):
+        """Test that no records give no values"""
+        self.assertEqual(pyco.normalize([], 'km'), [])
+
 class TestPycoConstants(unittest.TestCase):
     """Test constants defined in pyco.py"""
     
@@ -2169,13 +3419,13 @@ class TestPycoCombinedUnitConversions(unittest.TestCase):
         self.assertIn("Invalid unit", output)
     
     def test_convert_mixed_simple_and_combined_units(self):
-        """Test error handling when mixing simple and combined units"""
+        """Test error handling when a combined unit and a simple unit have different dimensions"""
         captured_output = io.StringIO()
         with patch('sys.stdout', captured_output):
             result = pyco.convert('mi/h', 'km', 10)
         self.assertIsNone(result)
         output = captured_output.getvalue()
-        self.assertIn("Cannot convert between simple and combined units", output)
+        self.assertIn("incompatible dimensions", output)
     
     def test_convert_in_per_s_to_cm_per_s(self):
         """Test inches per second to centimeters per second"""
@@ -2264,31 +3514,270 @@ class TestPycoProductUnitConversions(unittest.TestCase):
         self.assertIn("Invalid unit", output)
     
     def test_convert_mixed_ratio_and_product_units(self):
-        """Test error handling when mixing ratio and product units"""
+        """Test error handling when a ratio and a product unit have different dimensions"""
         captured_output = io.StringIO()
         with patch('sys.stdout', captured_output):
             result = pyco.convert('mi/h', 'm*kg', 10)
         self.assertIsNone(result)
         output = captured_output.getvalue()
-        self.assertIn("Expressions must have matching structure", output)
+        self.assertIn("incompatible dimensions", output)
     
     def test_convert_mixed_product_and_ratio_units(self):
-        """Test error handling when mixing product and ratio units"""
+        """Test error handling when a product and a ratio unit have different dimensions"""
         captured_output = io.StringIO()
         with patch('sys.stdout', captured_output):
             result = pyco.convert('ft*lb', 'm/s', 10)
         self.assertIsNone(result)
         output = captured_output.getvalue()
-        self.assertIn("Expressions must have matching structure", output)
+        self.assertIn("incompatible dimensions", output)
     
     def test_convert_mixed_simple_and_product_units(self):
-        """Test error handling when mixing simple and product units"""
+        """Test error handling when a product unit and a simple unit have different dimensions"""
         captured_output = io.StringIO()
         with patch('sys.stdout', captured_output):
             result = pyco.convert('ft*lb', 'kg', 10)
         self.assertIsNone(result)
         output = captured_output.getvalue()
-        self.assertIn("Cannot convert between simple and combined units", output)
+        self.assertIn("incompatible dimensions", output)
+
+class TestPycoUnitExpressionParser(unittest.TestCase):
+    """Test the recursive-descent parser for unit expressions"""
+    
+    def test_parse_expressions(self):
+        """Test parsing units, operators and parentheses"""
+        self.assertEqual(pyco._parse_unit_expression('mi/h'), ('/', ('unit', 'mi'), ('unit', 'h')))
+        self.assertEqual(pyco._parse_unit_expression('m**-2'), ('**', ('unit', 'm'), ('neg', ('number', 2))))
+        self.assertEqual(pyco._parse_unit_expression('(ft*in)/h'),
+                         ('/', ('*', ('unit', 'ft'), ('unit', 'in')), ('unit', 'h')))
+        self.assertEqual(pyco._parse_unit_expression('m/(s*s)'),
+                         ('/', ('unit', 'm'), ('*', ('unit', 's'), ('unit', 's'))))
+        self.assertEqual(pyco._parse_unit_expression(' 2.5 * kg '), ('*', ('number', 2.5), ('unit', 'kg')))
+    
+    def test_precedence(self):
+        """Test that ** binds tighter than * and /, which bind tighter than + and -"""
+        self.assertEqual(pyco._parse_unit_expression('a/b*c'), ('*', ('/', ('unit', 'a'), ('unit', 'b')), ('unit', 'c')))
+        self.assertEqual(pyco._parse_unit_expression('a*b**2'), ('*', ('unit', 'a'), ('**', ('unit', 'b'), ('number', 2))))
+        self.assertEqual(pyco._parse_unit_expression('a+b*c'), ('+', ('unit', 'a'), ('*', ('unit', 'b'), ('unit', 'c'))))
+    
+    def test_special_names(self):
+        """Test currency codes, keywords and non-ASCII characters as plain names"""
+        self.assertEqual(pyco._get_all_units_in_expression('$usd/in'), ['$usd', 'in'])
+        self.assertEqual(pyco._get_all_units_in_expression('if*for'), ['if', 'for'])
+        self.assertEqual(pyco._get_all_units_in_expression('\u00b5s/ns'), ['\u00b5s', 'ns'])
+        self.assertEqual(pyco._get_all_units_in_expression('$usd_united_states/l'), ['$usd_united_states', 'l'])
+    
+    def test_invalid_expressions(self):
+        """Test that malformed expressions do not parse"""
+        for text in ['', 'km/', '(km', 'km)', 'a b', 'm**', '1.2.3', 'm%s', '*m']:
+            self.assertIsNone(pyco._parse_unit_expression(text), text)
+        self.assertEqual(pyco._get_all_units_in_expression('km/'), ['km/'])
+    
+    def test_combined_units(self):
+        """Test detecting combined units"""
+        self.assertTrue(pyco._is_combined_unit('mi/h'))
+        self.assertTrue(pyco._is_combined_unit('m+s'))
+        self.assertFalse(pyco._is_combined_unit('mi'))
+        self.assertFalse(pyco._is_combined_unit('(km)'))
+        self.assertFalse(pyco._is_combined_unit('-m'))
+        self.assertFalse(pyco._is_combined_unit('test fathoms'))
+    
+    def test_no_ast(self):
+        """Test that unit expressions do not need the ast, re or keyword modules"""
+        for module in ('ast', 're', 'keyword'):
+            self.assertNotIn(module, vars(pyco))
+
+class TestPycoUnitExpressionCache(unittest.TestCase):
+    """Test that unit strings are parsed once and shared by all their uses"""
+    
+    def test_parsed_once_per_string(self):
+        """Test that a conversion parses each unit string only once"""
+        pyco._unit_expression_cache.clear()
+        pyco._conversion_cache.clear()
+        pyco._dimension_cache.clear()
+        with patch('pyco._parse_unit_expression', wraps=pyco._parse_unit_expression) as mock_parse:
+            self.assertAlmostEqual(pyco.convert('mi/h', 'm/s', 10), 4.4704)
+            self.assertEqual(mock_parse.call_count, 2)
+            pyco._conversion_cache.clear()
+            pyco.convert('mi/h', 'm/s', 20)
+            pyco.convert('mi', ['km', 'm/s*s'], 1)
+            pyco.convert('mi', ['km', 'm/s*s'], 2)
+        self.assertEqual(mock_parse.call_count, 5)
+    
+    def test_expression_contents(self):
+        """Test the cached unit list and combined flag"""
+        expression = pyco._get_unit_expression('(ft*in)/h')
+        self.assertIs(pyco._get_unit_expression('(ft*in)/h'), expression)
+        self.assertEqual(expression.units, ['ft', 'in', 'h'])
+        self.assertTrue(expression.combined)
+        self.assertFalse(pyco._get_unit_expression('ft').combined)
+        invalid = pyco._get_unit_expression('km/')
+        self.assertIsNone(invalid.tree)
+        self.assertEqual(invalid.units, ['km/'])
+        self.assertFalse(invalid.combined)
+    
+    def test_unit_lists_are_copies(self):
+        """Test that callers cannot change the cached unit list"""
+        pyco._get_all_units_in_expression('mi/h').append('x')
+        self.assertEqual(pyco._get_all_units_in_expression('mi/h'), ['mi', 'h'])
+
+class TestPycoCanonicalUnits(unittest.TestCase):
+    """Test the canonical normal form of unit expressions"""
+    
+    def canonical(self, unit_str):
+        return pyco._get_unit_expression(unit_str).canonical
+    
+    def test_canonical_spelling(self):
+        """Test that equivalent spellings get the same canonical text"""
+        self.assertEqual(self.canonical('lb*ft'), self.canonical('ft*lb'))
+        self.assertEqual(self.canonical('m/s/s'), 'm*s**-2')
+        self.assertEqual(self.canonical('m/(s*s)'), 'm*s**-2')
+        self.assertEqual(self.canonical('m*s^-2'), 'm*s**-2')
+        self.assertEqual(self.canonical('(ft*in)/h'), self.canonical('in/h*ft'))
+        self.assertEqual(self.canonical('mi*h/h'), 'mi')
+        self.assertEqual(self.canonical('2*m/m'), '2')
+        self.assertEqual(self.canonical('m+s'), 'm+s')
+    
+    def test_caret_powers(self):
+        """Test ^ as a power operator"""
+        self.assertEqual(pyco._parse_unit_expression('m^2'), pyco._parse_unit_expression('m**2'))
+        self.assertAlmostEqual(pyco.convert('m^2', 'ft^2', 1), 10.763910416709722)
+        self.assertAlmostEqual(pyco.convert('s^-1', 'min**-1', 1), 60)
+    
+    def test_equivalent_spellings_share_cache(self):
+        """Test that equivalent spellings hit the same cached factor"""
+        pyco._conversion_cache.clear()
+        self.assertAlmostEqual(pyco.convert('ft*lb', 'm*kg', 1), 0.1382548416)
+        misses = pyco._conversion_cache.misses
+        self.assertAlmostEqual(pyco.convert('lb*ft', 'kg*m', 1), 0.1382548416)
+        self.assertEqual(pyco._conversion_cache.misses, misses)
+        self.assertEqual(len(pyco._conversion_cache), 1)
+    
+    def test_reduced_powers_are_sorted(self):
+        """Test that reduced expressions list units in sorted order without cancelled units"""
+        constant, powers = pyco._reduce_unit_expression('h/mi*ft/h')
+        self.assertEqual(list(powers), ['distance.ft', 'distance.mi'])
+
+class TestPycoDimensionConversions(unittest.TestCase):
+    """Test conversions between any dimensionally compatible unit expressions"""
+    
+    def test_unit_dimensions(self):
+        """Test reducing units and expressions to scale and base dimensions"""
+        scale, dimensions = pyco._get_unit_dimensions('km/h')
+        self.assertAlmostEqual(scale, 1000 / 3600)
+        self.assertEqual(dimensions, (1, 0, -1, 0, 0, 0))
+        self.assertEqual(pyco._get_unit_dimensions('kW*h')[1], pyco._get_unit_dimensions('J')[1])
+        self.assertEqual(pyco._get_unit_dimensions('m**-2')[1], (-2, 0, 0, 0, 0, 0))
+        self.assertIsNone(pyco._get_unit_dimensions('m+s'))
+        self.assertIsNone(pyco._get_unit_dimensions('m**s'))
+        self.assertIsNone(pyco._get_unit_dimensions('xyz/h'))
+    
+    def test_different_structures(self):
+        """Test converting between expressions with different structures"""
+        self.assertAlmostEqual(pyco.convert('kW*h', 'J', 1), 3600000)
+        self.assertAlmostEqual(pyco.convert('(ft*in)/h', 'm**2/s', 3600), 0.3048 * 0.0254)
+        self.assertAlmostEqual(pyco.convert('l', 'cm**3', 1), 1000)
+        self.assertAlmostEqual(pyco.convert('ha', 'm*m', 1), 10000)
+        self.assertAlmostEqual(pyco.convert('w*s', 'j', 5), 5)
+    
+    def test_simple_and_combined_units(self):
+        """Test converting between simple and combined units with the same dimensions"""
+        self.assertAlmostEqual(pyco.convert('mps', 'km/h', 10), 36)
+        self.assertAlmostEqual(pyco.convert('mi/h', 'mph', 60), 60)
+        self.assertAlmostEqual(pyco.convert('kwh', 'kW*h', 2), 2)
+    
+    def test_shared_units_cancel(self):
+        """Test that units shared by both expressions cancel exactly"""
+        self.assertEqual(pyco.convert('mi/h', 'km/h', 60), 96.56064)
+        self.assertEqual(pyco.convert('$usd/l', '$usd/ml', 1000), 1)
+    
+    def test_temperature_rates_use_scale_only(self):
+        """Test that temperatures in expressions are treated as differences"""
+        self.assertAlmostEqual(pyco.convert('c/h', 'f/h', 10), 18)
+        self.assertAlmostEqual(pyco.convert('c/h', 'k/s', 3600), 1)
+    
+    def test_incompatible_dimensions(self):
+        """Test error handling for expressions with different dimensions"""
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            result = pyco.convert('kW*h', 'W', 1)
+        self.assertIsNone(result)
+        self.assertIn("incompatible dimensions", captured_output.getvalue())
+    
+    def test_unsupported_expression(self):
+        """Test error handling for expressions that cannot be reduced"""
+        captured_output = io.StringIO()
+        with patch('sys.stdout', captured_output):
+            result = pyco.convert('m**s', 'm', 1)
+        self.assertIsNone(result)
+        self.assertIn("whole-number powers", captured_output.getvalue())
+    
+    def test_expressions_are_cached(self):
+        """Test that each expression is reduced once and cached"""
+        pyco._dimension_cache.clear()
+        first = pyco._reduce_unit_expression('mi/h')
+        self.assertIs(pyco._reduce_unit_expression('mi/h'), first)
+        self.assertEqual(first, (1, {'distance.mi': 1, 'time.h': -1}))
+
+class TestPycoPrefixedUnits(unittest.TestCase):
+    """Test units synthesized from SI and binary prefixes"""
+    
+    def test_si_prefixes(self):
+        """Test SI prefixes on base unit symbols"""
+        self.assertEqual(pyco.convert('Mm', 'km', 1), 1000)
+        self.assertEqual(pyco.convert('ns', 'us', 1), 0.001)
+        self.assertEqual(pyco.convert('\u00b5s', 'ns', 1), 1000)
+        self.assertAlmostEqual(pyco.convert('kWh', 'MJ', 1), 3.6)
+        self.assertEqual(pyco.convert('Gg', 'kg', 1), 1000000)
+    
+    def test_data_prefixes(self):
+        """Test decimal and binary prefixes on bits and bytes"""
+        self.assertEqual(pyco.convert('GiB', 'MB', 1), 1073.741824)
+        self.assertEqual(pyco.convert('kbit', 'B', 8), 1000)
+        self.assertEqual(pyco.convert('KiB', 'bytes', 1), 1024)
+        self.assertEqual(pyco.convert('Mbit/s', 'MB/s', 100), 12.5)
+    
+    def test_data_size_names(self):
+        """Test that kb, mb, gb and tb match the data size constants"""
+        self.assertEqual(pyco.convert('kb', 'B', 1), pyco.kb)
+        self.assertEqual(pyco.convert('KB', 'B', 1), pyco.kb)
+        self.assertEqual(pyco.convert('mb', 'B', 1), pyco.mb)
+        self.assertEqual(pyco.convert('gb', 'MiB', 1), 1024)
+        self.assertEqual(pyco.convert('tb', 'B', 1), pyco.tb)
+        self.assertAlmostEqual(pyco.convert('kb', 'kbit', 1), 8.192)
+        self.assertEqual(pyco.convert('MB', 'B', 1), 1000000)
+        self.assertEqual(pyco.convert('Mb', 'kbit', 1), 1000)
+    
+    def test_case_only_differences_convert(self):
+        """Test that names differing only in case are not treated as the same unit"""
+        self.assertEqual(pyco.convert('Mm', 'mm', 1), 1e9)
+        self.assertEqual(pyco.convert('Mm/s', 'mm/s', 1), 1e9)
+        self.assertEqual(pyco.convert('MB', 'mb', 1), 1e6 / 2**20)
+        self.assertEqual(pyco.convert('KB', 'kB', 1), 1.024)
+        self.assertEqual(pyco._get_unit_conversion_factor('Mm', 'mm'), 1e9)
+        self.assertEqual(pyco.convert('MI', 'mi', 3), 3)
+        self.assertEqual(repr(5 * pyco.u.Mm + 3000 * pyco.u.mm), '5.000003 Mm')
+    
+    def test_prefixes_are_case_sensitive(self):
+        """Test that prefixed names keep their case and capitals keep known units"""
+        self.assertEqual(pyco.convert('Ml', 'l', 1), 1000000)
+        self.assertEqual(pyco.convert('ML', 'L', 1000), 1)
+        self.assertEqual(pyco._to_internal_unit('Mm'), 'distance.Mm')
+        self.assertEqual(pyco._to_internal_unit('MM'), 'distance.mm')
+    
+    def test_invalid_prefixes(self):
+        """Test names that are not prefixed units"""
+        self.assertIsNone(pyco._parse_prefixed_unit('mB'))
+        self.assertIsNone(pyco._parse_prefixed_unit('Kb'))
+        self.assertIsNone(pyco._parse_prefixed_unit('Kim'))
+        self.assertFalse(pyco._is_valid_unit('Qm'))
+    
+    def test_prefixed_units_are_cached(self):
+        """Test that prefix lookups are cached, including misses"""
+        pyco._prefixed_unit_cache.clear()
+        self.assertEqual(pyco._get_prefixed_unit('GiB'), ('data.byte', 0, 30))
+        self.assertIsNone(pyco._get_prefixed_unit('xyz'))
+        self.assertEqual(pyco._prefixed_unit_cache.get('GiB'), ('data.byte', 0, 30))
+        self.assertIs(pyco._prefixed_unit_cache.get('xyz'), False)
 
 class TestPycoNestedUnitConversions(unittest.TestCase):
     """Test nested unit expression conversions (e.g., (ft*in)/h to (m*cm)/s) in pyco.py"""
@@ -2366,6 +3855,11 @@ class TestPycoTimezoneConversions(unittest.TestCase):
         result = pyco.convert('Cuba CST', 'China CST', 10)
         self.assertEqual(result, 23)
     
+    def test_whole_hours_stay_whole(self):
+        """Test that whole-hour offsets keep whole times as ints"""
+        self.assertEqual(repr(pyco.convert('pst', 'est', 9)), '12')
+        self.assertEqual(repr(pyco.convert('utc', 'indian ist', 0)), '5.5')
+    
     def test_convert_same_timezone(self):
         """Test converting timezone to itself"""
         result = pyco.convert('PST', 'PST', 10)